@@ -123,19 +123,20 @@ class ConsensusStateStore(MutableMapping):
 
     def __str__(self):
         out = []
-        for block_id in self._store_db.keys():
-            try:
-                serialized_consensus_state = self._store_db[block_id]
-                consensus_state = ConsensusState()
-                consensus_state.parse_from_bytes(
-                    buffer=serialized_consensus_state)
-                out.append(
-                    '{}...{}: {{{}}}'.format(
-                        block_id[:8],
-                        block_id[-8:],
-                        consensus_state))
-            except ValueError:
-                pass
+        with self._store_db.snapshot() as reader:
+            for block_id in self._store_db.keys():
+                try:
+                    serialized_consensus_state = reader.get(block_id)
+                    consensus_state = ConsensusState()
+                    consensus_state.parse_from_bytes(
+                        buffer=serialized_consensus_state)
+                    out.append(
+                        '{}...{}: {{{}}}'.format(
+                            block_id[:8],
+                            block_id[-8:],
+                            consensus_state))
+                except ValueError:
+                    pass
 
         return ', '.join(out)
 
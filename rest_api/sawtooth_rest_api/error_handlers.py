@@ -63,6 +63,11 @@ class BatchInvalidTrap(_ErrorTrap):
     error = errors.SubmittedBatchesInvalid
 
 
+class BatchQueueFullTrap(_ErrorTrap):
+    trigger = client_pb2.ClientBatchSubmitResponse.QUEUE_FULL
+    error = errors.BatchQueueFull
+
+
 class InvalidAddressTrap(_ErrorTrap):
     trigger = client_pb2.ClientStateGetResponse.INVALID_ADDRESS
     error = errors.InvalidStateAddress
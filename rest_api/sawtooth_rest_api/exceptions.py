@@ -30,6 +30,7 @@ class _ApiError(HTTPError):
             __init__ method.
         title (str): A short headline for the error.
         message (str): The human-readable description of the error.
+        headers (dict, optional): HTTP headers to add to the response.
 
     Raises:
         AssertionError: If api_code, status_code, title, or message were
@@ -39,6 +40,7 @@ class _ApiError(HTTPError):
     status_code = None
     title = None
     message = None
+    headers = None
 
     def __init__(self):
         assert self.api_code is not None, 'Invalid ApiError, api_code not set'
@@ -52,6 +54,7 @@ class _ApiError(HTTPError):
             'message': self.message}
 
         super().__init__(
+            headers=self.headers,
             content_type='application/json',
             text=json.dumps(
                 {'error': error},
@@ -76,6 +79,15 @@ class ValidatorNotReady(_ApiError):
                'be queried. Try your request again later.')
 
 
+class ValidatorBusy(_ApiError):
+    api_code = 16
+    status_code = 503
+    title = 'Validator Busy'
+    message = ('The validator is too busy to handle your request. '
+               'Try your request again later.')
+    headers = {'Retry-After': '5'}
+
+
 class ValidatorTimedOut(_ApiError):
     api_code = 17
     status_code = 503
@@ -116,6 +128,15 @@ class SubmittedBatchesInvalid(_ApiError):
                'poorly formed, or has an invalid signature.')
 
 
+class BatchQueueFull(_ApiError):
+    api_code = 31
+    status_code = 429
+    title = 'Unable to Accept Batches'
+    message = ('The validator has too many batches pending to accept your '
+               'BatchList. Try your request again later.')
+    headers = {'Retry-After': '5'}
+
+
 class NoBatchesSubmitted(_ApiError):
     api_code = 34
     status_code = 400
@@ -95,7 +95,8 @@ class RouteHandler(object):
             raise errors.BadProtobufSubmitted()
 
         # Query validator
-        error_traps = [error_handlers.BatchInvalidTrap]
+        error_traps = [error_handlers.BatchInvalidTrap,
+                       error_handlers.BatchQueueFullTrap]
         validator_query = client_pb2.ClientBatchSubmitRequest(
             batches=batch_list.batches)
         self._set_wait(request, validator_query)
@@ -461,6 +462,12 @@ class RouteHandler(object):
         except AttributeError:
             pass
 
+        try:
+            if parsed.status == proto.BUSY:
+                raise errors.ValidatorBusy()
+        except AttributeError:
+            pass
+
         try:
             if parsed.status == proto.NO_ROOT:
                 raise errors.HeadNotFound()
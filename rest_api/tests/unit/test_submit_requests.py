@@ -77,6 +77,51 @@ class PostBatchTests(BaseApiTest):
         response = await request.json()
         self.assert_has_valid_error(response, 10)
 
+    @unittest_run_loop
+    async def test_post_batch_with_validator_busy(self):
+        """Verifies a POST /batches to a busy validator breaks properly.
+
+        It will receive a Protobuf response with:
+            - a status of BUSY
+
+        It should send back a JSON response with:
+            - a status of 503
+            - a Retry-After header
+            - an error property with a code of 16
+        """
+        batches = Mocks.make_batches('a')
+        self.stream.preset_response(self.status.BUSY)
+
+        request = await self.post_batches(batches)
+        self.assertEqual(503, request.status)
+        self.assertIn('Retry-After', request.headers)
+
+        response = await request.json()
+        self.assert_has_valid_error(response, 16)
+
+    @unittest_run_loop
+    async def test_post_batch_with_queue_full(self):
+        """Verifies a POST /batches to a validator with too many batches
+        pending breaks properly.
+
+        It will receive a Protobuf response with:
+            - a status of QUEUE_FULL
+
+        It should send back a JSON response with:
+            - a status of 429
+            - a Retry-After header
+            - an error property with a code of 31
+        """
+        batches = Mocks.make_batches('a')
+        self.stream.preset_response(self.status.QUEUE_FULL)
+
+        request = await self.post_batches(batches)
+        self.assertEqual(429, request.status)
+        self.assertIn('Retry-After', request.headers)
+
+        response = await request.json()
+        self.assert_has_valid_error(response, 31)
+
     @unittest_run_loop
     async def test_post_json_batch(self):
         """Verifies a POST /batches with a JSON request body breaks properly.
@@ -31,6 +31,12 @@ LOGGER = logging.getLogger(__name__)
 __CONTEXTBASE__ = secp256k1.Base(ctx=None, flags=secp256k1.ALL_FLAGS)
 __CTX__ = __CONTEXTBASE__.ctx
 
+# The public keys decoded by verify, by their hex serialization. A network
+# has few signers, each signing many messages, so the cache is small and
+# is cleared when full.
+__PUBKEY_CACHE__ = {}
+__PUBKEY_CACHE_SIZE__ = 1024
+
 
 def generate_privkey():
     """ Create a random private key
@@ -110,6 +116,18 @@ def _decode_pubkey(serialized_pubkey, encoding_format='hex'):
     return secp256k1.PublicKey(pub, ctx=__CTX__)
 
 
+def _decode_cached_pubkey(serialized_pubkey):
+    try:
+        return __PUBKEY_CACHE__[serialized_pubkey]
+    except KeyError:
+        pass
+    pubkey = _decode_pubkey(serialized_pubkey, 'hex')
+    if len(__PUBKEY_CACHE__) >= __PUBKEY_CACHE_SIZE__:
+        __PUBKEY_CACHE__.clear()
+    __PUBKEY_CACHE__[serialized_pubkey] = pubkey
+    return pubkey
+
+
 def generate_identifier(pubkey):
     """ Generate an identifier based on the public key
     Args:
@@ -154,7 +172,7 @@ def verify(message, signature, pubkey):
     """
     verified = False
     try:
-        pubkey = _decode_pubkey(pubkey, 'hex')
+        pubkey = _decode_cached_pubkey(pubkey)
         if isinstance(message, str):
             message = message.encode('utf-8')
         try:  # check python3
@@ -0,0 +1,144 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+ThreadPoolMetrics = namedtuple(
+    'ThreadPoolMetrics',
+    ['name', 'max_workers', 'queue_depth', 'active_workers', 'completed',
+     'average_wait_time'])
+
+
+class InstrumentedThreadPoolExecutor(ThreadPoolExecutor):
+    """A ThreadPoolExecutor which counts the tasks waiting for and running
+    on its workers and the time tasks wait before running, and whose number
+    of workers may be increased after it is created.
+    """
+    def __init__(self, max_workers=None, name=''):
+        """
+        Args:
+            max_workers (int): the number of worker threads
+            name (str): the name of the pool, as reported in its metrics
+        """
+        super().__init__(max_workers=max_workers)
+        self._name = name
+        self._metrics_lock = threading.Lock()
+        self._queue_depth = 0
+        self._active_workers = 0
+        self._started = 0
+        self._completed = 0
+        self._total_wait_time = 0.0
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def max_workers(self):
+        return self._max_workers
+
+    # fn is positional-only in ThreadPoolExecutor.submit from Python 3.8,
+    # which cannot be declared in the Python versions supported
+    def submit(self, fn, *args, **kwargs):  # pylint: disable=arguments-differ
+        submitted_at = time.time()
+        with self._metrics_lock:
+            self._queue_depth += 1
+
+        def run():
+            with self._metrics_lock:
+                self._queue_depth -= 1
+                self._active_workers += 1
+                self._started += 1
+                self._total_wait_time += time.time() - submitted_at
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._metrics_lock:
+                    self._active_workers -= 1
+                    self._completed += 1
+
+        try:
+            return super().submit(run)
+        except RuntimeError:
+            # the pool has been shut down
+            with self._metrics_lock:
+                self._queue_depth -= 1
+            raise
+
+    def set_max_workers(self, max_workers):
+        """Increases the number of worker threads, starting new workers for
+        any tasks waiting to run.
+
+        Args:
+            max_workers (int): the new number of workers, which may not be
+                less than the current number.
+
+        Raises:
+            ValueError: if max_workers is less than the current number
+        """
+        # ThreadPoolExecutor does not support resizing; the new workers are
+        # started as they would be on submit.
+        with self._shutdown_lock:
+            if max_workers < self._max_workers:
+                raise ValueError(
+                    "Cannot reduce the workers of {} from {} to {}".format(
+                        self._name, self._max_workers, max_workers))
+            added = max_workers - self._max_workers
+            self._max_workers = max_workers
+            if not self._shutdown:
+                for _ in range(min(added, self._work_queue.qsize())):
+                    self._adjust_thread_count()
+
+    def get_metrics(self):
+        """Returns the current metrics of the pool.
+
+        Returns:
+            ThreadPoolMetrics: the number of tasks waiting for a worker, the
+                number of workers running tasks, the number of tasks
+                completed, and the average time in seconds tasks waited for
+                a worker
+        """
+        with self._metrics_lock:
+            average_wait_time = self._total_wait_time / self._started \
+                if self._started > 0 else 0.0
+            return ThreadPoolMetrics(
+                name=self._name,
+                max_workers=self._max_workers,
+                queue_depth=self._queue_depth,
+                active_workers=self._active_workers,
+                completed=self._completed,
+                average_wait_time=average_wait_time)
+
+
+def log_thread_pool_metrics(metrics_list):
+    """Logs the metrics of threadpools at debug level.
+
+    Args:
+        metrics_list (list of ThreadPoolMetrics): the metrics of each pool
+    """
+    for metrics in metrics_list:
+        LOGGER.debug(
+            "thread pool %s: %s/%s workers active, %s queued, %s completed, "
+            "%.3fs average wait",
+            metrics.name, metrics.active_workers, metrics.max_workers,
+            metrics.queue_depth, metrics.completed, metrics.average_wait_time)
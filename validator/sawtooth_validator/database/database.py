@@ -58,6 +58,26 @@ class Database(object):
         """
         raise NotImplementedError()
 
+    def get_raw(self, key):
+        """Retrieves the bytes associated with a key from the database,
+        without decoding them. Only valid for values written with
+        set_batch_raw.
+
+        Args:
+            key (str): The key to retrieve
+        """
+        raise NotImplementedError()
+
+    def set_batch_raw(self, add_pairs, del_keys=None):
+        """Sets and removes key:value pairs in a single operation, storing
+        the values as given, without encoding them.
+
+        Args:
+            add_pairs (list of (str, bytes)): The key:value pairs to set.
+            del_keys (list of str, optional): The keys to remove.
+        """
+        raise NotImplementedError()
+
     def delete(self, key):
         """Removes a key:value from the database
 
@@ -66,6 +86,18 @@ class Database(object):
         """
         raise NotImplementedError()
 
+    def snapshot(self, buffers=False):
+        """Returns a DatabaseReader for a series of reads. Implementations
+        which support transactions bind the reader to a single consistent
+        snapshot of the database for as long as it is open.
+
+        Args:
+            buffers (bool): True if raw values may be returned as buffers
+                which are only valid while the reader is open, rather than
+                as copies.
+        """
+        return DatabaseReader(self)
+
     def sync(self):
         """Ensures that pending writes are flushed to disk
         """
@@ -82,6 +114,56 @@ class Database(object):
         raise NotImplementedError()
 
 
+class DatabaseReader(object):
+    """A context manager providing reads from a database. This reader
+    passes reads through to the database, and so is not isolated from
+    concurrent writes; implementations which support transactions provide
+    readers bound to a single snapshot.
+    """
+
+    def __init__(self, database):
+        self._database = database
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def __contains__(self, key):
+        return key in self._database
+
+    def get(self, key):
+        """Retrieves a value associated with a key from the database
+
+        Args:
+            key (str): The key to retrieve
+        """
+        return self._database.get(key)
+
+    def get_raw(self, key):
+        """Retrieves the bytes associated with a key from the database,
+        without decoding them.
+
+        Args:
+            key (str): The key to retrieve
+        """
+        return self._database.get_raw(key)
+
+    def scan(self, prefix='', start=None):
+        """Yields the (key, raw value) pairs whose keys begin with prefix,
+        in key order.
+
+        Args:
+            prefix (str): The key prefix to scan
+            start (str, optional): The key to resume the scan from; keys
+                ordered before it are skipped
+        """
+        for key in sorted(self._database.keys()):
+            if key.startswith(prefix) and (start is None or key >= start):
+                yield key, self._database.get_raw(key)
+
+
 class CachedDatabase(object):
     """
     Takes Database subclasses as argument to constructor
@@ -40,11 +40,17 @@ class DictDatabase(database.Database):
     def set_batch(self, add_pairs, del_keys=None):
         if del_keys is not None:
             for k in del_keys:
-                del self._data[k]
+                self._data.pop(k, None)
 
         for k, v in add_pairs:
             self._data[k] = v
 
+    def get_raw(self, key):
+        return self._data.get(key)
+
+    def set_batch_raw(self, add_pairs, del_keys=None):
+        self.set_batch(add_pairs, del_keys)
+
     def close(self):
         pass
 
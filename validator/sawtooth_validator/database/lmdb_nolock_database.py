@@ -14,11 +14,19 @@
 # ------------------------------------------------------------------------------
 
 import os
+from threading import Condition
+from threading import Thread
 import lmdb
 import cbor
 
 from sawtooth_validator.database import database
 
+# Durability policies: sync after every write, sync written data at most
+# every group_commit_interval seconds, or leave flushing to the OS.
+DURABILITY_SYNC = 'sync'
+DURABILITY_GROUP_COMMIT = 'group_commit'
+DURABILITY_OS = 'os'
+
 
 class LMDBNoLockDatabase(database.Database):
     """LMDBNoLockDatabase is an implementation of the
@@ -29,16 +37,27 @@ class LMDBNoLockDatabase(database.Database):
        _lmdb (lmdb.Environment): The underlying lmdb database.
     """
 
-    def __init__(self, filename, flag):
+    def __init__(self, filename, flag, durability=DURABILITY_SYNC,
+                 group_commit_interval=0.05):
         """Constructor for the LMDBNoLockDatabase class.
 
         Args:
             filename (str): The filename of the database file.
             flag (str): a flag indicating the mode for opening the database.
                 Refer to the documentation for anydbm.open().
+            durability (str): when writes are flushed to disk; one of
+                DURABILITY_SYNC, DURABILITY_GROUP_COMMIT or DURABILITY_OS.
+            group_commit_interval (float): the maximum time in seconds that
+                a write remains unflushed under DURABILITY_GROUP_COMMIT.
         """
         super(LMDBNoLockDatabase, self).__init__()
 
+        if durability not in (DURABILITY_SYNC,
+                              DURABILITY_GROUP_COMMIT,
+                              DURABILITY_OS):
+            raise ValueError(
+                'Unknown durability policy: {}'.format(durability))
+
         create = bool(flag == 'c')
 
         if flag == 'n':
@@ -54,12 +73,18 @@ class LMDBNoLockDatabase(database.Database):
                                       create=create,
                                       lock=True)
 
+        self._durability = durability
+        self._group_committer = None
+        if durability == DURABILITY_GROUP_COMMIT:
+            self._group_committer = _GroupCommitThread(
+                self._lmdb, group_commit_interval)
+            self._group_committer.start()
+
     def __len__(self):
-        with self._lmdb.begin() as txn:
-            return txn.stat()['entries']
+        return self._lmdb.stat()['entries']
 
     def __contains__(self, key):
-        with self._lmdb.begin() as txn:
+        with self._lmdb.begin(buffers=True) as txn:
             return bool(txn.get(key.encode()) is not None)
 
     def get(self, key):
@@ -92,7 +117,7 @@ class LMDBNoLockDatabase(database.Database):
         packed = cbor.dumps(value)
         with self._lmdb.begin(write=True, buffers=True) as txn:
             txn.put(key.encode(), packed, overwrite=True)
-        self.sync()
+        self._written()
 
     def set_batch(self, add_pairs, del_keys=None):
         with self._lmdb.begin(write=True, buffers=True) as txn:
@@ -102,7 +127,44 @@ class LMDBNoLockDatabase(database.Database):
             for k, v in add_pairs:
                 packed = cbor.dumps(v)
                 txn.put(k.encode(), packed, overwrite=True)
-        self.sync()
+        self._written()
+
+    def get_raw(self, key):
+        """Retrieves the bytes associated with a key from the database,
+        without decoding them.
+
+        Args:
+            key (str): The key to retrieve
+        """
+        with self._lmdb.begin() as txn:
+            return txn.get(key.encode())
+
+    def set_batch_raw(self, add_pairs, del_keys=None):
+        """Sets and removes key:value pairs in a single transaction, storing
+        the values as given, without encoding them.
+
+        Args:
+            add_pairs (list of (str, bytes)): The key:value pairs to set.
+            del_keys (list of str, optional): The keys to remove.
+        """
+        with self._lmdb.begin(write=True, buffers=True) as txn:
+            if del_keys is not None:
+                for k in del_keys:
+                    txn.delete(k.encode())
+            for k, v in add_pairs:
+                txn.put(k.encode(), v, overwrite=True)
+        self._written()
+
+    def snapshot(self, buffers=False):
+        """Returns a reader bound to a single read transaction, and so to a
+        consistent snapshot of the database, for as long as it is open.
+
+        Args:
+            buffers (bool): True if raw values should be returned as
+                zero-copy buffers, which are only valid while the reader is
+                open.
+        """
+        return LMDBReader(self._lmdb, buffers)
 
     def delete(self, key):
         """Removes a key:value from the database
@@ -113,6 +175,12 @@ class LMDBNoLockDatabase(database.Database):
         with self._lmdb.begin(write=True, buffers=True) as txn:
             txn.delete(key.encode())
 
+    def _written(self):
+        if self._durability == DURABILITY_SYNC:
+            self.sync()
+        elif self._group_committer is not None:
+            self._group_committer.mark_dirty()
+
     def sync(self):
         """Ensures that pending writes are flushed to disk
         """
@@ -121,10 +189,102 @@ class LMDBNoLockDatabase(database.Database):
     def close(self):
         """Closes the connection to the database
         """
+        if self._group_committer is not None:
+            self._group_committer.stop()
+            self._group_committer.join()
         self._lmdb.close()
 
     def keys(self):
         """Returns a list of keys in the database
         """
-        with self._lmdb.begin() as txn:
-            return [key.decode() for key, _ in txn.cursor()]
+        with self._lmdb.begin(buffers=True) as txn:
+            return [bytes(key).decode()
+                    for key in txn.cursor().iternext(values=False)]
+
+
+class LMDBReader(database.DatabaseReader):
+    """A DatabaseReader bound to a single LMDB read transaction.
+    """
+
+    def __init__(self, lmdb_env, buffers=False):
+        super(LMDBReader, self).__init__(None)
+        self._lmdb = lmdb_env
+        self._buffers = buffers
+        self._txn = None
+
+    def __enter__(self):
+        self._txn = self._lmdb.begin(buffers=self._buffers)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._txn.abort()
+        self._txn = None
+        return False
+
+    def __contains__(self, key):
+        return self._txn.get(key.encode()) is not None
+
+    def get(self, key):
+        packed = self._txn.get(key.encode())
+        if packed is not None:
+            return cbor.loads(bytes(packed))
+
+    def get_raw(self, key):
+        return self._txn.get(key.encode())
+
+    def scan(self, prefix='', start=None):
+        """Yields the (key, raw value) pairs whose keys begin with prefix,
+        in key order, using a cursor positioned at the prefix, or at start.
+
+        Args:
+            prefix (str): The key prefix to scan
+            start (str, optional): The key to resume the scan from; keys
+                ordered before it are skipped
+        """
+        cursor = self._txn.cursor()
+        if start is None or start < prefix:
+            start = prefix
+        if not cursor.set_range(start.encode()):
+            return
+        for key, value in cursor:
+            key = bytes(key).decode()
+            if not key.startswith(prefix):
+                return
+            yield key, value
+
+
+class _GroupCommitThread(Thread):
+    """Flushes an LMDB environment at most once per interval, and only when
+    it has been written to since the last flush.
+    """
+
+    def __init__(self, lmdb_env, interval):
+        super(_GroupCommitThread, self).__init__(name='_GroupCommitThread')
+        self.daemon = True
+        self._lmdb = lmdb_env
+        self._interval = interval
+        self._condition = Condition()
+        self._dirty = False
+        self._exit = False
+
+    def mark_dirty(self):
+        with self._condition:
+            self._dirty = True
+            self._condition.notify()
+
+    def run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._dirty or self._exit)
+                if self._exit and not self._dirty:
+                    return
+                self._dirty = False
+            self._lmdb.sync()
+            # Writes made during the interval are flushed together at its end
+            with self._condition:
+                self._condition.wait_for(lambda: self._exit, self._interval)
+
+    def stop(self):
+        with self._condition:
+            self._exit = True
+            self._condition.notify()
@@ -0,0 +1,169 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Migrates LMDB database files written before values were stored in raw
+form.
+
+Older validators CBOR-encoded every value on write, including values which
+were already encoded bytes (merkle nodes, serialized blocks and state delta
+sets) and block id references. This tool rewrites such values in place as
+the raw bytes the MerkleDatabase, BlockStore and StateDeltaStore now expect.
+Values which are already raw are left untouched, so the migration may be
+safely re-run. Migrated databases are marked with their format, which the
+validator checks on startup.
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+import cbor
+import lmdb
+
+from sawtooth_validator.exceptions import LocalConfigurationError
+
+LOGGER = logging.getLogger(__name__)
+
+# number of values rewritten per write transaction
+_MIGRATION_BATCH_SIZE = 10000
+
+# the key recording the format of the values of a database, written by the
+# migration and when the validator creates a database
+FORMAT_KEY = '~database-format'
+
+# the format of databases whose values are stored in raw form
+RAW_FORMAT = b'raw-1'
+
+
+def unwrap_value(value):
+    """Returns the raw form of a value written by the CBOR-encoding
+    database, or None if the value is already raw.
+
+    Args:
+        value (bytes): the value as stored
+
+    Returns:
+        bytes: the raw value, or None if no migration is required
+    """
+    try:
+        decoded = cbor.loads(value)
+    # pylint: disable=broad-except
+    except Exception:
+        return None
+
+    if not isinstance(decoded, (bytes, str)):
+        return None
+
+    # Only values which are exactly a CBOR string are migrated; raw values
+    # may coincidentally begin with a valid CBOR item.
+    if cbor.dumps(decoded) != bytes(value):
+        return None
+
+    if isinstance(decoded, str):
+        return decoded.encode()
+    return decoded
+
+
+def migrate_database(filename):
+    """Rewrites the values of the given LMDB database file in raw form.
+
+    Args:
+        filename (str): the path to the database file
+
+    Returns:
+        int: the number of values rewritten
+    """
+    env = lmdb.Environment(path=filename,
+                           map_size=1024**4,
+                           writemap=True,
+                           subdir=False,
+                           create=False,
+                           lock=True)
+    try:
+        with env.begin() as txn:
+            keys = [key for key, _ in txn.cursor()]
+
+        migrated = 0
+        for i in range(0, len(keys), _MIGRATION_BATCH_SIZE):
+            with env.begin(write=True) as txn:
+                for key in keys[i:i + _MIGRATION_BATCH_SIZE]:
+                    raw = unwrap_value(txn.get(key))
+                    if raw is not None:
+                        txn.put(key, raw, overwrite=True)
+                        migrated += 1
+        with env.begin(write=True) as txn:
+            txn.put(FORMAT_KEY.encode(), RAW_FORMAT, overwrite=True)
+        env.sync()
+    finally:
+        env.close()
+
+    return migrated
+
+
+def check_database_format(database, filename):
+    """Verifies that a database stores its values in raw form. A database
+    which is still empty is marked as doing so.
+
+    Args:
+        database (:obj:`Database`): the opened database
+        filename (str): the path to the database file, for reporting
+
+    Raises:
+        LocalConfigurationError: if the database was written by an older
+            validator and has not been migrated
+    """
+    db_format = database.get_raw(FORMAT_KEY)
+    if db_format is not None and bytes(db_format) == RAW_FORMAT:
+        return
+
+    if db_format is None and len(database) == 0:
+        database.set_batch_raw([(FORMAT_KEY, RAW_FORMAT)])
+        return
+
+    raise LocalConfigurationError(
+        'Database {} was written by an older validator; run '
+        'validator-migrate-db on it before starting the '
+        'validator'.format(filename))
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        description='Migrates validator database files (merkle-*.lmdb, '
+                    'block-*.lmdb and state-deltas-*.lmdb) to raw value '
+                    'storage. The validator must not be running.')
+
+    parser.add_argument('files',
+                        help='The database files to migrate',
+                        nargs='+',
+                        type=str)
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    if args is None:
+        args = sys.argv[1:]
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    opts = parse_args(args)
+
+    for filename in opts.files:
+        if not os.path.isfile(filename):
+            LOGGER.error('No such database file: %s', filename)
+            sys.exit(1)
+
+    for filename in opts.files:
+        migrated = migrate_database(filename)
+        LOGGER.info('%s: migrated %s values', filename, migrated)
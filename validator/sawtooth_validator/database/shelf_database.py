@@ -80,6 +80,17 @@ class ShelfDatabase(database.Database):
         with self._lock:
             self._shelf[key] = value
 
+    def get_raw(self, key):
+        return self.get(key)
+
+    def set_batch_raw(self, add_pairs, del_keys=None):
+        with self._lock:
+            if del_keys is not None:
+                for k in del_keys:
+                    del self._shelf[k]
+            for k, v in add_pairs:
+                self._shelf[k] = v
+
     def delete(self, key):
         """Removes a key:value from the database
 
@@ -67,6 +67,9 @@ class StateContext(object):
         self._write_list = set(write_list)
 
         self._state = {}
+        # the sequence number of the write which produced each address's
+        # value; addresses read from the merkle tree are absent
+        self._write_sequences = {}
         self.base_context_ids = base_context_ids
 
         self._id = uuid.uuid4().hex
@@ -116,6 +119,15 @@ class StateContext(object):
         for add, val in address_value_dict.items():
             self._state.get(add).set_result(val, from_tree=from_tree)
 
+    def get_write_sequence(self, address):
+        """Returns the sequence number of the write which produced the value
+        of address in this context, or 0 if it was read from the merkle tree.
+        """
+        return self._write_sequences.get(address, 0)
+
+    def set_write_sequences(self, address_sequence_dict):
+        self._write_sequences.update(address_sequence_dict)
+
     def get_writable_address_value_dict(self):
         add_value_dict = {}
         for add, val in self._state.items():
@@ -179,6 +191,9 @@ class ContextManager(object):
         self._first_merkle_root = None
         self._contexts = _ThreadsafeContexts()
 
+        self._write_sequence = 0
+        self._write_sequence_lock = Lock()
+
         self._address_queue = Queue()
 
         self._inflated_addresses = Queue()
@@ -227,10 +242,17 @@ class ContextManager(object):
                 "that are not in context manager".format(
                     contexts_asked_not_found))
         base_context_list = [self._contexts[cid] for cid in base_contexts]
-        # Get the state from the base contexts
+        # Get the state from the base contexts. Where base contexts disagree
+        # on an address, the value from the latest write wins; a write
+        # always follows any conflicting write it is scheduled after.
         prior_state = dict()
+        prior_sequences = dict()
         for base_context in base_context_list:
-            prior_state.update(base_context.get_state())
+            for address, val_fut in base_context.get_state().items():
+                sequence = base_context.get_write_sequence(address)
+                if sequence >= prior_sequences.get(address, 0):
+                    prior_state[address] = val_fut
+                    prior_sequences[address] = sequence
 
         addresses_already_in_state = set(prior_state.keys())
         reads = set(inputs) - addresses_already_in_state
@@ -245,6 +267,8 @@ class ContextManager(object):
             prior_state_results[k] = value
 
         context.set_futures(prior_state_results)
+        context.set_write_sequences(
+            {k: seq for k, seq in prior_sequences.items() if seq > 0})
 
         if len(reads) > 0:
             self._address_queue.put_nowait(
@@ -312,27 +336,38 @@ class ContextManager(object):
             for add, val in d.items():
                 add_value_dict[add] = val
         context.set_futures(add_value_dict)
+        with self._write_sequence_lock:
+            self._write_sequence += 1
+            sequence = self._write_sequence
+        context.set_write_sequences({add: sequence for add in add_value_dict})
         return True
 
     def get_squash_handler(self):
         def _squash(state_root, context_ids, persist):
             tree = MerkleDatabase(self._database, state_root)
-            updates = dict()
+            values = dict()
+            sequences = dict()
             for c_id in context_ids:
                 context = self._contexts[c_id]
-                for add in context.get_state().keys():
-                    if add in updates:
-                        raise SquashException(
-                            "Duplicate address {} in context {}".format(
-                                add, c_id))
-
-                effective_updates = {}
-                for k, val_fut in context.get_state().items():
+                # Contexts may share an address, as when both are based on
+                # a common context. Where they disagree on its value, the
+                # value from the latest write wins, as in create_context;
+                # values from the same write must agree.
+                for add, val_fut in context.get_state().items():
                     value = val_fut.result()
-                    if value is not None:
-                        effective_updates[k] = value
-
-                updates.update(effective_updates)
+                    sequence = context.get_write_sequence(add)
+                    if add in values:
+                        if sequence == sequences[add] \
+                                and value != values[add]:
+                            raise SquashException(
+                                "Duplicate address {} in context {}".format(
+                                    add, c_id))
+                        if sequence <= sequences[add]:
+                            continue
+                    values[add] = value
+                    sequences[add] = sequence
+
+            updates = {k: v for k, v in values.items() if v is not None}
 
             if len(updates) == 0:
                 return state_root
@@ -13,16 +13,20 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
-from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import json
 import logging
 import threading
+import time
 import queue
 
 from sawtooth_validator.protobuf import processor_pb2
 from sawtooth_validator.protobuf import transaction_pb2
 from sawtooth_validator.protobuf import validator_pb2
 
+from sawtooth_validator.concurrent.threadpool import \
+    InstrumentedThreadPoolExecutor
+from sawtooth_validator.execution.scheduler_parallel import ParallelScheduler
 from sawtooth_validator.execution.scheduler_serial import SerialScheduler
 from sawtooth_validator.execution import processor_iterator
 
@@ -30,6 +34,28 @@ from sawtooth_validator.execution import processor_iterator
 LOGGER = logging.getLogger(__name__)
 
 
+def _parse_transaction_families(transaction_families):
+    """Parses the sawtooth.validator.transaction_families setting, a json
+    array of the required transaction processors.
+
+    Returns:
+        list of ProcessorType: the required transaction processors; if the
+            setting is misconfigured, none are required
+    """
+    try:
+        return [
+            processor_iterator.ProcessorType(
+                d.get('family'),
+                d.get('version'),
+                d.get('encoding'))
+            for d in json.loads(transaction_families)]
+    except (ValueError, AttributeError, TypeError):
+        LOGGER.warning("sawtooth.validator.transaction_families "
+                       "misconfigured. Expecting a json array, found"
+                       " %s", transaction_families)
+        return []
+
+
 class TransactionExecutorThread(object):
     """A thread of execution controlled by the TransactionExecutor.
     Provides the functionality that the journal can process on several
@@ -41,7 +67,8 @@ class TransactionExecutorThread(object):
                  scheduler,
                  processors,
                  waiting_threadpool,
-                 config_view_factory):
+                 config_view_factory,
+                 processor_load):
         """
 
         Args:
@@ -57,6 +84,8 @@ class TransactionExecutorThread(object):
                 indefinite waiting functions in.
             config_view_factory (ConfigViewFactory): Read the configuration
                 state
+            processor_load (ProcessorLoad): Counts the requests sent to
+                transaction processors, and measures their latency.
         Attributes:
             _tp_config_key (str): the key used to reference the part of state
                 where the list of required transaction processors are.
@@ -70,13 +99,21 @@ class TransactionExecutorThread(object):
         self._tp_config_key = "sawtooth.validator.transaction_families"
         self._waiters_by_type = _WaitersByType()
         self._waiting_threadpool = waiting_threadpool
+        self._processor_load = processor_load
+        self._config_view = None
+        self._config_view_state_hash = None
         self._done = False
 
-    def _future_done_callback(self, request, result):
+    def _future_done_callback(self, request, result, connection_id,
+                              sent_time):
         """
         :param request (bytes):the serialized request
         :param result (FutureResult):
+        :param connection_id (str): the connection the request was sent to
+        :param sent_time (float): the time the request was sent
         """
+        self._processor_load.request_answered(
+            connection_id, time.time() - sent_time)
         req = processor_pb2.TpProcessRequest()
         req.ParseFromString(request)
 
@@ -102,28 +139,15 @@ class TransactionExecutorThread(object):
                 header.family_version,
                 header.payload_encoding)
 
-            config = self._config_view_factory.create_config_view(
-                txn_info.state_hash)
-            transaction_families = config.get_setting(
+            if self._config_view_state_hash != txn_info.state_hash:
+                self._config_view = \
+                    self._config_view_factory.create_config_view(
+                        txn_info.state_hash)
+                self._config_view_state_hash = txn_info.state_hash
+            required_transaction_processors = self._config_view.get_setting(
                 key=self._tp_config_key,
-                default_value="[]")
-
-            # After reading the transaction families required in configuration
-            # try to json.loads them into a python object
-            # If there is a misconfiguration, proceed as if there is no
-            # configuration.
-            try:
-                transaction_families = json.loads(transaction_families)
-                required_transaction_processors = [
-                    processor_iterator.ProcessorType(
-                        d.get('family'),
-                        d.get('version'),
-                        d.get('encoding')) for d in transaction_families]
-            except ValueError:
-                LOGGER.warning("sawtooth.validator.transaction_families "
-                               "misconfigured. Expecting a json array, found"
-                               " %s", transaction_families)
-                required_transaction_processors = []
+                default_value=[],
+                value_type=_parse_transaction_families)
 
             # First check if the transaction should be failed
             # based on configuration
@@ -189,10 +213,13 @@ class TransactionExecutorThread(object):
             self._send_and_process_result(content, connection_id)
 
     def _send_and_process_result(self, content, connection_id):
+        self._processor_load.request_sent(connection_id)
         self._service.send(validator_pb2.Message.TP_PROCESS_REQUEST,
                            content,
                            connection_id=connection_id,
-                           callback=self._future_done_callback)
+                           callback=partial(self._future_done_callback,
+                                            connection_id=connection_id,
+                                            sent_time=time.time()))
 
     def is_done(self):
         return self._done and len(self._waiters_by_type) == 0
@@ -204,7 +231,14 @@ class TransactionExecutorThread(object):
 
 
 class TransactionExecutor(object):
-    def __init__(self, service, context_manager, config_view_factory):
+    def __init__(self,
+                 service,
+                 context_manager,
+                 config_view_factory,
+                 waiting_threadpool_workers=3,
+                 executing_threadpool_workers=5,
+                 max_executing_workers=None,
+                 processor_routing='round_robin'):
         """
 
         Args:
@@ -212,22 +246,63 @@ class TransactionExecutor(object):
             context_manager (ContextManager): Cache of state for tps
             config_view_factory (ConfigViewFactory): Read-only view of config
                 state.
+            waiting_threadpool_workers (int): The number of threads waiting
+                for transaction processors to register.
+            executing_threadpool_workers (int): The number of threads
+                executing schedulers.
+            max_executing_workers (int): If greater than
+                executing_threadpool_workers, the number of threads the
+                executing threadpool may grow to, while schedulers are
+                waiting for a thread and the transaction processors have
+                idle capacity.
+            processor_routing (str): How transactions are routed among the
+                transaction processors of a type: 'round_robin', in turn,
+                or 'least_loaded', to the processor expected to answer
+                soonest given its requests in flight and recent latency.
         Attributes:
             processors (ProcessorIteratorCollection): All of the registered
                 transaction processors and a way to find the next one to send
                 to.
-            _waiting_threadpool (ThreadPoolExecutor): A threadpool to run
-                waiting to process transactions functions in.
+            _waiting_threadpool (InstrumentedThreadPoolExecutor): A threadpool
+                to run waiting to process transactions functions in.
+            _executing_threadpool (InstrumentedThreadPoolExecutor): A
+                threadpool to run the execution of each scheduler in.
             _waiters_by_type (_WaitersByType): Threadsafe map of ProcessorType
                 to _Waiter that is waiting on a processor of that type.
+            _scheduler_config_key (str): the key of the setting which
+                selects the scheduler used to execute blocks.
+            _serial_window_config_key (str): the key of the setting which
+                sets how many transactions the serial scheduler may schedule
+                ahead of their predecessors' results.
         """
         self._service = service
         self._context_manager = context_manager
+        self._processor_load = processor_iterator.ProcessorLoad(
+            on_request_answered=self._grow_executing_threadpool)
+        if processor_routing == 'least_loaded':
+            processor_iterator_class = partial(
+                processor_iterator.LeastLoadedProcessorIterator,
+                self._processor_load)
+        else:
+            if processor_routing != 'round_robin':
+                LOGGER.warning("Unknown processor routing %s; using "
+                               "'round_robin'", processor_routing)
+            processor_iterator_class = \
+                processor_iterator.RoundRobinProcessorIterator
         self.processors = processor_iterator.ProcessorIteratorCollection(
-            processor_iterator.RoundRobinProcessorIterator)
+            processor_iterator_class,
+            processor_load=self._processor_load)
         self._config_view_factory = config_view_factory
-        self._waiting_threadpool = ThreadPoolExecutor(max_workers=3)
-        self._executing_threadpool = ThreadPoolExecutor(max_workers=5)
+        self._scheduler_config_key = "sawtooth.validator.scheduler"
+        self._serial_window_config_key = \
+            "sawtooth.validator.serial_scheduler_window"
+        self._waiting_threadpool = InstrumentedThreadPoolExecutor(
+            max_workers=waiting_threadpool_workers,
+            name='Waiting')
+        self._executing_threadpool = InstrumentedThreadPoolExecutor(
+            max_workers=executing_threadpool_workers,
+            name='Executing')
+        self._max_executing_workers = max_executing_workers
         self._alive_threads = []
         self._lock = threading.Lock()
 
@@ -235,9 +310,44 @@ class TransactionExecutor(object):
                          squash_handler,
                          first_state_root,
                          always_persist=False):
+        """Creates the scheduler configured by the
+        sawtooth.validator.scheduler setting in the state at
+        first_state_root: either 'serial', the default, or 'parallel'. The
+        window size of a serial scheduler is set by the
+        sawtooth.validator.serial_scheduler_window setting, by default 1.
+        """
+        config = self._config_view_factory.create_config_view(
+            first_state_root)
+        scheduler_type = config.get_setting(
+            key=self._scheduler_config_key,
+            default_value='serial')
+
+        if scheduler_type == 'parallel':
+            return ParallelScheduler(squash_handler=squash_handler,
+                                     first_state_hash=first_state_root,
+                                     always_persist=always_persist)
+
+        if scheduler_type != 'serial':
+            LOGGER.warning("%s misconfigured. Expecting 'serial' or "
+                           "'parallel', found %s; using 'serial'",
+                           self._scheduler_config_key, scheduler_type)
+
+        window_setting = config.get_setting(
+            key=self._serial_window_config_key,
+            default_value='1')
+        try:
+            window_size = int(window_setting)
+        except ValueError:
+            window_size = 0
+        if window_size < 1:
+            LOGGER.warning("%s misconfigured. Expecting a positive integer, "
+                           "found %s; using 1",
+                           self._serial_window_config_key, window_setting)
+            window_size = 1
         return SerialScheduler(squash_handler=squash_handler,
                                first_state_hash=first_state_root,
-                               always_persist=always_persist)
+                               always_persist=always_persist,
+                               window_size=window_size)
 
     def _remove_done_threads(self):
         for t in self._alive_threads.copy():
@@ -258,10 +368,53 @@ class TransactionExecutor(object):
             scheduler=scheduler,
             processors=self.processors,
             waiting_threadpool=self._waiting_threadpool,
-            config_view_factory=self._config_view_factory)
+            config_view_factory=self._config_view_factory,
+            processor_load=self._processor_load)
         self._executing_threadpool.submit(t.execute_thread)
         with self._lock:
             self._alive_threads.append(t)
+        self._grow_executing_threadpool()
+
+    def _grow_executing_threadpool(self):
+        """Adds a thread to the executing threadpool if a scheduler is
+        waiting for one, the pool may grow, and there are fewer requests
+        in progress than registered transaction processors.
+        """
+        if self._max_executing_workers is None:
+            return
+
+        with self._lock:
+            metrics = self._executing_threadpool.get_metrics()
+            if metrics.queue_depth == 0 or metrics.max_workers >= \
+                    self._max_executing_workers:
+                return
+            if self._processor_load.in_flight() >= \
+                    self.processors.count_processors():
+                return
+
+            LOGGER.debug("Growing the executing threadpool to %s threads",
+                         metrics.max_workers + 1)
+            self._executing_threadpool.set_max_workers(
+                metrics.max_workers + 1)
+
+    def get_thread_pool_metrics(self):
+        """Returns the metrics of the executor's threadpools.
+
+        Returns:
+            list of ThreadPoolMetrics: the waiting and executing threadpool
+                metrics
+        """
+        return [self._waiting_threadpool.get_metrics(),
+                self._executing_threadpool.get_metrics()]
+
+    def get_processor_stats(self):
+        """Returns the load of the transaction processors.
+
+        Returns:
+            list of ProcessorStats: the requests in flight to, and the
+                recent latency of, each transaction processor
+        """
+        return self._processor_load.get_stats()
 
     def stop(self):
         self._cancel_threads()
@@ -15,8 +15,10 @@
 
 from abc import ABCMeta
 from abc import abstractmethod
+from collections import namedtuple
 import itertools
 import logging
+from threading import Lock
 from threading import RLock
 from threading import Condition
 
@@ -24,18 +26,32 @@ from threading import Condition
 LOGGER = logging.getLogger(__name__)
 
 
+ProcessorStats = namedtuple(
+    'ProcessorStats',
+    ['connection_id', 'in_flight', 'latency'])
+
+
 class ProcessorIteratorCollection(object):
     """Contains all of the registered (added via __setitem__)
     transaction processors in a _processors (dict) where the keys
     are ProcessorTypes and the values are ProcessorIterators.
     """
 
-    def __init__(self, processor_iterator_class):
+    def __init__(self, processor_iterator_class, processor_load=None):
+        """
+        Args:
+            processor_iterator_class (function): Creates, without
+                arguments, the ProcessorIterator of a ProcessorType.
+            processor_load (ProcessorLoad, optional): The load of the
+                transaction processors, which is forgotten when a
+                transaction processor is removed.
+        """
         # bytes: list of ProcessorType
         self._identities = {}
         # ProcessorType: ProcessorIterator
         self._processors = {}
         self._proc_iter_class = processor_iterator_class
+        self._processor_load = processor_load
         self._condition = Condition()
 
     def __getitem__(self, item):
@@ -97,7 +113,9 @@ class ProcessorIteratorCollection(object):
                 processor.
         """
         with self._condition:
-            processor_types = self._identities.get(processor_identity)
+            if self._processor_load is not None:
+                self._processor_load.remove(processor_identity)
+            processor_types = self._identities.pop(processor_identity, None)
             if processor_types is None:
                 LOGGER.warning("transaction processor with identity %s tried "
                                "to unregister but was not registered",
@@ -115,6 +133,13 @@ class ProcessorIteratorCollection(object):
                 if len(self._processors[processor_type]) == 0:
                     del self._processors[processor_type]
 
+    def count_processors(self):
+        """Returns the number of registered transaction processors, counting
+        a transaction processor registered for several types once.
+        """
+        with self._condition:
+            return len(self._identities)
+
     def __repr__(self):
         return ",".join([repr(k) for k in self._processors.keys()])
 
@@ -255,3 +280,146 @@ class RoundRobinProcessorIterator(ProcessorIterator):
     def __len__(self):
         with self._lock:
             return len(self._processors)
+
+
+class LeastLoadedProcessorIterator(ProcessorIterator):
+    """Returns the processor expected to answer a new request soonest, by
+    the ProcessorLoad's expected_wait, then the processor with the fewest
+    requests in flight. Remaining ties are broken by rotating through the
+    processors.
+    """
+    def __init__(self, processor_load):
+        """
+        Args:
+            processor_load (ProcessorLoad): The load of the transaction
+                processors, shared by every LeastLoadedProcessorIterator.
+        """
+        self._processor_load = processor_load
+        self._processors = []
+        self._offset = 0
+        self._lock = RLock()
+
+    def __next__(self):
+        with self._lock:
+            count = len(self._processors)
+            self._offset = (self._offset + 1) % count
+            best = None
+            best_load = None
+            for i in range(count):
+                processor = self._processors[(self._offset + i) % count]
+                load = (
+                    self._processor_load.expected_wait(
+                        processor.connection_id),
+                    self._processor_load.in_flight(processor.connection_id))
+                if best is None or load < best_load:
+                    best = processor
+                    best_load = load
+            return best
+
+    def __repr__(self):
+        with self._lock:
+            return repr(self._processors)
+
+    def add_processor(self, processor):
+        with self._lock:
+            self._processors.append(processor)
+
+    def remove_processor(self, processor_identity):
+        with self._lock:
+            self._processors = [p for p in self._processors
+                                if p.connection_id != processor_identity]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._processors)
+
+
+class ProcessorLoad(object):
+    """Threadsafe count of the requests sent to transaction processors which
+    have not yet been answered, in total and by connection id, and the
+    recent latency of each transaction processor's answers.
+    """
+    def __init__(self, on_request_answered=None, latency_weight=0.2):
+        """
+        Args:
+            on_request_answered (function): Called, without arguments, after
+                each request is answered.
+            latency_weight (float): The weight of each answer's latency in
+                the moving average of a transaction processor's latency.
+        """
+        self._in_flight = 0
+        # connection id: [in flight, latency]
+        self._by_connection = {}
+        self._latency_weight = latency_weight
+        self._on_request_answered = on_request_answered
+        self._lock = Lock()
+
+    def request_sent(self, connection_id):
+        with self._lock:
+            self._in_flight += 1
+            self._by_connection.setdefault(connection_id, [0, None])[0] += 1
+
+    def request_answered(self, connection_id, latency):
+        """
+        Args:
+            connection_id (str): The connection the request was sent to.
+            latency (float): The seconds between sending the request and
+                its answer.
+        """
+        with self._lock:
+            self._in_flight -= 1
+            load = self._by_connection.get(connection_id)
+            if load is not None:
+                load[0] -= 1
+                if load[1] is None:
+                    load[1] = latency
+                else:
+                    load[1] += self._latency_weight * (latency - load[1])
+        if self._on_request_answered is not None:
+            self._on_request_answered()
+
+    def remove(self, connection_id):
+        """Forgets the load of a transaction processor. Answers to requests
+        already sent to it are still counted in the total in flight.
+        """
+        with self._lock:
+            self._by_connection.pop(connection_id, None)
+
+    def in_flight(self, connection_id=None):
+        """Returns the requests in flight to a transaction processor, or if
+        connection_id is None, to all transaction processors.
+        """
+        with self._lock:
+            if connection_id is None:
+                return self._in_flight
+            return self._by_connection.get(connection_id, (0, None))[0]
+
+    def expected_wait(self, connection_id):
+        """Returns the estimated seconds for a transaction processor to
+        answer another request: its latency times the number of requests
+        it would have in flight. Until an answer from it is measured, its
+        latency is taken to be the mean of the measured latencies.
+        """
+        with self._lock:
+            in_flight, latency = self._by_connection.get(
+                connection_id, (0, None))
+            if latency is None:
+                measured = [lat for _, lat in self._by_connection.values()
+                            if lat is not None]
+                if not measured:
+                    return 0
+                latency = sum(measured) / len(measured)
+            return (in_flight + 1) * latency
+
+    def get_stats(self):
+        """
+        Returns:
+            list of ProcessorStats: the requests in flight to, and the
+                latency of, each transaction processor a request has been
+                sent to, in connection id order; latency is None until an
+                answer is measured
+        """
+        with self._lock:
+            return [ProcessorStats(connection_id, in_flight, latency)
+                    for connection_id, (in_flight, latency)
+                    in sorted(self._by_connection.items())]
@@ -14,14 +14,33 @@
 # ------------------------------------------------------------------------------
 
 from ast import literal_eval
-from collections import deque
+from threading import Condition
+
+from sawtooth_validator.protobuf.transaction_pb2 import TransactionHeader
+
+from sawtooth_validator.execution.scheduler import BatchExecutionResult
+from sawtooth_validator.execution.scheduler import TxnInformation
+from sawtooth_validator.execution.scheduler import Scheduler
+from sawtooth_validator.execution.scheduler import SchedulerIterator
+from sawtooth_validator.execution.scheduler_exceptions import SchedulerError
 
 
 class PredecessorTreeNode:
+    """A node of the PredecessorTree.
+
+    Alongside its own readers and writer, each node caches a summary of the
+    readers and writers of the nodes below it, so that the transactions
+    under an address can be found without visiting every node below it.
+    The summary is discarded when a node below changes, and is computed
+    again, from the summaries of the children, when next needed.
+    """
+    __slots__ = ['children', 'readers', 'writer', 'summary']
+
     def __init__(self, children=None, readers=None, writer=None):
         self.children = children if children is not None else {}
         self.readers = readers if readers is not None else []
         self.writer = writer
+        self.summary = None if self.children else _EMPTY_SUMMARY
 
     def __repr__(self):
         retval = {}
@@ -36,8 +55,45 @@ class PredecessorTreeNode:
 
         return repr(retval)
 
+    def summarize(self):
+        """Returns the readers and writers of the nodes below this node.
+
+        Returns:
+            (set, set): the readers and the writers, which must not be
+                modified
+        """
+        if self.summary is None and len(self.children) == 1:
+            # Addresses mostly branch into long chains of single children,
+            # which can share the summary of the node below them.
+            child, = self.children.values()
+            if not child.readers and child.writer is None:
+                self.summary = child.summarize()
+
+        if self.summary is None:
+            readers = set()
+            writers = set()
+            for child in self.children.values():
+                child_readers, child_writers = child.summarize()
+                readers.update(child.readers)
+                readers.update(child_readers)
+                if child.writer is not None:
+                    writers.add(child.writer)
+                writers.update(child_writers)
+            self.summary = (readers, writers)
+
+        return self.summary
+
+
+_EMPTY_SUMMARY = (frozenset(), frozenset())
+
 
 class PredecessorTree:
+    """A radix tree of the readers and writers of addresses, used to find
+    the transactions which a read or write of an address must follow.
+
+    Readers and writers may be any hashable transaction identifier; the
+    ParallelScheduler uses the integer index of each transaction.
+    """
     def __init__(self, token_size=2):
         self._token_size = token_size
         self._root = PredecessorTreeNode()
@@ -65,18 +121,34 @@ class PredecessorTree:
 
         return node
 
+    def _get_for_update(self, address):
+        """Returns the node at address, creating any nodes which do not
+        exist, and discards the summaries of the nodes above it.
+        """
+        node = self._root
+        for token in self._tokenize_address(address):
+            node.summary = None
+            child = node.children.get(token)
+            if child is None:
+                child = PredecessorTreeNode()
+                node.children[token] = child
+            node = child
+
+        return node
+
     def get(self, address):
         return self._get(address)
 
     def add_reader(self, address, reader):
-        node = self._get(address, create=True)
+        node = self._get_for_update(address)
         node.readers.append(reader)
 
     def set_writer(self, address, writer):
-        node = self._get(address, create=True)
+        node = self._get_for_update(address)
         node.readers = []
         node.writer = writer
         node.children = {}
+        node.summary = _EMPTY_SUMMARY
 
     def find_write_predecessors(self, address):
         """Returns all predecessor transaction ids for a write of the provided
@@ -127,7 +199,7 @@ class PredecessorTree:
         enclosing_writer = node.writer  # possibly None
 
         # the readers at the root node will always be added
-        predecessors.update(set(node.readers))
+        predecessors.update(node.readers)
 
         for token in tokens:
             # If the address isn't on the tree, then there aren't any
@@ -142,7 +214,7 @@ class PredecessorTree:
             node = node.children[token]
 
             # add enclosing readers directly to predecessors
-            predecessors.update(set(node.readers))
+            predecessors.update(node.readers)
 
             if node.writer is not None:
                 enclosing_writer = node.writer
@@ -150,17 +222,12 @@ class PredecessorTree:
         if enclosing_writer is not None:
             predecessors.add(enclosing_writer)
 
-        # Next, descend down the tree starting at the address node and find
-        # all children writers and readers.  Uses breadth first search.
+        # Next, add all children writers and readers, from the summaries kept
+        # at the address node.
 
-        to_process = deque()
-        to_process.extendleft(node.children.values())
-        while len(to_process) > 0:
-            node = to_process.pop()
-            predecessors.update(node.readers)
-            if node.writer is not None:
-                predecessors.add(node.writer)
-            to_process.extendleft(node.children.values())
+        subtree_readers, subtree_writers = node.summarize()
+        predecessors.update(subtree_readers)
+        predecessors.update(subtree_writers)
 
         return predecessors
 
@@ -224,15 +291,324 @@ class PredecessorTree:
         if enclosing_writer is not None:
             predecessors.add(enclosing_writer)
 
-        # Next, descend down the tree starting at the address node and find
-        # all children writers.  Uses breadth first search.
+        # Next, add all children writers, from the summary kept at the
+        # address node.
 
-        to_process = deque()
-        to_process.extendleft(node.children.values())
-        while len(to_process) > 0:
-            node = to_process.pop()
-            if node.writer is not None:
-                predecessors.add(node.writer)
-            to_process.extendleft(node.children.values())
+        _, subtree_writers = node.summarize()
+        predecessors.update(subtree_writers)
 
         return predecessors
+
+
+class ParallelScheduler(Scheduler):
+    """Scheduler which executes transactions concurrently, where their inputs
+    and outputs allow it, while producing the same state as executing them
+    serially in the order their batches were added.
+
+    Each transaction's predecessors, the earlier transactions it must follow,
+    are found with a PredecessorTree over the transaction inputs and outputs.
+    A transaction is scheduled once the contexts it is to be based on are
+    known: those of its predecessors in its own batch, which must have
+    completed, and those of its predecessors in other batches, which must
+    have been found valid or invalid as a whole. In place of a predecessor in
+    an invalid batch, the transaction is based on that predecessor's own
+    predecessors.
+
+    State hashes are computed once all batches have been found valid or
+    invalid, for each batch added with an expected state hash and for the
+    last valid batch. Only the last of these is persisted.
+    """
+    def __init__(self, squash_handler, first_state_hash, always_persist):
+        self._squash = squash_handler
+        self._first_state_hash = first_state_hash
+        self._always_persist = always_persist
+        self._condition = Condition()
+
+        # transactions are identified in the predecessor tree by their
+        # index, in the order added
+        self._predecessor_tree = PredecessorTree()
+        self._txn_signatures = []
+        self._txn_indexes = {}
+        self._txn_predecessors = []
+        self._txn_to_batch = {}
+        # batch signatures, in the order added
+        self._batches = []
+        self._batch_txns = {}
+        # The state hashes here are the ones added in add_batch, and
+        # are the state hashes that correspond with block boundaries.
+        self._required_state_hashes = {}
+
+        # transactions which have not been scheduled, in the order added
+        self._unscheduled = []
+        self._scheduled_transactions = []
+        self._in_progress = set()
+        # context ids of the transactions which have completed validly
+        self._txn_contexts = {}
+        self._txn_base_contexts = {}
+        # batch signature to True or False, once the batch is known to be
+        # valid or invalid
+        self._batch_validity = {}
+        self._batch_statuses = {}
+
+        self._final = False
+        self._complete = False
+        self._cancelled = False
+
+    def __del__(self):
+        self.cancel()
+
+    def __iter__(self):
+        return SchedulerIterator(self, self._condition)
+
+    def add_batch(self, batch, state_hash=None):
+        with self._condition:
+            if self._final:
+                raise SchedulerError("Scheduler is finalized. Cannnot take"
+                                     " new batches")
+            batch_signature = batch.header_signature
+            if state_hash is not None:
+                self._required_state_hashes[batch_signature] = state_hash
+            self._batches.append(batch_signature)
+            self._batch_txns[batch_signature] = \
+                [txn.header_signature for txn in batch.transactions]
+
+            for txn in batch.transactions:
+                txn_signature = txn.header_signature
+                txn_index = len(self._txn_signatures)
+                header = TransactionHeader()
+                header.ParseFromString(txn.header)
+
+                predecessors = set()
+                for address in header.inputs:
+                    predecessors.update(
+                        self._predecessor_tree.find_read_predecessors(
+                            address))
+                for address in header.outputs:
+                    predecessors.update(
+                        self._predecessor_tree.find_write_predecessors(
+                            address))
+
+                for address in header.inputs:
+                    self._predecessor_tree.add_reader(address, txn_index)
+                for address in header.outputs:
+                    self._predecessor_tree.set_writer(address, txn_index)
+
+                self._txn_signatures.append(txn_signature)
+                self._txn_indexes[txn_signature] = txn_index
+                self._txn_predecessors.append(predecessors)
+                self._txn_to_batch[txn_signature] = batch_signature
+                self._unscheduled.append(txn)
+
+            if not batch.transactions:
+                self._set_batch_validity(batch_signature, True)
+            self._condition.notify_all()
+
+    def get_batch_execution_result(self, batch_signature):
+        with self._condition:
+            return self._batch_statuses.get(batch_signature)
+
+    def set_transaction_execution_result(
+            self, txn_signature, is_valid, context_id):
+        with self._condition:
+            if txn_signature not in self._in_progress:
+                raise ValueError("transaction not in progress: {}".format(
+                                 txn_signature))
+            self._in_progress.remove(txn_signature)
+
+            batch_signature = self._txn_to_batch[txn_signature]
+            if is_valid:
+                self._txn_contexts[txn_signature] = context_id
+
+            if batch_signature not in self._batch_validity:
+                if not is_valid:
+                    # txn is invalid, preemptively fail the batch
+                    self._set_batch_validity(batch_signature, False)
+                elif all(txn in self._txn_contexts
+                         for txn in self._batch_txns[batch_signature]):
+                    self._set_batch_validity(batch_signature, True)
+
+            self._check_complete()
+            self._condition.notify_all()
+
+    def next_transaction(self):
+        with self._condition:
+            for txn in self._unscheduled:
+                txn_signature = txn.header_signature
+                base_txns = self._get_base_txns(
+                    self._txn_indexes[txn_signature])
+                if base_txns is None:
+                    continue
+
+                self._unscheduled.remove(txn)
+                self._in_progress.add(txn_signature)
+                base_contexts = [
+                    self._txn_contexts[self._txn_signatures[base_txn]]
+                    for base_txn in sorted(base_txns)]
+                self._txn_base_contexts[txn_signature] = base_contexts
+                txn_info = TxnInformation(
+                    txn=txn,
+                    state_hash=self._first_state_hash,
+                    base_context_ids=base_contexts)
+                self._scheduled_transactions.append(txn_info)
+                return txn_info
+            return None
+
+    def _get_batch(self, txn_index):
+        return self._txn_to_batch[self._txn_signatures[txn_index]]
+
+    def _get_base_txns(self, txn_index):
+        """Returns the indexes of the completed transactions whose contexts
+        the transaction is to be based on, or None if they are not yet known.
+        """
+        batch_signature = self._get_batch(txn_index)
+        base_txns = set()
+        for predecessor in self._txn_predecessors[txn_index]:
+            if self._get_batch(predecessor) == batch_signature:
+                if self._txn_signatures[predecessor] not in \
+                        self._txn_contexts:
+                    return None
+                base_txns.add(predecessor)
+                continue
+
+            resolved = self._resolve_predecessor(predecessor)
+            if resolved is None:
+                return None
+            base_txns.update(resolved)
+        return base_txns
+
+    def _resolve_predecessor(self, txn_index):
+        """Returns the transactions standing in for a predecessor in another
+        batch: the predecessor itself if its batch is valid, or what its own
+        predecessors resolve to if its batch is invalid. Returns None if this
+        is not yet known.
+        """
+        is_valid = self._batch_validity.get(self._get_batch(txn_index))
+        if is_valid is None:
+            return None
+        if is_valid:
+            return {txn_index}
+
+        resolved = set()
+        for predecessor in self._txn_predecessors[txn_index]:
+            predecessor_resolved = self._resolve_predecessor(predecessor)
+            if predecessor_resolved is None:
+                return None
+            resolved.update(predecessor_resolved)
+        return resolved
+
+    def _set_batch_validity(self, batch_signature, is_valid):
+        self._batch_validity[batch_signature] = is_valid
+        self._batch_statuses[batch_signature] = \
+            BatchExecutionResult(is_valid=is_valid, state_hash=None)
+        if not is_valid:
+            # the rest of the batch need not be executed
+            self._unscheduled = [
+                txn for txn in self._unscheduled
+                if self._txn_to_batch[txn.header_signature] !=
+                batch_signature]
+
+    def _check_complete(self):
+        if self._complete or not self._final or self._in_progress:
+            return
+        if len(self._batch_validity) < len(self._batches):
+            return
+        self._compute_state_hashes()
+        self._complete = True
+
+    def _compute_state_hashes(self):
+        valid_batches = [batch_signature for batch_signature in self._batches
+                         if self._batch_validity[batch_signature]]
+        if not valid_batches:
+            return
+
+        boundaries = [batch_signature for batch_signature in valid_batches
+                      if batch_signature in self._required_state_hashes]
+        if valid_batches[-1] not in boundaries:
+            boundaries.append(valid_batches[-1])
+
+        for batch_signature in boundaries:
+            state_hash = self._compute_merkle_root(
+                batch_signature,
+                self._required_state_hashes.get(batch_signature),
+                batch_signature == boundaries[-1])
+            self._batch_statuses[batch_signature] = \
+                BatchExecutionResult(is_valid=True, state_hash=state_hash)
+
+    def _compute_merkle_root(self, batch_signature, required_state_root,
+                             may_persist):
+        """Computes the merkle root of the state changes of the valid
+        batches up to and including batch_signature, as applied to the first
+        state hash.
+
+        Args:
+            batch_signature (str): The last batch whose changes are included.
+            required_state_root (str): The merkle root that these txns
+                should equal.
+            may_persist (bool): Whether the state may be persisted. Squashing
+                with persistence removes the contexts involved, so only the
+                last state hash computed may be persisted.
+
+        Returns:
+            state_hash (str): The merkle root calculated from the first
+                state hash and the state changes of the batches.
+        """
+        txns = []
+        for signature in self._batches[:self._batches.index(
+                batch_signature) + 1]:
+            if self._batch_validity[signature]:
+                txns.extend(self._batch_txns[signature])
+
+        # Every context is contained in the contexts based on it, so only
+        # those no other valid transaction was based on need be squashed.
+        based_on = set()
+        for txn in txns:
+            based_on.update(self._txn_base_contexts[txn])
+        context_ids = [self._txn_contexts[txn] for txn in txns
+                       if self._txn_contexts[txn] not in based_on]
+
+        persist = self._always_persist and may_persist
+        state_hash = self._squash(
+            state_root=self._first_state_hash,
+            context_ids=context_ids,
+            persist=persist)
+        if persist:
+            return state_hash
+        if may_persist and state_hash == required_state_root:
+            self._squash(state_root=self._first_state_hash,
+                         context_ids=context_ids,
+                         persist=True)
+        return state_hash
+
+    def count(self):
+        with self._condition:
+            return len(self._scheduled_transactions)
+
+    def get_transaction(self, index):
+        with self._condition:
+            return self._scheduled_transactions[index]
+
+    def finalize(self):
+        with self._condition:
+            self._final = True
+            self._check_complete()
+            self._condition.notify_all()
+
+    def complete(self, block):
+        with self._condition:
+            if not self._final:
+                return False
+            if self._complete:
+                return True
+            if block:
+                self._condition.wait_for(lambda: self._complete)
+                return True
+            return False
+
+    def cancel(self):
+        with self._condition:
+            self._cancelled = True
+            self._condition.notify_all()
+
+    def is_cancelled(self):
+        with self._condition:
+            return self._cancelled
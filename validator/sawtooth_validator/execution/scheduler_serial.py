@@ -13,9 +13,11 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
-import queue
+import logging
 from threading import Condition
 
+from sawtooth_validator.protobuf.transaction_pb2 import TransactionHeader
+
 from sawtooth_validator.execution.scheduler import BatchExecutionResult
 from sawtooth_validator.execution.scheduler import TxnInformation
 from sawtooth_validator.execution.scheduler import Scheduler
@@ -23,6 +25,21 @@ from sawtooth_validator.execution.scheduler import SchedulerIterator
 from sawtooth_validator.execution.scheduler_exceptions import SchedulerError
 
 
+LOGGER = logging.getLogger(__name__)
+
+
+def _addresses_overlap(addresses, other_addresses):
+    """Returns whether any address is equal to, or a prefix of, any of the
+    other addresses, or the reverse.
+    """
+    for address in addresses:
+        for other_address in other_addresses:
+            if address.startswith(other_address) or \
+                    other_address.startswith(address):
+                return True
+    return False
+
+
 class SerialScheduler(Scheduler):
     """Serial scheduler which returns transactions in the natural order.
 
@@ -30,20 +47,54 @@ class SerialScheduler(Scheduler):
     unapplied), in the exact order provided as batches were added to the
     scheduler.
 
+    With a window_size greater than one, the scheduler speculatively
+    schedules up to window_size transactions at a time, so that the round
+    trip to a transaction processor is overlapped with the execution of the
+    transactions before it. A transaction is only scheduled ahead if its
+    inputs and outputs do not overlap the outputs of any earlier transaction
+    whose result has not yet been applied, and it is based on the state
+    before those transactions. Results are applied in order; when a batch
+    turns out to be invalid, the transactions scheduled after it, which may
+    be based on its state, are rolled back and scheduled again.
+
     This scheduler is intended to be used for comparison to more complex
     schedulers - for tests related to performance, correctness, etc.
     """
-    def __init__(self, squash_handler, first_state_hash, always_persist):
-        self._txn_queue = queue.Queue()
+    def __init__(self, squash_handler, first_state_hash, always_persist,
+                 window_size=1):
+        if window_size < 1:
+            raise ValueError(
+                "window_size must be at least 1: {}".format(window_size))
+        self._window_size = window_size
+        # all transactions, in the order added, and the inputs and outputs
+        # of each, which are only needed to schedule ahead
+        self._txns = []
+        self._txn_addresses = []
+        # the index of the next transaction to schedule, and of the next
+        # transaction whose result is to be applied
+        self._next_index = 0
+        self._apply_index = 0
+        # signature to index of transactions in progress
+        self._in_progress = {}
+        # index to (is_valid, context_id) of results not yet applied
+        self._results = {}
+        # index to the context ids a scheduled transaction is based on
+        self._txn_base_contexts = {}
+        # signatures of rolled back transactions still in progress, whose
+        # results are to be ignored
+        self._rolled_back = set()
+        self._overlapped_count = 0
+        self._reexecuted_count = 0
         self._scheduled_transactions = []
         self._batch_statuses = {}
         self._txn_to_batch = {}
-        self._in_progress_transaction = None
         self._final = False
         self._complete = False
         self._cancelled = False
-        self._previous_context_id = None
-        self._previous_valid_batch_c_id = None
+        # the contexts which together hold the state of all applied
+        # transactions, and of all transactions in valid batches
+        self._previous_context_ids = []
+        self._previous_valid_batch_c_ids = []
         self._squash = squash_handler
         self._condition = Condition()
         # contains all txn.signatures where txn is
@@ -64,49 +115,96 @@ class SerialScheduler(Scheduler):
     def set_transaction_execution_result(
             self, txn_signature, is_valid, context_id):
         with self._condition:
-            if (self._in_progress_transaction is None or
-                    self._in_progress_transaction != txn_signature):
+            if txn_signature in self._rolled_back:
+                # the transaction has been rolled back and is to be
+                # scheduled again
+                self._rolled_back.remove(txn_signature)
+                self._condition.notify_all()
+                return
+
+            if txn_signature not in self._in_progress:
                 raise ValueError("transaction not in progress: {}".format(
                                  txn_signature))
-            self._in_progress_transaction = None
 
             if txn_signature not in self._txn_to_batch:
                 raise ValueError("transaction not in any batches: {}".format(
                     txn_signature))
 
-            batch_signature = self._txn_to_batch[txn_signature]
-            if is_valid:
-                self._previous_context_id = context_id
+            self._results[self._in_progress.pop(txn_signature)] = \
+                (is_valid, context_id)
+            while self._apply_index in self._results:
+                self._apply_result(self._apply_index)
 
-            else:
-                # txn is invalid, preemptively fail the batch
-                self._batch_statuses[batch_signature] = \
-                    BatchExecutionResult(is_valid=is_valid, state_hash=None)
-            if txn_signature in self._last_in_batch:
-                if batch_signature not in self._batch_statuses:
-                    # because of the else clause above, txn is valid here
-                    self._previous_valid_batch_c_id = self._previous_context_id
-                    state_hash = None
-                    required_state_hash = self._required_state_hashes.get(
-                        batch_signature)
-                    if required_state_hash is not None \
-                            or self._last_in_batch[-1] == txn_signature:
-                        state_hash = self._compute_merkle_root(
-                            required_state_hash)
-                    self._batch_statuses[batch_signature] = \
-                        BatchExecutionResult(
-                            is_valid=is_valid,
-                            state_hash=state_hash)
-                else:
-                    self._previous_context_id = self._previous_valid_batch_c_id
-
-                is_last_batch = \
-                    len(self._batch_statuses) == len(self._last_in_batch)
-
-                if self._final and is_last_batch:
-                    self._complete = True
             self._condition.notify_all()
 
+    def _apply_result(self, index):
+        """Applies the result of the transaction at index, the earliest
+        transaction whose result has not been applied.
+        """
+        is_valid, context_id = self._results.pop(index)
+        base_contexts = self._txn_base_contexts.pop(index)
+        self._apply_index += 1
+
+        txn_signature = self._txns[index].header_signature
+        batch_signature = self._txn_to_batch[txn_signature]
+        if is_valid:
+            # The context holds the state of the contexts it is based on,
+            # but not that of any transactions it was scheduled ahead of.
+            self._previous_context_ids = [
+                c_id for c_id in self._previous_context_ids
+                if c_id not in base_contexts] + [context_id]
+
+        else:
+            # txn is invalid, preemptively fail the batch
+            self._batch_statuses[batch_signature] = \
+                BatchExecutionResult(is_valid=is_valid, state_hash=None)
+        if txn_signature in self._last_in_batch:
+            if batch_signature not in self._batch_statuses:
+                # because of the else clause above, txn is valid here
+                self._previous_valid_batch_c_ids = \
+                    list(self._previous_context_ids)
+                state_hash = None
+                required_state_hash = self._required_state_hashes.get(
+                    batch_signature)
+                if required_state_hash is not None \
+                        or self._last_in_batch[-1] == txn_signature:
+                    state_hash = self._compute_merkle_root(
+                        required_state_hash)
+                self._batch_statuses[batch_signature] = \
+                    BatchExecutionResult(
+                        is_valid=is_valid,
+                        state_hash=state_hash)
+            else:
+                self._previous_context_ids = \
+                    list(self._previous_valid_batch_c_ids)
+                self._roll_back()
+
+            is_last_batch = \
+                len(self._batch_statuses) == len(self._last_in_batch)
+
+            if self._final and is_last_batch:
+                self._complete = True
+                if self._window_size > 1:
+                    LOGGER.debug(
+                        "Serial scheduler overlapped %s transactions and "
+                        "re-executed %s", self._overlapped_count,
+                        self._reexecuted_count)
+
+    def _roll_back(self):
+        """Rolls back the transactions scheduled after the last applied
+        transaction, so that they are scheduled again.
+        """
+        for index in range(self._apply_index, self._next_index):
+            txn_signature = self._txns[index].header_signature
+            if txn_signature in self._in_progress:
+                del self._in_progress[txn_signature]
+                self._rolled_back.add(txn_signature)
+            else:
+                del self._results[index]
+            del self._txn_base_contexts[index]
+            self._reexecuted_count += 1
+        self._next_index = self._apply_index
+
     def add_batch(self, batch, state_hash=None):
         with self._condition:
             if self._final:
@@ -120,13 +218,29 @@ class SerialScheduler(Scheduler):
                 if idx == batch_length - 1:
                     self._last_in_batch.append(txn.header_signature)
                 self._txn_to_batch[txn.header_signature] = batch_signature
-                self._txn_queue.put(txn)
+                self._txns.append(txn)
+                if self._window_size > 1:
+                    header = TransactionHeader()
+                    header.ParseFromString(txn.header)
+                    self._txn_addresses.append(
+                        (list(header.inputs), list(header.outputs)))
             self._condition.notify_all()
 
     def get_batch_execution_result(self, batch_signature):
         with self._condition:
             return self._batch_statuses.get(batch_signature)
 
+    def get_speculation_counts(self):
+        """Returns the number of transactions scheduled ahead of an earlier
+        transaction's result, and the number rolled back to be executed
+        again.
+
+        Returns:
+            (int, int): the overlapped and re-executed counts
+        """
+        with self._condition:
+            return self._overlapped_count, self._reexecuted_count
+
     def count(self):
         with self._condition:
             return len(self._scheduled_transactions)
@@ -137,22 +251,43 @@ class SerialScheduler(Scheduler):
 
     def next_transaction(self):
         with self._condition:
-            if self._in_progress_transaction is not None:
+            index = self._next_index
+            if index - self._apply_index >= self._window_size:
+                return None
+            if index >= len(self._txns):
+                return None
+
+            txn = self._txns[index]
+            if txn.header_signature in self._rolled_back:
                 return None
-            try:
-                txn = self._txn_queue.get(block=False)
-            except queue.Empty:
+            if index > self._apply_index and self._conflicts(index):
                 return None
 
-            self._in_progress_transaction = txn.header_signature
-            base_contexts = [] if self._previous_context_id is None \
-                else [self._previous_context_id]
+            self._next_index += 1
+            self._in_progress[txn.header_signature] = index
+            if index > self._apply_index:
+                self._overlapped_count += 1
+            base_contexts = list(self._previous_context_ids)
+            self._txn_base_contexts[index] = base_contexts
             txn_info = TxnInformation(txn=txn,
                                       state_hash=self._previous_state_hash,
                                       base_context_ids=base_contexts)
             self._scheduled_transactions.append(txn_info)
             return txn_info
 
+    def _conflicts(self, index):
+        """Returns whether the transaction at index reads or writes an
+        address written by a transaction scheduled before it whose result
+        has not been applied.
+        """
+        inputs, outputs = self._txn_addresses[index]
+        for other_index in range(self._apply_index, index):
+            _, other_outputs = self._txn_addresses[other_index]
+            if _addresses_overlap(inputs, other_outputs) or \
+                    _addresses_overlap(outputs, other_outputs):
+                return True
+        return False
+
     def finalize(self):
         with self._condition:
             self._final = True
@@ -161,8 +296,8 @@ class SerialScheduler(Scheduler):
             self._condition.notify_all()
 
     def _compute_merkle_root(self, required_state_root):
-        """Computes the merkle root of the state changes in the context
-        corresponding with _last_valid_batch_c_id as applied to
+        """Computes the merkle root of the state changes in the contexts
+        corresponding with _previous_valid_batch_c_ids as applied to
         _previous_state_hash.
 
         Args:
@@ -175,13 +310,13 @@ class SerialScheduler(Scheduler):
         """
         state_hash = self._squash(
             state_root=self._previous_state_hash,
-            context_ids=[self._previous_valid_batch_c_id],
+            context_ids=self._previous_valid_batch_c_ids,
             persist=self._always_persist)
         if self._always_persist is True:
             return state_hash
         if state_hash == required_state_root:
             self._squash(state_root=self._previous_state_hash,
-                         context_ids=[self._previous_valid_batch_c_id],
+                         context_ids=self._previous_valid_batch_c_ids,
                          persist=True)
         return state_hash
 
@@ -17,6 +17,9 @@ import logging
 from sawtooth_validator.networking.dispatch import Handler
 from sawtooth_validator.networking.dispatch import HandlerResult
 from sawtooth_validator.networking.dispatch import HandlerStatus
+from sawtooth_validator.networking.dispatch import MessagePriority
+from sawtooth_validator.networking.dispatch import decode_embedded_message
+from sawtooth_validator.networking.dispatch import decode_message
 from sawtooth_validator.protobuf import validator_pb2
 from sawtooth_validator.protobuf.batch_pb2 import Batch
 from sawtooth_validator.protobuf.block_pb2 import Block
@@ -33,6 +36,16 @@ from sawtooth_validator.exceptions import PeeringException
 LOGGER = logging.getLogger(__name__)
 
 
+def gossip_message_priority(message_content):
+    """Returns the dispatch priority of a GOSSIP_MESSAGE: high for blocks,
+    which the chain cannot advance without, and normal for batches.
+    """
+    gossip_message = decode_message(message_content, GossipMessage)
+    if gossip_message.content_type == "BLOCK":
+        return MessagePriority.HIGH
+    return MessagePriority.NORMAL
+
+
 class GetPeersRequestHandler(Handler):
     def __init__(self, gossip):
         self._gossip = gossip
@@ -124,8 +137,7 @@ class GossipMessageHandler(Handler):
 
         ack = NetworkAcknowledgement()
         ack.status = ack.OK
-        gossip_message = GossipMessage()
-        gossip_message.ParseFromString(message_content)
+        decode_message(message_content, GossipMessage)
 
         return HandlerResult(
             HandlerStatus.RETURN_AND_PASS,
@@ -137,8 +149,7 @@ class GossipBlockResponseHandler(Handler):
     def handle(self, connection_id, message_content):
         ack = NetworkAcknowledgement()
         ack.status = ack.OK
-        block_response_message = GossipBlockResponse()
-        block_response_message.ParseFromString(message_content)
+        decode_message(message_content, GossipBlockResponse)
 
         return HandlerResult(
             HandlerStatus.RETURN_AND_PASS,
@@ -150,8 +161,7 @@ class GossipBatchResponseHandler(Handler):
     def handle(self, connection_id, message_content):
         ack = NetworkAcknowledgement()
         ack.status = ack.OK
-        batch_response_message = GossipBatchResponse()
-        batch_response_message.ParseFromString(message_content)
+        decode_message(message_content, GossipBatchResponse)
 
         return HandlerResult(
             HandlerStatus.RETURN_AND_PASS,
@@ -167,17 +177,16 @@ class GossipBroadcastHandler(Handler):
 
     def handle(self, connection_id, message_content):
         exclude = [connection_id]
-        gossip_message = GossipMessage()
-        gossip_message.ParseFromString(message_content)
+        gossip_message = decode_message(message_content, GossipMessage)
         if gossip_message.content_type == "BATCH":
-            batch = Batch()
-            batch.ParseFromString(gossip_message.content)
+            batch = decode_embedded_message(
+                message_content, GossipMessage, Batch)
             # If we already have this batch, don't forward it
             if not self._completer.get_batch(batch.header_signature):
                 self._gossip.broadcast_batch(batch, exclude)
         elif gossip_message.content_type == "BLOCK":
-            block = Block()
-            block.ParseFromString(gossip_message.content)
+            block = decode_embedded_message(
+                message_content, GossipMessage, Block)
             # If we already have this block, don't forward it
             if not self._completer.get_block(block.header_signature):
                 self._gossip.broadcast_block(block, exclude)
@@ -13,7 +13,11 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
+from collections import OrderedDict
+import hashlib
 import logging
+from threading import Lock
+
 # pylint: disable=import-error,no-name-in-module
 # needed for google.protobuf import
 from google.protobuf.message import DecodeError
@@ -32,11 +36,19 @@ from sawtooth_validator.protobuf.network_pb2 import GossipBatchResponse
 from sawtooth_validator.networking.dispatch import HandlerResult
 from sawtooth_validator.networking.dispatch import HandlerStatus
 from sawtooth_validator.networking.dispatch import Handler
+from sawtooth_validator.networking.dispatch import decode_embedded_message
+from sawtooth_validator.networking.dispatch import decode_message
 from sawtooth_validator.protobuf.validator_pb2 import Message
 
 
 LOGGER = logging.getLogger(__name__)
 
+# The number of verified signatures a SignatureVerifier remembers
+DEFAULT_VERIFIED_SIGNATURES = 65536
+
+# The number of signatures verified by each task sent to the executor
+_SIGNATURES_PER_TASK = 32
+
 
 def validate_block(block):
     # validate block signature
@@ -83,10 +95,10 @@ def validate_batch(batch):
     index = 0
     while valid and index < total:
         txn = batch.transactions[index]
-        valid = validate_transaction(txn)
+        txn_header = TransactionHeader()
+        txn_header.ParseFromString(txn.header)
+        valid = _validate_transaction(txn, txn_header)
         if valid:
-            txn_header = TransactionHeader()
-            txn_header.ParseFromString(txn.header)
             if txn_header.batcher_pubkey != header.signer_pubkey:
                 LOGGER.debug("txn batcher pubkey does not match signer"
                              "pubkey for batch: %s txn: %s",
@@ -102,6 +114,10 @@ def validate_transaction(txn):
     # validate transactions signature
     header = TransactionHeader()
     header.ParseFromString(txn.header)
+    return _validate_transaction(txn, header)
+
+
+def _validate_transaction(txn, header):
     valid = signing.verify(txn.header,
                            txn.header_signature,
                            header.signer_pubkey)
@@ -112,15 +128,168 @@ def validate_transaction(txn):
     return valid
 
 
+def _verify_headers(signed_headers):
+    """Verifies the signatures of headers, each signed by the signer_pubkey
+    it contains.
+
+    Args:
+        signed_headers (list of tuple): the header class, serialized header
+            and signature of each header
+
+    Returns:
+        list: the parsed header of each header whose signature is valid,
+            None for each other
+    """
+    results = []
+    for header_class, header_bytes, signature in signed_headers:
+        header = header_class()
+        try:
+            header.ParseFromString(header_bytes)
+        except DecodeError:
+            results.append(None)
+            continue
+        if signing.verify(header_bytes, signature, header.signer_pubkey):
+            results.append(header)
+        else:
+            results.append(None)
+    return results
+
+
+def _signature_key(header_bytes, signature):
+    return hashlib.sha256(header_bytes + signature.encode()).digest()
+
+
+class SignatureVerifier(object):
+    """Verifies the signatures of blocks, batches and transactions, as
+    validate_block and validate_batches do.
+
+    The signatures are verified by tasks run on an executor, which should be
+    a ProcessPoolExecutor for them to be verified in parallel. Signatures
+    found valid are remembered, least recently used forgotten first, so
+    that a batch verified when it is gossiped or submitted is not verified
+    again when it arrives in a block.
+    """
+    def __init__(self, executor=None,
+                 max_signatures=DEFAULT_VERIFIED_SIGNATURES):
+        """
+        Args:
+            executor (concurrent.futures.Executor, optional): runs the
+                verification tasks; if None, signatures are verified in the
+                calling thread
+            max_signatures (int): the number of valid signatures remembered
+        """
+        self._executor = executor
+        self._max_signatures = max_signatures
+        # signature key: the signer of a block or batch, or the batcher of
+        # a transaction
+        self._verified = OrderedDict()
+        self._lock = Lock()
+
+    def verify_block(self, block):
+        """Returns whether the block's signature, and the signatures of the
+        batches sent with it, are valid.
+        """
+        valid = self._verify(
+            [(BlockHeader, block.header, block.header_signature)],
+            block.batches)
+        if not valid:
+            LOGGER.debug("block failed signature validation: %s",
+                         block.header_signature)
+        return valid
+
+    def verify_batches(self, batches):
+        """Returns whether the signatures of the batches, and of their
+        transactions, are valid, and each transaction's batcher_pubkey is
+        the signer of its batch. An empty list of batches is not valid.
+        """
+        if not batches:
+            return False
+        return self._verify([], batches)
+
+    def _verify(self, signed_headers, batches):
+        signed_headers = list(signed_headers)
+        first_batch = len(signed_headers)
+        for batch in batches:
+            signed_headers.append(
+                (BatchHeader, batch.header, batch.header_signature))
+            signed_headers.extend(
+                (TransactionHeader, txn.header, txn.header_signature)
+                for txn in batch.transactions)
+
+        keys = [_signature_key(header_bytes, signature)
+                for _, header_bytes, signature in signed_headers]
+        signers = {}
+        with self._lock:
+            for key in keys:
+                signer = self._verified.get(key)
+                if signer is not None:
+                    self._verified.move_to_end(key)
+                    signers[key] = signer
+
+        pending = [i for i, key in enumerate(keys) if key not in signers]
+        if pending:
+            headers = self._verify_headers(
+                [signed_headers[i] for i in pending])
+            verified = {}
+            for i, header in zip(pending, headers):
+                if header is None:
+                    continue
+                if isinstance(header, TransactionHeader):
+                    verified[keys[i]] = header.batcher_pubkey
+                else:
+                    verified[keys[i]] = header.signer_pubkey
+            self._remember(verified)
+            signers.update(verified)
+
+        invalid = [signed_header[2]
+                   for key, signed_header in zip(keys, signed_headers)
+                   if key not in signers]
+        if invalid:
+            LOGGER.debug("signatures invalid: %s", invalid)
+            return False
+
+        index = first_batch
+        for batch in batches:
+            batch_signer = signers[keys[index]]
+            index += 1
+            for txn in batch.transactions:
+                if signers[keys[index]] != batch_signer:
+                    LOGGER.debug("txn batcher pubkey does not match signer"
+                                 "pubkey for batch: %s txn: %s",
+                                 batch.header_signature,
+                                 txn.header_signature)
+                    return False
+                index += 1
+        return True
+
+    def _verify_headers(self, signed_headers):
+        if self._executor is None:
+            return _verify_headers(signed_headers)
+
+        tasks = [signed_headers[i:i + _SIGNATURES_PER_TASK]
+                 for i in range(0, len(signed_headers), _SIGNATURES_PER_TASK)]
+        results = []
+        for task_results in self._executor.map(_verify_headers, tasks):
+            results.extend(task_results)
+        return results
+
+    def _remember(self, verified):
+        with self._lock:
+            self._verified.update(verified)
+            while len(self._verified) > self._max_signatures:
+                self._verified.popitem(last=False)
+
+
 class GossipMessageSignatureVerifier(Handler):
+    def __init__(self, verifier):
+        self._verifier = verifier
 
     def handle(self, connection_id, message_content):
-        gossip_message = GossipMessage()
-        gossip_message.ParseFromString(message_content)
+        gossip_message = decode_message(message_content, GossipMessage)
         if gossip_message.content_type == "BLOCK":
-            block = Block()
-            block.ParseFromString(gossip_message.content)
-            status = validate_block(block)
+            block = decode_embedded_message(
+                message_content, GossipMessage, Block)
+            status = self._verifier.verify_block(block)
             if status is True:
                 LOGGER.debug("block passes signature verification %s",
                              block.header_signature)
@@ -130,9 +299,9 @@ class GossipMessageSignatureVerifier(Handler):
                          block.header_signature)
             return HandlerResult(status=HandlerStatus.DROP)
         elif gossip_message.content_type == "BATCH":
-            batch = Batch()
-            batch.ParseFromString(gossip_message.content)
-            status = validate_batch(batch)
+            batch = decode_embedded_message(
+                message_content, GossipMessage, Batch)
+            status = self._verifier.verify_batches([batch])
             if status is True:
                 LOGGER.debug("batch passes signature verification %s",
                              batch.header_signature)
@@ -143,13 +312,13 @@ class GossipMessageSignatureVerifier(Handler):
 
 
 class GossipBlockResponseSignatureVerifier(Handler):
-    def handle(self, connection_id, message_content):
-        block_response_message = GossipBlockResponse()
-        block_response_message.ParseFromString(message_content)
+    def __init__(self, verifier):
+        self._verifier = verifier
 
-        block = Block()
-        block.ParseFromString(block_response_message.content)
-        status = validate_block(block)
+    def handle(self, connection_id, message_content):
+        block = decode_embedded_message(
+            message_content, GossipBlockResponse, Block)
+        status = self._verifier.verify_block(block)
 
         if status is True:
             LOGGER.debug("requested block passes signature verification %s",
@@ -162,13 +331,13 @@ class GossipBlockResponseSignatureVerifier(Handler):
 
 
 class GossipBatchResponseSignatureVerifier(Handler):
-    def handle(self, connection_id, message_content):
-        batch_response_message = GossipBatchResponse()
-        batch_response_message.ParseFromString(message_content)
+    def __init__(self, verifier):
+        self._verifier = verifier
 
-        batch = Batch()
-        batch.ParseFromString(batch_response_message.content)
-        status = validate_batch(batch)
+    def handle(self, connection_id, message_content):
+        batch = decode_embedded_message(
+            message_content, GossipBatchResponse, Batch)
+        status = self._verifier.verify_batches([batch])
 
         if status is True:
             LOGGER.debug("requested batch passes signature verification %s",
@@ -181,6 +350,8 @@ class GossipBatchResponseSignatureVerifier(Handler):
 
 
 class BatchListSignatureVerifier(Handler):
+    def __init__(self, verifier):
+        self._verifier = verifier
 
     def handle(self, connection_id, message_content):
         response_proto = client_pb2.ClientBatchSubmitResponse
@@ -191,9 +362,9 @@ class BatchListSignatureVerifier(Handler):
                 message_out=response_proto(status=out_status),
                 message_type=Message.CLIENT_BATCH_SUBMIT_RESPONSE)
         try:
-            request = client_pb2.ClientBatchSubmitRequest()
-            request.ParseFromString(message_content)
-            status = validate_batches(request.batches)
+            request = decode_message(
+                message_content, client_pb2.ClientBatchSubmitRequest)
+            status = self._verifier.verify_batches(request.batches)
         except DecodeError:
             return make_response(response_proto.INTERNAL_ERROR)
 
@@ -0,0 +1,167 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+from concurrent.futures import Future
+import heapq
+import itertools
+import logging
+from threading import Condition
+from threading import Thread
+from time import time
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class _Waiter(object):
+    def __init__(self, batch_ids, deadline):
+        self.future = Future()
+        self.remaining = set(batch_ids)
+        self.deadline = deadline
+        self.done = False
+
+
+class BatchCommitNotifier(object):
+    """Notifies waiters when batches are committed, through futures, rather
+    than by blocking a thread for each waiter.
+
+    Waiters are registered by batch id, and resolved as the batches are
+    committed. A single thread, started with the first waiter, resolves
+    the futures of the waiters, so that running the futures' callbacks
+    delays neither committing nor other waiters' timeouts.
+    """
+    def __init__(self, has_batch):
+        """
+        Args:
+            has_batch (function): returns whether the batch with an id is
+                committed.
+        """
+        self._has_batch = has_batch
+        self._condition = Condition()
+        # batch id: list of _Waiter
+        self._waiters = {}
+        # the waiters for the next commit, of any batches
+        self._next_commit_waiters = []
+        # (deadline, sequence, _Waiter), earliest deadline first
+        self._deadlines = []
+        self._sequence = itertools.count()
+        # (_Waiter, result) to be resolved
+        self._resolved = []
+        self._thread = None
+
+    def wait_for_batch_commits(self, batch_ids, timeout):
+        """Returns a future of whether the batches were committed before the
+        timeout. If batch_ids is empty, the future is of whether any batches
+        were committed before the timeout.
+
+        Args:
+            batch_ids (list of str): the ids of the batches
+            timeout (float): the seconds to wait
+
+        Returns:
+            concurrent.futures.Future: resolves to True when the batches are
+                committed, or False when the timeout is exceeded
+        """
+        with self._condition:
+            waiter = _Waiter(
+                [batch_id for batch_id in batch_ids
+                 if not self._has_batch(batch_id)],
+                time() + timeout)
+            if batch_ids and not waiter.remaining:
+                waiter.future.set_result(True)
+                return waiter.future
+
+            if batch_ids:
+                for batch_id in waiter.remaining:
+                    self._waiters.setdefault(batch_id, []).append(waiter)
+            else:
+                self._next_commit_waiters.append(waiter)
+            heapq.heappush(
+                self._deadlines,
+                (waiter.deadline, next(self._sequence), waiter))
+
+            if self._thread is None:
+                self._thread = Thread(target=self._run,
+                                      name='BatchCommitNotifier',
+                                      daemon=True)
+                self._thread.start()
+            self._condition.notify()
+            return waiter.future
+
+    def notify_batches_committed(self, batch_ids):
+        """Resolves the waiters for which all batches are now committed.
+
+        Args:
+            batch_ids (iterable of str): the ids of the batches committed
+        """
+        with self._condition:
+            resolved = []
+            for waiter in self._next_commit_waiters:
+                waiter.done = True
+                resolved.append((waiter, True))
+            self._next_commit_waiters = []
+
+            for batch_id in batch_ids:
+                for waiter in self._waiters.pop(batch_id, ()):
+                    waiter.remaining.discard(batch_id)
+                    if not waiter.remaining and not waiter.done:
+                        waiter.done = True
+                        resolved.append((waiter, True))
+
+            if resolved:
+                self._resolved.extend(resolved)
+                self._condition.notify()
+
+    def _expire(self, now):
+        """Marks the waiters past their deadlines resolved, as timed out.
+        Called holding the condition.
+        """
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, _, waiter = heapq.heappop(self._deadlines)
+            if waiter.done:
+                continue
+            waiter.done = True
+            self._resolved.append((waiter, False))
+            for batch_id in waiter.remaining:
+                waiters = self._waiters.get(batch_id)
+                if waiters is not None:
+                    waiters.remove(waiter)
+                    if not waiters:
+                        del self._waiters[batch_id]
+            if waiter in self._next_commit_waiters:
+                self._next_commit_waiters.remove(waiter)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    self._expire(time())
+                    if self._resolved:
+                        break
+                    if self._deadlines:
+                        self._condition.wait(
+                            self._deadlines[0][0] - time())
+                    else:
+                        self._condition.wait()
+                resolved = self._resolved
+                self._resolved = []
+
+            for waiter, result in resolved:
+                try:
+                    waiter.future.set_result(result)
+                # pylint: disable=broad-except
+                except Exception:
+                    LOGGER.exception("Unhandled exception resolving a batch "
+                                     "commit waiter")
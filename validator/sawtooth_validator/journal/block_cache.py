@@ -16,13 +16,41 @@
 from sawtooth_validator.journal.timed_cache import TimedCache
 
 
+# the bytes of blocks the validator's block cache holds
+DEFAULT_BLOCK_CACHE_BYTES = 256 * 1024 * 1024
+
+
 class BlockCache(TimedCache):
     """
     A dict like interface to access blocks. Stores BlockState objects.
+
+    If the cache has a budget of bytes, the blocks it holds are kept within
+    it: the batches of the least recently used blocks in the block store
+    are released, keeping their headers for walking the chain, to be
+    reloaded from the block store when accessed. If that is not enough, the
+    least recently used blocks not in the block store are evicted. Pinned
+    blocks are neither released, evicted, nor expired.
     """
-    def __init__(self, block_store=None, keep_time=10):
+    def __init__(self, block_store=None, keep_time=10, max_bytes=None):
+        """
+        Args:
+            block_store (BlockStore, optional): the committed blocks, loaded
+                into the cache when accessed
+            keep_time (float): the seconds a block is kept, after it is
+                last set or accessed
+            max_bytes (int, optional): the budget of the serialized bytes of
+                the blocks held, not counting released batches
+        """
         super(BlockCache, self).__init__(keep_time)
         self._block_store = block_store if block_store is not None else {}
+        self._max_bytes = max_bytes
+        # block id: the bytes of its block, if its batches are not released
+        self._sizes = {}
+        # the sum of _sizes
+        self._total_bytes = 0
+        self._released_count = 0
+        # block id: the times it is pinned
+        self._pinned = {}
 
     def __getitem__(self, key):
         with self._lock:
@@ -31,10 +59,94 @@ class BlockCache(TimedCache):
             except KeyError:
                 if key in self._block_store:
                     value = self._block_store[key]
-                    super(BlockCache, self).__setitem__(key, value)
+                    self[key] = value
                     return value
                 raise
 
+    def __setitem__(self, key, value):
+        with self._lock:
+            super(BlockCache, self).__setitem__(key, value)
+            self._removed(key)
+            if self._max_bytes is not None and value is not None and \
+                    not value.batches_released:
+                self._add_size(key, value.block.ByteSize())
+            self._enforce_budget()
+
+    def pin(self, block_id):
+        """Pins a block, so that it stays in the cache with its batches
+        until it is unpinned as often as it was pinned.
+        """
+        with self._lock:
+            self._pinned[block_id] = self._pinned.get(block_id, 0) + 1
+
+    def unpin(self, block_id):
+        with self._lock:
+            count = self._pinned.pop(block_id, 0) - 1
+            if count > 0:
+                self._pinned[block_id] = count
+
+    def _is_pinned(self, key):
+        return key in self._pinned
+
+    @property
+    def released_count(self):
+        """The number of times the batches of a block were released.
+        """
+        with self._lock:
+            return self._released_count
+
+    def purge_expired(self):
+        with self._lock:
+            super(BlockCache, self).purge_expired()
+            self._enforce_budget()
+
+    def _add_size(self, key, size):
+        self._sizes[key] = size
+        self._total_bytes += size
+
+    def _removed(self, key):
+        self._total_bytes -= self._sizes.pop(key, 0)
+
+    def _load_block(self, block_id):
+        block = self._block_store[block_id].block
+        # batches reloaded since they were released are counted again,
+        # and the budget is enforced on the next change to the cache
+        with self._lock:
+            if block_id in self._cache and block_id not in self._sizes:
+                self._add_size(block_id, block.ByteSize())
+        return block
+
+    def _enforce_budget(self):
+        if self._max_bytes is None or self._total_bytes <= self._max_bytes:
+            return
+
+        # the blocks are visited from the least recently used, only until
+        # the cache is back within its budget
+        for key in self._cache:
+            if self._total_bytes <= self._max_bytes:
+                return
+            if key not in self._sizes or key in self._pinned or \
+                    key not in self._block_store:
+                continue
+            self._cache[key].value.release_batches(self._load_block)
+            self._removed(key)
+            self._released_count += 1
+
+        evicted = []
+        excess = self._total_bytes - self._max_bytes
+        for key in self._cache:
+            if excess <= 0:
+                break
+            if key not in self._sizes or key in self._pinned:
+                continue
+            evicted.append(key)
+            excess -= self._sizes[key]
+
+        for key in evicted:
+            del self._cache[key]
+            self._removed(key)
+            self._evicted_count += 1
+
     @property
     def block_store(self):
         """
@@ -13,44 +13,134 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
-from time import time
-from threading import Condition
 # pylint: disable=no-name-in-module
 from collections.abc import MutableMapping
+import logging
+
+from google.protobuf.message import DecodeError
+
+from sawtooth_validator.journal.batch_commit_notifier import \
+    BatchCommitNotifier
+from sawtooth_validator.journal.bloom_filter import BloomFilter
+from sawtooth_validator.journal.bloom_filter import DEFAULT_CAPACITY
 from sawtooth_validator.journal.block_wrapper import BlockStatus
 from sawtooth_validator.journal.block_wrapper import BlockWrapper
 from sawtooth_validator.protobuf.batch_pb2 import BatchHeader
 from sawtooth_validator.protobuf.block_pb2 import Block
 
 
+LOGGER = logging.getLogger(__name__)
+
+# the prefix of the keys of the block ids of the chain, by block number
+BLOCK_NUM_PREFIX = 'block_num_'
+
+# the key of the filter of stored keys, persisted by persist_stored_keys
+STORED_KEYS_KEY = '~stored-keys-filter'
+
+# the number of blocks indexed per write when indexing a stored chain
+_INDEX_CHUNK_SIZE = 100
+
+
 class BlockStore(MutableMapping):
     """
     A dict like interface wrapper around the block store to guarantee,
     objects are correctly wrapped and unwrapped as they are stored and
     retrieved.
+
+    Values are kept in the underlying database in raw form: blocks as their
+    serialized protobuf, and block id references (under the block numbers
+    of the chain, and the chain head key) as utf-8 encoded ids. Under batch
+    and transaction ids, the block id is followed by the position of the
+    batch, and of the transaction in its batch, in the block, separated by
+    spaces. Under block numbers, the block id is followed by the number of
+    batches and transactions in the chain up to and including the block,
+    when they are known.
+
+    The keys ever stored are also added to a Bloom filter, so that looking
+    up a block, batch or transaction id not in the store rarely reads it.
+    The filter is persisted in the store by persist_stored_keys, and loaded
+    on construction; it is built from the keys of the store instead if it
+    was not persisted, or was written to since. Blocks must therefore only
+    be stored through the BlockStore.
+
+    A chain stored before blocks were indexed by number is indexed when the
+    BlockStore is constructed.
     """
     def __init__(self, block_db):
         self._block_store = block_db
-        self._commit_condition = Condition()
+        self._commit_notifier = BatchCommitNotifier(self.has_batch)
+
+        self._stored_keys = self._load_stored_keys()
+
+        self._index_chain()
 
     def __setitem__(self, key, value):
         if key != value.identifier:
             raise KeyError("Invalid key to store block under: {} expected {}".
                            format(key, value.identifier))
         add_ops = self._build_add_block_ops(value)
-        self._block_store.set_batch(add_ops)
+        self._write(add_ops)
+        self._commit_notifier.notify_batches_committed(
+            batch.header_signature for batch in value.batches)
 
     def __getitem__(self, key):
-        stored_block = self._block_store[key]
+        self._check_stored(key)
+        return self._get_block(key, self._block_store)
+
+    def _load_stored_keys(self):
+        """Returns the filter of stored keys persisted in the store, or
+        builds it from the keys of the store if none is.
+        """
+        persisted = self._block_store.get_raw(STORED_KEYS_KEY)
+        if persisted is not None:
+            try:
+                return BloomFilter.from_bytes(persisted)
+            except ValueError as e:
+                LOGGER.warning('Rebuilding filter of stored keys: %s', e)
+
+        stored_keys = BloomFilter(
+            capacity=max(DEFAULT_CAPACITY, 2 * len(self._block_store)))
+        with self._block_store.snapshot(buffers=True) as reader:
+            stored_keys.update(key for key, _ in reader.scan())
+        return stored_keys
+
+    def persist_stored_keys(self):
+        """Persists the filter of stored keys in the store, so that the next
+        BlockStore built on it loads the filter rather than reading every
+        key. The persisted filter is removed by the next write, and so is
+        only used if the store is not written to after this is called.
+        """
+        self._block_store.set_batch_raw(
+            [(STORED_KEYS_KEY, self._stored_keys.to_bytes())])
+
+    def _check_stored(self, key):
+        """Raises KeyError if key has never been stored.
+        """
+        if key not in self._stored_keys:
+            raise KeyError('Key "{}" not found in store'.format(key))
+
+    @staticmethod
+    def _get_block(key, reader):
+        """Returns the block stored under key, read using reader, which is
+        either the underlying database or a snapshot of it.
+
+        Raises:
+            KeyError: if no block is stored under key.
+        """
+        stored_block = reader.get_raw(key)
 
-        # Block id strings are stored under batch/txn ids for reference.
-        # Only Blocks, not ids or Nones, should be returned by __getitem__.
-        if isinstance(stored_block, bytes):
+        # Block ids are stored under batch/txn ids for reference. Only
+        # Blocks, not ids or Nones, should be returned by __getitem__.
+        if stored_block is not None:
             block = Block()
-            block.ParseFromString(stored_block)
-            return BlockWrapper(
-                status=BlockStatus.Valid,
-                block=block)
+            try:
+                block.ParseFromString(stored_block)
+            except DecodeError:
+                block = None
+            if block is not None and block.header_signature == key:
+                return BlockWrapper(
+                    status=BlockStatus.Valid,
+                    block=block)
 
         raise KeyError('Block "{}" not found in store'.format(key))
 
@@ -58,7 +148,7 @@ class BlockStore(MutableMapping):
         del self._block_store[key]
 
     def __contains__(self, x):
-        return x in self._block_store
+        return x in self._stored_keys and x in self._block_store
 
     def __iter__(self):
         # Required by abstract base class, but implementing is non-trivial
@@ -71,7 +161,7 @@ class BlockStore(MutableMapping):
     def __str__(self):
         out = []
         for key in self._block_store.keys():
-            value = self._block_store[key]
+            value = self._block_store.get_raw(key)
             out.append(str(value))
         return ','.join(out)
 
@@ -92,23 +182,87 @@ class BlockStore(MutableMapping):
         del_keys = []
         for blkw in new_chain:
             add_pairs = add_pairs + self._build_add_block_ops(blkw)
+        add_pairs = add_pairs + self._build_block_num_ops(new_chain)
         if old_chain is not None:
             for blkw in old_chain:
                 del_keys = del_keys + self._build_remove_block_ops(blkw)
-        add_pairs.append(("chain_head_id", new_chain[0].identifier))
-
-        self._block_store.set_batch(add_pairs, del_keys)
+                del_keys.append(self._block_num_key(blkw.block_num))
+        add_pairs.append(
+            ("chain_head_id", new_chain[0].identifier.encode()))
+
+        self._write(add_pairs, del_keys)
+        self._commit_notifier.notify_batches_committed(
+            batch.header_signature
+            for blkw in new_chain for batch in blkw.batches)
+
+    def _index_chain(self):
+        """Indexes the blocks of the current chain by number, with the
+        counts of batches and transactions up to each, and stores the
+        positions of their batches and transactions, where they are not
+        already. The chain is walked back from its head to the last block
+        indexed with its counts, and indexed forward from there.
+        """
+        unindexed = []
+        with self._block_store.snapshot() as reader:
+            try:
+                block = self._get_block(
+                    self._get_block_id('chain_head_id', reader), reader)
+            except KeyError:
+                return
+            while not self._is_indexed(block, reader):
+                unindexed.append(block.identifier)
+                if block.block_num == 0:
+                    break
+                try:
+                    block = self._get_block(block.previous_block_id, reader)
+                except KeyError:
+                    # the counts of a chain with missing blocks are unknown
+                    break
+
+        if not unindexed:
+            return
+
+        LOGGER.info('Indexing %s blocks of the chain', len(unindexed))
+        while unindexed:
+            chunk = [self[block_id]
+                     for block_id in unindexed[-_INDEX_CHUNK_SIZE:]]
+            del unindexed[-_INDEX_CHUNK_SIZE:]
+            add_pairs = []
+            for blkw in chunk:
+                add_pairs.extend(self._build_add_block_ops(blkw))
+            add_pairs.extend(self._build_block_num_ops(chunk))
+            self._write(add_pairs)
+
+    def _is_indexed(self, blkw, reader):
+        """Returns whether a block is indexed by its number, with the counts
+        of batches and transactions in the chain up to it, read using
+        reader.
+        """
+        record = reader.get_raw(self._block_num_key(blkw.block_num))
+        if record is None:
+            return False
+        record = bytes(record).decode().split(' ')
+        return record[0] == blkw.identifier and len(record) >= 3
+
+    def _write(self, add_pairs, del_keys=None):
+        # keys are added to the filter before they are stored, so that no
+        # key can be in the store but not the filter, and the persisted
+        # filter, which may not hold them, is removed as they are stored
+        self._stored_keys.update(key for key, _ in add_pairs)
+        self._block_store.set_batch_raw(
+            add_pairs, (del_keys or []) + [STORED_KEYS_KEY])
 
     @property
     def chain_head(self):
         """
         Return the head block of the current chain.
         """
-        if "chain_head_id" not in self._block_store:
-            return None
-        if self._block_store["chain_head_id"] in self._block_store:
-            return self.__getitem__(self._block_store["chain_head_id"])
-        return None
+        with self._block_store.snapshot() as reader:
+            try:
+                chain_head_id = self._get_block_id("chain_head_id", reader)
+                return self._get_block(chain_head_id, reader)
+            except KeyError:
+                return None
 
     @property
     def store(self):
@@ -122,17 +276,18 @@ class BlockStore(MutableMapping):
         and returns True when they have. If timeout is exceeded, returns False.
         If no batch_ids are passed in, it will return True on the next commit.
         """
-        batch_ids = batch_ids or []
-        timeout = timeout or 300
-        start_time = time()
-
-        with self._commit_condition:
-            while True:
-                if all(self.has_batch(b) for b in batch_ids):
-                    return True
-                if time() - start_time > timeout:
-                    return False
-                self._commit_condition.wait(timeout - (time() - start_time))
+        return self.wait_for_batch_commits_async(batch_ids, timeout).result()
+
+    def wait_for_batch_commits_async(self, batch_ids=None, timeout=None):
+        """Returns a concurrent.futures.Future which resolves to True when a
+        set of batch ids have been committed to the block chain, or False if
+        timeout is exceeded first, without holding a thread while waiting.
+        If no batch_ids are passed in, it resolves to True on the next
+        commit. Callbacks added to the future are run on a thread shared by
+        all the waiters, and should not block.
+        """
+        return self._commit_notifier.wait_for_batch_commits(
+            batch_ids or [], timeout or 300)
 
     def _build_add_block_ops(self, blkw):
         """Build the batch operations to add a block to the BlockStore.
@@ -143,13 +298,47 @@ class BlockStore(MutableMapping):
         """
         out = []
         blk_id = blkw.identifier
-        with self._commit_condition:
-            out.append((blk_id, blkw.block.SerializeToString()))
-            for batch in blkw.batches:
-                out.append((batch.header_signature, blk_id))
-                for txn in batch.transactions:
-                    out.append((txn.header_signature, blk_id))
-            self._commit_condition.notify_all()
+        out.append((blk_id, blkw.block.SerializeToString()))
+        for batch_index, batch in enumerate(blkw.batches):
+            out.append((batch.header_signature, '{} {}'.format(
+                blk_id, batch_index).encode()))
+            for txn_index, txn in enumerate(batch.transactions):
+                out.append((txn.header_signature, '{} {} {}'.format(
+                    blk_id, batch_index, txn_index).encode()))
+        return out
+
+    def _build_block_num_ops(self, new_chain):
+        """Build the batch operations to index the blocks of a new chain by
+        block number, with the counts of batches and transactions in the
+        chain up to each block. The counts are only recorded if they are
+        known for the block preceding the new chain.
+
+        :param new_chain (list of BlockWrapper): The blocks of the new
+            chain, from its head.
+        :return:
+        list of key value tuples to add to the BlockStore
+        """
+        out = []
+        counts = None
+        if new_chain:
+            first_num = new_chain[-1].block_num
+            if first_num == 0:
+                counts = (0, 0)
+            else:
+                try:
+                    counts = self.get_chain_counts(first_num - 1)
+                except KeyError:
+                    pass
+
+        for blkw in reversed(new_chain):
+            record = blkw.identifier
+            if counts is not None:
+                counts = (
+                    counts[0] + len(blkw.batches),
+                    counts[1] + sum(len(batch.transactions)
+                                    for batch in blkw.batches))
+                record = '{} {} {}'.format(record, *counts)
+            out.append((self._block_num_key(blkw.block_num), record.encode()))
         return out
 
     @staticmethod
@@ -169,65 +358,159 @@ class BlockStore(MutableMapping):
                 out.append(txn.header_signature)
         return out
 
+    @staticmethod
+    def _block_num_key(block_num):
+        return '{}{}'.format(BLOCK_NUM_PREFIX, block_num)
+
+    @staticmethod
+    def _get_position(key, reader):
+        """Returns the block id, and the positions of the batch and the
+        transaction within it, referenced by a batch or transaction id, read
+        using reader. The positions are None if they are not referenced, for
+        batch and transaction ids stored without positions. Only the block
+        id is meaningful for other keys.
+
+        Raises:
+            KeyError: if key is not in the store.
+        """
+        blk_id_ref = reader.get_raw(key)
+        if blk_id_ref is None:
+            raise KeyError('Key "{}" not found in store'.format(key))
+        position = bytes(blk_id_ref).decode().split(' ')
+        batch_index = int(position[1]) if len(position) > 1 else None
+        txn_index = int(position[2]) if len(position) > 2 else None
+        return position[0], batch_index, txn_index
+
+    @staticmethod
+    def _get_block_id(key, reader):
+        """Returns the block id referenced by key, read using reader.
+
+        Raises:
+            KeyError: if key is not in the store.
+        """
+        return BlockStore._get_position(key, reader)[0]
+
+    def _get_referenced_block(self, key):
+        self._check_stored(key)
+        with self._block_store.snapshot() as reader:
+            return self._get_block(self._get_block_id(key, reader), reader)
+
+    def _get_referenced_batch(self, key):
+        """Returns the batch referenced by a batch or transaction id, and
+        the position of the transaction in it, if it is referenced.
+
+        Raises:
+            KeyError: if key is not in the store.
+        """
+        self._check_stored(key)
+        with self._block_store.snapshot() as reader:
+            blk_id, batch_index, txn_index = self._get_position(key, reader)
+            block = self._get_block(blk_id, reader)
+
+        if batch_index is not None and batch_index < len(block.batches):
+            return block.batches[batch_index], txn_index
+
+        # ids stored without positions are found by searching the block
+        for batch in block.batches:
+            if batch.header_signature == key:
+                return batch, None
+            batch_header = BatchHeader()
+            batch_header.ParseFromString(batch.header)
+            if key in batch_header.transaction_ids:
+                return batch, None
+
+        raise KeyError('Key "{}" not found in block {}'.format(key, blk_id))
+
+    def get_chain_counts(self, block_num):
+        """Returns the number of batches and transactions in the current
+        chain, from the genesis block up to and including the block with the
+        given number.
+
+        Args:
+            block_num (int): The number of the block.
+
+        Returns:
+            (int, int): The number of batches and of transactions.
+
+        Raises:
+            KeyError: No block with the number is in the chain, or the
+                counts are not known.
+        """
+        key = self._block_num_key(block_num)
+        record = self._block_store.get_raw(key)
+        if record is None:
+            raise KeyError('Key "{}" not found in store'.format(key))
+        record = bytes(record).decode().split(' ')
+        if len(record) < 3:
+            raise KeyError('Counts of block {} not known'.format(block_num))
+        return int(record[1]), int(record[2])
+
+    def get_block_by_number(self, block_num):
+        """Returns the block of the current chain with the given number.
+
+        Args:
+            block_num (int): The number of the block.
+
+        Returns:
+            BlockWrapper: The block.
+
+        Raises:
+            KeyError: No block with the number is in the chain.
+        """
+        with self._block_store.snapshot() as reader:
+            return self._get_block(
+                self._get_block_id(self._block_num_key(block_num), reader),
+                reader)
+
     def get_block_by_transaction_id(self, txn_id):
         try:
-            return self.__getitem__(self._block_store[txn_id])
+            return self._get_referenced_block(txn_id)
         except KeyError:
             raise ValueError('Transaction "%s" not in BlockStore', txn_id)
 
     def has_transaction(self, txn_id):
-        return txn_id in self._block_store
+        return txn_id in self
 
     def get_block_by_batch_id(self, batch_id):
         try:
-            return self.__getitem__(self._block_store[batch_id])
+            return self._get_referenced_block(batch_id)
         except KeyError:
             raise ValueError('Batch "%s" not in BlockStore', batch_id)
 
     def has_batch(self, batch_id):
-        return batch_id in self._block_store
+        return batch_id in self
 
     def get_batch_by_transaction(self, transaction_id):
         """
         Check to see if the requested transaction_id is in the current chain.
-        If so, find the batch that has the transaction referenced by the
-        transaction_id and return the batch. This is done by finding the block
-        and searching for the batch.
+        If so, return the batch that has the transaction referenced by the
+        transaction_id, found by its position in its block.
 
         :param transaction_id (string): The id of the transaction that is being
             requested.
         :return:
         The batch that has the transaction.
         """
-        if self.has_transaction(transaction_id):
-            block = self.get_block_by_transaction_id(transaction_id)
-            # Find batch in block
-            for batch in block.batches:
-                batch_header = BatchHeader()
-                batch_header.ParseFromString(batch.header)
-                if transaction_id in batch_header.transaction_ids:
-                    return batch
-
-        raise ValueError('Transaction "%s" not in BlockStore', transaction_id)
+        try:
+            return self._get_referenced_batch(transaction_id)[0]
+        except KeyError:
+            raise ValueError('Transaction "%s" not in BlockStore',
+                             transaction_id)
 
     def get_batch(self, batch_id):
         """
         Check to see if the requested batch_id is in the current chain. If so,
-        find the batch with the batch_id and return it. This is done by
-        finding the block and searching for the batch.
+        return the batch with the batch_id, found by its position in its
+        block.
 
         :param batch_id (string): The id of the batch requested.
         :return:
         The batch with the batch_id.
         """
-        if self.has_batch(batch_id):
-            block = self.get_block_by_batch_id(batch_id)
-
-            for batch in block.batches:
-                if batch.header_signature == batch_id:
-                    return batch
-
-        raise ValueError("Batch_id %s not found in BlockStore.", batch_id)
+        try:
+            return self._get_referenced_batch(batch_id)[0]
+        except KeyError:
+            raise ValueError("Batch_id %s not found in BlockStore.", batch_id)
 
     def get_transaction(self, transaction_id):
         """Returns a Transaction object from the block store by its id.
@@ -241,11 +524,17 @@ class BlockStore(MutableMapping):
         Raises:
             ValueError: The transaction is not in the block store
         """
-        if self.has_transaction(transaction_id):
-            batch = self.get_batch_by_transaction(transaction_id)
-            # Find transaction in batch
-            for txn in batch.transactions:
-                if txn.header_signature == transaction_id:
-                    return txn
+        try:
+            batch, txn_index = self._get_referenced_batch(transaction_id)
+        except KeyError:
+            raise ValueError('Transaction "%s" not in BlockStore',
+                             transaction_id)
+
+        if txn_index is not None and txn_index < len(batch.transactions):
+            return batch.transactions[txn_index]
+
+        for txn in batch.transactions:
+            if txn.header_signature == transaction_id:
+                return txn
 
         raise ValueError('Transaction "%s" not in BlockStore', transaction_id)
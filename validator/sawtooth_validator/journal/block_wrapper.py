@@ -14,6 +14,7 @@
 # ------------------------------------------------------------------------------
 from enum import Enum
 
+from sawtooth_validator.protobuf.block_pb2 import Block
 from sawtooth_validator.protobuf.block_pb2 import BlockHeader
 
 NULL_BLOCK_IDENTIFIER = "0000000000000000"
@@ -38,12 +39,49 @@ class BlockWrapper(object):
     stored in the Block Cache.
     """
     def __init__(self, block, weight=0, status=BlockStatus.Unknown):
-        self.block = block
+        self._block = block
+        self._block_loader = None
         self._block_header = None
         self.weight = weight  # the block weight calculated by the
         # consensus algorithm.
         self.status = status  # One of the BlockStatus types.
 
+    @property
+    def block(self):
+        """
+        Returns the wrapped block, reloading it if its batches were
+        released.
+        """
+        block_loader = self._block_loader
+        if block_loader is not None:
+            self._block = block_loader(self._block.header_signature)
+            self._block_loader = None
+        return self._block
+
+    @property
+    def batches_released(self):
+        """
+        Returns whether the block's batches are released.
+        """
+        return self._block_loader is not None
+
+    def release_batches(self, block_loader):
+        """
+        Releases the memory of the block's batches, keeping its header. The
+        block is reloaded, when next accessed, by calling block_loader with
+        its id.
+
+        Args:
+            block_loader (function): returns the Block with an id.
+        """
+        block = self._block
+        if self._block_header is None:
+            self._block_header = BlockHeader()
+            self._block_header.ParseFromString(block.header)
+        self._block = Block(header=block.header,
+                            header_signature=block.header_signature)
+        self._block_loader = block_loader
+
     @property
     def batches(self):
         """
@@ -71,7 +109,7 @@ class BlockWrapper(object):
         """
         if self._block_header is None:
             self._block_header = BlockHeader()
-            self._block_header.ParseFromString(self.block.header)
+            self._block_header.ParseFromString(self._block.header)
         return self._block_header
 
     @property
@@ -79,7 +117,7 @@ class BlockWrapper(object):
         """
         Returns the header signature of the block
         """
-        return self.block.header_signature
+        return self._block.header_signature
 
     @property
     def identifier(self):
@@ -87,7 +125,7 @@ class BlockWrapper(object):
         Returns the identifier of the block, currently the
         header signature
         """
-        return self.block.header_signature
+        return self._block.header_signature
 
     @property
     def block_num(self):
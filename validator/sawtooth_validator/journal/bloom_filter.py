@@ -0,0 +1,205 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import array
+import hashlib
+import math
+import random
+import struct
+from threading import Lock
+
+
+DEFAULT_CAPACITY = 100000
+DEFAULT_ERROR_RATE = 0.01
+
+# the number of masks a _BloomLayer chooses from for each string
+_MASK_COUNT = 1024
+
+# the version of the format of serialized filters, followed by the number
+# of layers
+_HEADER = struct.Struct('<II')
+_FORMAT_VERSION = 1
+# the capacity, error rate, count and number of words of a serialized layer,
+# which is followed by its masks and words
+_LAYER_HEADER = struct.Struct('<QdQQ')
+
+
+class _BloomLayer(object):
+    """A blocked Bloom filter: the bits set for each string are in two 64
+    bit words chosen by its hash, set in masks, from a fixed set of masks,
+    also chosen by its hash. Testing for a string reads two words.
+    """
+    def __init__(self, capacity, error_rate, count=0, masks=None,
+                 words=None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.count = count
+        if masks is not None:
+            self.masks = masks
+            self.words = words
+            return
+
+        # blocked filters need somewhat more bits than classic ones for the
+        # same error rate
+        size = -1.2 * capacity * math.log(error_rate) / math.log(2) ** 2
+        self.words = array.array('Q', bytes(8 * int(math.ceil(size / 64))))
+        bits_per_word = min(16, max(1, int(round(
+            size / capacity * math.log(2) / 2))))
+        rand = random.Random(bits_per_word)
+        self.masks = [sum(1 << bit for bit in rand.sample(range(64),
+                                                          bits_per_word))
+                      for _ in range(_MASK_COUNT)]
+
+    def _positions(self, item_hash):
+        word_count = len(self.words)
+        return ((item_hash >> 10) % word_count,
+                self.masks[item_hash & (_MASK_COUNT - 1)],
+                (item_hash >> 37) % word_count,
+                self.masks[(item_hash >> 20) & (_MASK_COUNT - 1)])
+
+    def add(self, item_hash):
+        index1, mask1, index2, mask2 = self._positions(item_hash)
+        self.words[index1] |= mask1
+        self.words[index2] |= mask2
+        self.count += 1
+
+    def contains(self, item_hash):
+        words = self.words
+        mask = self.masks[item_hash & (_MASK_COUNT - 1)]
+        if words[(item_hash >> 10) % len(words)] & mask != mask:
+            return False
+        mask = self.masks[(item_hash >> 20) & (_MASK_COUNT - 1)]
+        return words[(item_hash >> 37) % len(words)] & mask == mask
+
+
+class BloomFilter(object):
+    """A set of strings which, with probability up to about its error rate,
+    contains strings never added to it, but always contains the strings
+    added. Strings cannot be removed.
+
+    The filter grows as strings are added: when its capacity is reached,
+    another filter, twice as large and with half the error rate, is added
+    to it. Adding is threadsafe, and may be done while testing for strings.
+
+    Strings are hashed the same way by every process, so that a filter may
+    be persisted with to_bytes and loaded with from_bytes.
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY,
+                 error_rate=DEFAULT_ERROR_RATE):
+        """
+        Args:
+            capacity (int): the number of strings the filter holds before
+                it grows
+            error_rate (float): the probability of the filter containing a
+                string not added to it
+        """
+        self._layers = [_BloomLayer(capacity, error_rate / 2)]
+        self._lock = Lock()
+
+    @staticmethod
+    def _hash(item):
+        # Python's string hash is randomized per process, so it cannot be
+        # used by a persisted filter. The ids of blocks, batches and
+        # transactions are hex signatures, whose digits are already
+        # uniformly distributed, so their last 64 bits are used as is, and
+        # only other strings are digested.
+        try:
+            return int(item[-16:], 16) & 0xffffffffffffffff
+        except ValueError:
+            return int.from_bytes(
+                hashlib.md5(item.encode()).digest()[:8], 'little')
+
+    def add(self, item):
+        item_hash = self._hash(item)
+        with self._lock:
+            layer = self._layers[-1]
+            if layer.count >= layer.capacity:
+                layer = _BloomLayer(
+                    layer.capacity * 2, layer.error_rate / 2)
+                self._layers.append(layer)
+            layer.add(item_hash)
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item):
+        item_hash = self._hash(item)
+        for layer in self._layers:
+            if layer.contains(item_hash):
+                return True
+        return False
+
+    def __len__(self):
+        """Returns the number of strings added.
+        """
+        with self._lock:
+            return sum(layer.count for layer in self._layers)
+
+    def to_bytes(self):
+        """Returns the filter serialized, to be loaded with from_bytes.
+        """
+        with self._lock:
+            parts = [_HEADER.pack(_FORMAT_VERSION, len(self._layers))]
+            for layer in self._layers:
+                parts.append(_LAYER_HEADER.pack(
+                    layer.capacity, layer.error_rate, layer.count,
+                    len(layer.words)))
+                parts.append(array.array('Q', layer.masks).tobytes())
+                parts.append(layer.words.tobytes())
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Returns the filter serialized in data by to_bytes.
+
+        Args:
+            data (bytes): the serialized filter
+
+        Raises:
+            ValueError: if data is not a filter serialized by to_bytes
+        """
+        data = memoryview(data)
+        try:
+            version, layer_count = _HEADER.unpack_from(data)
+            if version != _FORMAT_VERSION or layer_count == 0:
+                raise ValueError(
+                    'Unsupported filter format {}'.format(version))
+            offset = _HEADER.size
+            layers = []
+            for _ in range(layer_count):
+                capacity, error_rate, count, word_count = \
+                    _LAYER_HEADER.unpack_from(data, offset)
+                offset += _LAYER_HEADER.size
+                masks = array.array('Q')
+                masks.frombytes(data[offset:offset + 8 * _MASK_COUNT])
+                offset += 8 * _MASK_COUNT
+                words = array.array('Q')
+                words.frombytes(data[offset:offset + 8 * word_count])
+                offset += 8 * word_count
+                if len(masks) != _MASK_COUNT or len(words) != word_count \
+                        or word_count == 0:
+                    raise ValueError('Filter data is truncated')
+                layers.append(_BloomLayer(
+                    capacity, error_rate, count, list(masks), words))
+        except struct.error as e:
+            raise ValueError('Filter data is truncated: {}'.format(e))
+        if offset != len(data):
+            raise ValueError('Filter data has trailing bytes')
+
+        bloom_filter = cls.__new__(cls)
+        bloom_filter._layers = layers
+        bloom_filter._lock = Lock()
+        return bloom_filter
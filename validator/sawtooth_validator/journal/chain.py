@@ -57,7 +57,8 @@ class BlockValidator(object):
                  executor,
                  squash_handler,
                  identity_signing_key,
-                 data_dir):
+                 data_dir,
+                 execution_result_cache=None):
         """Initialize the BlockValidator
         Args:
              consensus_module: The consensus module that contains
@@ -75,6 +76,9 @@ class BlockValidator(object):
              identity_signing_key: Private key for signing blocks.
              data_dir: Path to location where persistent data for the
              consensus module can be stored.
+             execution_result_cache: The results of executing the batches
+             of blocks this validator published, used in place of
+             executing them again.
         Returns:
             None
         """
@@ -90,6 +94,7 @@ class BlockValidator(object):
         self._identity_public_key = \
             signing.generate_pubkey(self._identity_signing_key)
         self._data_dir = data_dir
+        self._execution_result_cache = execution_result_cache
         self._result = {
             'new_block': new_block,
             'chain_head': chain_head,
@@ -169,10 +174,52 @@ class BlockValidator(object):
             committed_txn.add_txn(txn.header_signature)
         return True
 
+    def _persist_execution_result(self, blkw, result):
+        """Persists the state computed when this validator published the
+        block.
+        :param blkw: the block to persist the state of
+        :param result: the BlockExecutionResult of the block's batches
+        :return: the state hash persisted, or None if the block's batches
+        must be executed.
+        """
+        try:
+            state_hash = self._squash_handler(
+                result.squash_state_root, result.squash_context_ids, True)
+        except KeyError:
+            LOGGER.debug("Contexts of block %s no longer held, executing "
+                         "its batches", blkw)
+            return None
+
+        if state_hash != result.state_hash:
+            LOGGER.debug("Cached state of block %s did not persist to %s, "
+                         "executing its batches", blkw, result.state_hash)
+            return None
+        return state_hash
+
     def _verify_block_batches(self, blkw, committed_txn):
         if len(blkw.block.batches) > 0:
 
             prev_state = self._get_previous_block_root_state_hash(blkw)
+
+            # the batches of a block this validator published were
+            # executed when it was published
+            result = None
+            if self._execution_result_cache is not None:
+                result = self._execution_result_cache.pop(
+                    prev_state, blkw.header.batch_ids)
+            if result is not None:
+                state_hash = self._persist_execution_result(blkw, result)
+                # dependencies are only checked, adding the block's
+                # transactions to committed_txn, once the result is used,
+                # so that the batches are otherwise executed against the
+                # transactions committed before the block
+                if state_hash is not None:
+                    for batch in blkw.batches:
+                        if not self._verify_batches_dependencies(
+                                batch, committed_txn):
+                            return False
+                    return blkw.state_root_hash == state_hash
+
             scheduler = self._executor.create_scheduler(
                 self._squash_handler, prev_state)
             self._executor.execute(scheduler)
@@ -426,7 +473,8 @@ class ChainController(object):
                  squash_handler,
                  chain_id_manager,
                  identity_signing_key,
-                 data_dir):
+                 data_dir,
+                 execution_result_cache=None):
         """Initialize the ChainController
         Args:
              block_cache: The cache of all recent blocks and the processing
@@ -444,6 +492,9 @@ class ChainController(object):
              identity_signing_key: Private key for signing blocks.
              data_dir: path to location where persistent data for the
              consensus module can be stored.
+             execution_result_cache: The results of executing the batches
+             of blocks this validator published, passed to the
+             BlockValidators.
         Returns:
             None
         """
@@ -460,12 +511,15 @@ class ChainController(object):
         self._identity_public_key = \
             signing.generate_pubkey(self._identity_signing_key)
         self._data_dir = data_dir
+        self._execution_result_cache = execution_result_cache
 
         self._blocks_processing = {}  # a set of blocks that are
         # currently being processed.
         self._blocks_pending = {}  # set of blocks that the previous block
         # is being processed. Once that completes this block will be
         # scheduled for validation.
+        # The blocks pending, which include those processing, are pinned in
+        # the block cache until they are removed from _blocks_pending.
         self._chain_id_manager = chain_id_manager
 
         try:
@@ -504,7 +558,8 @@ class ChainController(object):
                 executor=self._transaction_executor,
                 squash_handler=self._squash_handler,
                 identity_signing_key=self._identity_signing_key,
-                data_dir=self._data_dir)
+                data_dir=self._data_dir,
+                execution_result_cache=self._execution_result_cache)
             self._blocks_processing[blkw.block.header_signature] = validator
             self._executor.submit(validator.run)
 
@@ -530,6 +585,7 @@ class ChainController(object):
                 # immediate descendants of this block in the process.
                 descendant_blocks = \
                     self._blocks_pending.pop(new_block.identifier, [])
+                self._block_cache.unpin(new_block.identifier)
 
                 # if the head has changed, since we started the work.
                 if result["chain_head"] != self._chain_head:
@@ -554,6 +610,7 @@ class ChainController(object):
                             descendant_blocks)
                     else:
                         LOGGER.debug('Verify block again: %s ', new_block)
+                        self._block_cache.pin(new_block.identifier)
                         self._blocks_pending[new_block.identifier] = []
                         self._submit_blocks_for_verification([new_block])
 
@@ -599,6 +656,7 @@ class ChainController(object):
                             self._blocks_pending.pop(
                                 pending_block.identifier,
                                 []))
+                        self._block_cache.unpin(pending_block.identifier)
 
                 # The block is otherwise valid, but we have determined we
                 # don't want it as the chain head.
@@ -633,6 +691,9 @@ class ChainController(object):
                 if block.identifier in self._blocks_processing:
                     return
 
+                # a block received again while pending is already pinned
+                if block.identifier not in self._blocks_pending:
+                    self._block_cache.pin(block.identifier)
                 self._block_cache[block.identifier] = block
                 self._blocks_pending[block.identifier] = []
                 LOGGER.debug("Block received: %s", block)
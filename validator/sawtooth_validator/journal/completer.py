@@ -30,6 +30,8 @@ from sawtooth_validator.protobuf import network_pb2
 from sawtooth_validator.networking.dispatch import Handler
 from sawtooth_validator.networking.dispatch import HandlerResult
 from sawtooth_validator.networking.dispatch import HandlerStatus
+from sawtooth_validator.networking.dispatch import decode_embedded_message
+from sawtooth_validator.networking.dispatch import decode_message
 
 LOGGER = logging.getLogger(__name__)
 
@@ -328,8 +330,7 @@ class CompleterBatchListBroadcastHandler(Handler):
         self._gossip = gossip
 
     def handle(self, connection_id, message_content):
-        request = ClientBatchSubmitRequest()
-        request.ParseFromString(message_content)
+        request = decode_message(message_content, ClientBatchSubmitRequest)
         for batch in request.batches:
             self._completer.add_batch(batch)
             self._gossip.broadcast_batch(batch)
@@ -342,16 +343,14 @@ class CompleterGossipHandler(Handler):
         self._completer = completer
 
     def handle(self, connection_id, message_content):
-        gossip_message = network_pb2.GossipMessage()
-        gossip_message.ParseFromString(message_content)
+        gossip_message = decode_message(
+            message_content, network_pb2.GossipMessage)
         if gossip_message.content_type == "BLOCK":
-            block = Block()
-            block.ParseFromString(gossip_message.content)
-            self._completer.add_block(block)
+            self._completer.add_block(decode_embedded_message(
+                message_content, network_pb2.GossipMessage, Block))
         elif gossip_message.content_type == "BATCH":
-            batch = Batch()
-            batch.ParseFromString(gossip_message.content)
-            self._completer.add_batch(batch)
+            self._completer.add_batch(decode_embedded_message(
+                message_content, network_pb2.GossipMessage, Batch))
         return HandlerResult(
             status=HandlerStatus.PASS)
 
@@ -361,11 +360,8 @@ class CompleterGossipBlockResponseHandler(Handler):
         self._completer = completer
 
     def handle(self, connection_id, message_content):
-        block_response_message = network_pb2.GossipBlockResponse()
-        block_response_message.ParseFromString(message_content)
-
-        block = Block()
-        block.ParseFromString(block_response_message.content)
+        block = decode_embedded_message(
+            message_content, network_pb2.GossipBlockResponse, Block)
         self._completer.add_block(block)
 
         return HandlerResult(status=HandlerStatus.PASS)
@@ -376,11 +372,8 @@ class CompleterGossipBatchResponseHandler(Handler):
         self._completer = completer
 
     def handle(self, connection_id, message_content):
-        batch_response_message = network_pb2.GossipBatchResponse()
-        batch_response_message.ParseFromString(message_content)
-
-        batch = Batch()
-        batch.ParseFromString(batch_response_message.content)
+        batch = decode_embedded_message(
+            message_content, network_pb2.GossipBatchResponse, Batch)
         self._completer.add_batch(batch)
 
         return HandlerResult(status=HandlerStatus.PASS)
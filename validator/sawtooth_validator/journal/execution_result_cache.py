@@ -0,0 +1,113 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+from collections import namedtuple
+from collections import OrderedDict
+from threading import Lock
+
+
+# the number of blocks whose execution results are kept
+DEFAULT_EXECUTION_RESULT_CACHE_SIZE = 16
+
+
+# The state computed by executing the batches of a block: the state hash,
+# and the state root and contexts squashed to compute it, which hold the
+# state changes of the batches.
+BlockExecutionResult = namedtuple(
+    'BlockExecutionResult',
+    ['state_hash', 'squash_state_root', 'squash_context_ids'])
+
+
+class SquashRecorder(object):
+    """Wraps a squash handler, recording the state root and contexts
+    squashed to each state hash, so that the state a scheduler computed may
+    be persisted later without executing its transactions again.
+    """
+    def __init__(self, squash_handler, state_root_hash):
+        """
+        Args:
+            squash_handler (function): the squash handler to wrap
+            state_root_hash (str): the state root the scheduler's batches
+                are executed against
+        """
+        self._squash_handler = squash_handler
+        self.state_root_hash = state_root_hash
+        # state hash: (state root, context ids)
+        self._squashes = {}
+
+    def __call__(self, state_root, context_ids, persist):
+        state_hash = self._squash_handler(state_root, context_ids, persist)
+        if not persist:
+            self._squashes[state_hash] = (state_root, list(context_ids))
+        return state_hash
+
+    def get_result(self, state_hash):
+        """Returns the BlockExecutionResult of a state hash computed by a
+        squash, or None if no squash computed it.
+        """
+        if state_hash not in self._squashes:
+            return None
+        state_root, context_ids = self._squashes[state_hash]
+        return BlockExecutionResult(
+            state_hash=state_hash,
+            squash_state_root=state_root,
+            squash_context_ids=context_ids)
+
+
+class ExecutionResultCache(object):
+    """Holds the results of executing the batches of the blocks this
+    validator published, keyed by the state root the batches were executed
+    against and the batch ids in order, so that the blocks are validated
+    without executing their batches again. The least recently added results
+    are discarded beyond the cache's size.
+    """
+    def __init__(self, size=DEFAULT_EXECUTION_RESULT_CACHE_SIZE):
+        self._size = size
+        self._lock = Lock()
+        self._results = OrderedDict()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._results)
+
+    def put(self, state_root_hash, batch_ids, result):
+        """Adds the result of executing batches.
+
+        Args:
+            state_root_hash (str): the state root the batches were executed
+                against
+            batch_ids (list of str): the ids of the batches, in order
+            result (BlockExecutionResult): the result of executing them
+        """
+        with self._lock:
+            self._results[(state_root_hash, tuple(batch_ids))] = result
+            while len(self._results) > self._size:
+                self._results.popitem(last=False)
+
+    def pop(self, state_root_hash, batch_ids):
+        """Removes and returns the result of executing batches, as the
+        contexts holding their state changes may be squashed only once.
+
+        Args:
+            state_root_hash (str): the state root the batches were executed
+                against
+            batch_ids (list of str): the ids of the batches, in order
+
+        Returns:
+            BlockExecutionResult: the result, or None if it is not cached
+        """
+        with self._lock:
+            return self._results.pop(
+                (state_root_hash, tuple(batch_ids)), None)
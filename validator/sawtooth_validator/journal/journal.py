@@ -13,19 +13,44 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
+from collections import namedtuple
 from concurrent.futures import ThreadPoolExecutor
 import logging
 import queue
+from threading import Lock
 from threading import Thread
 import time
 
+from google.protobuf.message import DecodeError
+
 from sawtooth_validator.journal.publisher import BlockPublisher
 from sawtooth_validator.journal.chain import ChainController
 from sawtooth_validator.journal.block_cache import BlockCache
+from sawtooth_validator.journal.execution_result_cache import \
+    ExecutionResultCache
+from sawtooth_validator.networking.dispatch import Handler
+from sawtooth_validator.networking.dispatch import HandlerResult
+from sawtooth_validator.networking.dispatch import HandlerStatus
+from sawtooth_validator.networking.dispatch import decode_message
+from sawtooth_validator.protobuf import client_pb2
+from sawtooth_validator.protobuf import validator_pb2
 
 
 LOGGER = logging.getLogger(__name__)
 
+# the bounds of the number of pending batches above which batches submitted
+# by clients are rejected
+DEFAULT_MAX_PENDING_BATCHES = 10000
+MIN_PENDING_BATCHES = 100
+# the number of blocks of batches, at the average number of batches in the
+# latest blocks, which may be pending before batches are rejected
+PENDING_BATCH_BACKLOG_BLOCKS = 3
+
+
+PendingBatchMetrics = namedtuple(
+    'PendingBatchMetrics',
+    ['pending', 'limit', 'admitted', 'rejected'])
+
 
 class Journal(object):
     """
@@ -125,7 +150,8 @@ class Journal(object):
                  check_publish_block_frequency=0.1,
                  block_cache_purge_frequency=30,
                  block_cache_keep_time=300,
-                 block_cache=None):
+                 block_cache=None,
+                 max_pending_batches=DEFAULT_MAX_PENDING_BATCHES):
         """
         Creates a Journal instance.
 
@@ -151,6 +177,8 @@ class Journal(object):
             blocks in the BlockCache.
             block_cache (:obj:`BlockCache`, optional): A BlockCache to use in
                 place of an internally created instance. Defaults to None.
+            max_pending_batches (int): the most batches which may be pending
+                before batches submitted by clients are rejected.
         """
         self._block_store = block_store
         self._block_cache = block_cache
@@ -170,6 +198,13 @@ class Journal(object):
         self._check_publish_block_frequency = check_publish_block_frequency
         self._batch_queue = queue.Queue()
         self._publisher_thread = None
+        # the results of executing the batches of the blocks published, for
+        # the chain controller to validate them without executing them again
+        self._execution_result_cache = ExecutionResultCache()
+        self._max_pending_batches = max_pending_batches
+        self._admission_lock = Lock()
+        self._admitted_batches = 0
+        self._rejected_batches = 0
 
         self._chain_controller = None
         self._block_queue = queue.Queue()
@@ -187,7 +222,8 @@ class Journal(object):
             squash_handler=self._squash_handler,
             chain_head=self._block_store.chain_head,
             identity_signing_key=self._identity_signing_key,
-            data_dir=self._data_dir
+            data_dir=self._data_dir,
+            execution_result_cache=self._execution_result_cache
         )
         self._publisher_thread = self._PublisherThread(
             block_publisher=self._block_publisher,
@@ -204,7 +240,8 @@ class Journal(object):
             squash_handler=self._squash_handler,
             chain_id_manager=self._chain_id_manager,
             identity_signing_key=self._identity_signing_key,
-            data_dir=self._data_dir
+            data_dir=self._data_dir,
+            execution_result_cache=self._execution_result_cache
         )
         self._chain_thread = self._ChainThread(
             chain_controller=self._chain_controller,
@@ -251,3 +288,96 @@ class Journal(object):
         inclusion in the next block.
         """
         self._batch_queue.put(batch)
+
+    def _get_pending_batch_count(self):
+        pending = self._batch_queue.qsize()
+        if self._block_publisher is not None:
+            pending += self._block_publisher.pending_batch_count
+        return pending
+
+    def get_pending_batch_limit(self):
+        """
+        Returns the number of pending batches at which batches submitted by
+        clients are rejected: PENDING_BATCH_BACKLOG_BLOCKS blocks of
+        batches, at the average number of batches in the latest blocks,
+        within MIN_PENDING_BATCHES and max_pending_batches.
+        """
+        batches_per_block = None
+        if self._block_publisher is not None:
+            batches_per_block = \
+                self._block_publisher.average_batches_per_block
+        if batches_per_block is None:
+            return self._max_pending_batches
+
+        limit = int(PENDING_BATCH_BACKLOG_BLOCKS * batches_per_block)
+        return max(min(limit, self._max_pending_batches),
+                   min(MIN_PENDING_BATCHES, self._max_pending_batches))
+
+    def admit_batches(self, batch_count):
+        """
+        Returns whether batches submitted by a client are admitted, which
+        they are unless as many batches as the limit are pending, and
+        counts those admitted and rejected.
+
+        Args:
+            batch_count (int): the number of batches submitted.
+        """
+        admitted = \
+            self._get_pending_batch_count() < self.get_pending_batch_limit()
+        with self._admission_lock:
+            if admitted:
+                self._admitted_batches += batch_count
+            else:
+                self._rejected_batches += batch_count
+        return admitted
+
+    def get_pending_batch_metrics(self):
+        """
+        Returns:
+            PendingBatchMetrics: the number of batches pending, the limit at
+                which client batches are rejected, and the number of client
+                batches admitted and rejected.
+        """
+        with self._admission_lock:
+            return PendingBatchMetrics(
+                pending=self._get_pending_batch_count(),
+                limit=self.get_pending_batch_limit(),
+                admitted=self._admitted_batches,
+                rejected=self._rejected_batches)
+
+
+def log_pending_batch_metrics(metrics):
+    """Logs the metrics of pending batches at debug level.
+
+    Args:
+        metrics (PendingBatchMetrics): the metrics of pending batches
+    """
+    LOGGER.debug(
+        "pending batches: %s/%s pending, %s admitted, %s rejected",
+        metrics.pending, metrics.limit, metrics.admitted, metrics.rejected)
+
+
+class BatchSubmitAdmissionHandler(Handler):
+    """Replies to batch submissions with a QUEUE_FULL status while the
+    journal has as many batches pending as it admits, before their
+    signatures are verified or they are broadcast.
+    """
+    def __init__(self, journal):
+        self._journal = journal
+
+    def handle(self, connection_id, message_content):
+        try:
+            request = decode_message(
+                message_content, client_pb2.ClientBatchSubmitRequest)
+        except DecodeError:
+            # the request is answered by the handlers which use it
+            return HandlerResult(status=HandlerStatus.PASS)
+
+        if self._journal.admit_batches(len(request.batches)):
+            return HandlerResult(status=HandlerStatus.PASS)
+
+        return HandlerResult(
+            status=HandlerStatus.RETURN,
+            message_out=client_pb2.ClientBatchSubmitResponse(
+                status=client_pb2.ClientBatchSubmitResponse.QUEUE_FULL),
+            message_type=validator_pb2.Message.CLIENT_BATCH_SUBMIT_RESPONSE)
@@ -0,0 +1,182 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+from collections import OrderedDict
+import heapq
+import itertools
+
+from sawtooth_validator.protobuf.batch_pb2 import BatchHeader
+from sawtooth_validator.protobuf.transaction_pb2 import TransactionHeader
+
+
+class _PendingBatch(object):
+    def __init__(self, batch, sequence):
+        self.batch = batch
+        self.sequence = sequence
+
+        batch_header = BatchHeader()
+        batch_header.ParseFromString(batch.header)
+        self.signer = batch_header.signer_pubkey
+
+        self.txn_ids = [txn.header_signature for txn in batch.transactions]
+        # the ids of the transactions, outside of the batch, that the
+        # batch's transactions depend on
+        self.dependencies = set()
+        for txn in batch.transactions:
+            txn_header = TransactionHeader()
+            txn_header.ParseFromString(txn.header)
+            self.dependencies.update(txn_header.dependencies)
+        self.dependencies.difference_update(self.txn_ids)
+
+
+class PendingBatchPool(object):
+    """The batches waiting to be published, indexed by batch id and by the
+    ids of their transactions, so that batches are added and removed in
+    constant time, however many are pending.
+
+    Batches are iterated in the order they were added, except that a batch
+    follows the earlier batches of its signer, and the pending batches
+    holding the transactions it depends on, so that a batch is not dropped
+    from a block for depending on a batch received after it.
+    """
+    def __init__(self):
+        # batch id: _PendingBatch, in the order batches were added
+        self._batches = OrderedDict()
+        # transaction id: the id of the pending batch holding it
+        self._txn_batch_ids = {}
+        self._last_sequence = itertools.count()
+        self._first_sequence = itertools.count(-1, -1)
+
+    def __len__(self):
+        return len(self._batches)
+
+    def __contains__(self, batch_id):
+        return batch_id in self._batches
+
+    def _index(self, pending):
+        batch_id = pending.batch.header_signature
+        self._batches[batch_id] = pending
+        for txn_id in pending.txn_ids:
+            self._txn_batch_ids.setdefault(txn_id, batch_id)
+
+    def add(self, batch):
+        """Adds a batch after the pending batches. A batch already pending
+        keeps its place.
+
+        Args:
+            batch (Batch): the batch to add
+        """
+        if batch.header_signature not in self._batches:
+            self._index(_PendingBatch(batch, next(self._last_sequence)))
+
+    def add_first(self, batches):
+        """Adds batches, in order, before the pending batches, as when the
+        batches of an abandoned fork are pending again. Batches already
+        pending are moved before the others.
+
+        Args:
+            batches (list of Batch): the batches to add
+        """
+        for batch in reversed(batches):
+            self.remove(batch.header_signature)
+            self._index(_PendingBatch(batch, next(self._first_sequence)))
+            self._batches.move_to_end(batch.header_signature, last=False)
+
+    def remove(self, batch_id):
+        """Removes a batch, if it is pending.
+
+        Args:
+            batch_id (str): the id of the batch
+        """
+        pending = self._batches.pop(batch_id, None)
+        if pending is None:
+            return
+        for txn_id in pending.txn_ids:
+            if self._txn_batch_ids.get(txn_id) == batch_id:
+                del self._txn_batch_ids[txn_id]
+
+    def get_dependencies(self, batch_id):
+        """Returns the ids of the pending batches holding transactions that
+        a pending batch depends on.
+
+        Args:
+            batch_id (str): the id of the pending batch
+        """
+        return self._get_dependencies(self._batches[batch_id])
+
+    def _get_dependencies(self, pending):
+        batch_id = pending.batch.header_signature
+        return {self._txn_batch_ids[txn_id]
+                for txn_id in pending.dependencies
+                if txn_id in self._txn_batch_ids} - {batch_id}
+
+    def __iter__(self):
+        """Yields the pending batches in the order they were added, holding
+        back a batch until the earlier batches of its signer, and the
+        pending batches it depends on, are yielded. Batches held back by a
+        cycle, such as a batch depending on a later batch of its signer, are
+        yielded after the others, in the order they were added.
+        """
+        # the batches are copied, so that batches may be added and removed
+        # as they are yielded
+        pending_batches = list(self._batches.values())
+        by_id = {pending.batch.header_signature: pending
+                 for pending in pending_batches}
+
+        yielded = set()
+        # batch id: the ids of the batches waiting for it to be yielded
+        waiting = {}
+        # batch id: the number of batches it is waiting for
+        blocked = {}
+        # signer: the id of its latest batch
+        latest_by_signer = {}
+
+        def release(batch_id):
+            ready = [(by_id[batch_id].sequence, batch_id)]
+            while ready:
+                _, ready_id = heapq.heappop(ready)
+                yielded.add(ready_id)
+                yield by_id[ready_id].batch
+                for waiter_id in waiting.pop(ready_id, []):
+                    if waiter_id not in blocked:
+                        continue
+                    blocked[waiter_id] -= 1
+                    if not blocked[waiter_id]:
+                        del blocked[waiter_id]
+                        heapq.heappush(
+                            ready, (by_id[waiter_id].sequence, waiter_id))
+
+        for pending in pending_batches:
+            batch_id = pending.batch.header_signature
+            predecessors = self._get_dependencies(pending)
+            if pending.signer in latest_by_signer:
+                predecessors.add(latest_by_signer[pending.signer])
+            latest_by_signer[pending.signer] = batch_id
+            predecessors = {predecessor for predecessor in predecessors
+                            if predecessor in by_id and
+                            predecessor not in yielded}
+
+            if predecessors:
+                blocked[batch_id] = len(predecessors)
+                for predecessor in predecessors:
+                    waiting.setdefault(predecessor, []).append(batch_id)
+            else:
+                yield from release(batch_id)
+
+        for pending in pending_batches:
+            batch_id = pending.batch.header_signature
+            if batch_id in blocked:
+                del blocked[batch_id]
+                yield from release(batch_id)
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # ------------------------------------------------------------------------------
+from collections import deque
 import logging
 from threading import RLock
 
@@ -21,6 +22,8 @@ from sawtooth_validator.execution.scheduler_exceptions import SchedulerError
 
 from sawtooth_validator.journal.block_builder import BlockBuilder
 from sawtooth_validator.journal.block_wrapper import BlockWrapper
+from sawtooth_validator.journal.execution_result_cache import SquashRecorder
+from sawtooth_validator.journal.pending_batch_pool import PendingBatchPool
 from sawtooth_validator.journal.consensus.batch_publisher import \
     BatchPublisher
 from sawtooth_validator.journal.consensus.consensus_factory import \
@@ -36,6 +39,10 @@ from sawtooth_validator.state.config_view import ConfigView
 
 LOGGER = logging.getLogger(__name__)
 
+# the number of the latest blocks of the chain over which the average number
+# of batches published in a block is measured
+BATCHES_PER_BLOCK_WINDOW = 10
+
 
 class _CandidateBlock(object):
     """This is a helper class for the BlockPublisher. The _CandidateBlock
@@ -49,10 +56,17 @@ class _CandidateBlock(object):
                  scheduler,
                  committed_txn_cache,
                  block_builder,
-                 max_batches
+                 max_batches,
+                 squash_recorder=None,
+                 execution_result_cache=None
                  ):
         self._pending_batches = []
         self._pending_batch_ids = set()
+        # the ids of the batches offered to the block, whether or not they
+        # were added to it
+        self._offered_batch_ids = []
+        # the number of offered batches up to the last one added
+        self._offered_count = 0
         self._block_store = block_store
         self._consensus = consensus
         self._scheduler = scheduler
@@ -62,6 +76,11 @@ class _CandidateBlock(object):
         # candidate block.
         self._block_builder = block_builder
         self._max_batches = max_batches
+        # the scheduler's squash handler, recording the state changes of the
+        # batches, which are kept in the execution_result_cache for the
+        # block to be validated without executing them again.
+        self._squash_recorder = squash_recorder
+        self._execution_result_cache = execution_result_cache
 
     def __del__(self):
         # Cancel the scheduler if it is not complete
@@ -78,6 +97,13 @@ class _CandidateBlock(object):
             return self._pending_batches[-1]
         return None
 
+    @property
+    def offered_batch_ids(self):
+        """The ids of the batches offered to the block, up to and including
+        the last one added to it.
+        """
+        return self._offered_batch_ids[:self._offered_count]
+
     @property
     def can_add_batch(self):
         return self._max_batches == 0 or\
@@ -153,6 +179,7 @@ class _CandidateBlock(object):
         # BlockPublisher prior to this Batch. So if there is a missing
         # dependency this is an error condition and the batch will be
         # dropped.
+        self._offered_batch_ids.append(batch.header_signature)
         if self._is_batch_already_committed(batch):
             # batch is already committed.
             LOGGER.debug("Dropping previously committed batch: %s",
@@ -161,6 +188,7 @@ class _CandidateBlock(object):
         elif self._check_batch_dependencies(batch, self._committed_txn_cache):
             self._pending_batches.append(batch)
             self._pending_batch_ids.add(batch.header_signature)
+            self._offered_count = len(self._offered_batch_ids)
             try:
                 self._scheduler.add_batch(batch)
             except SchedulerError as err:
@@ -248,7 +276,17 @@ class _CandidateBlock(object):
 
         builder.set_state_hash(state_hash)
         self._sign_block(builder, identity_signing_key)
-        return builder.build_block()
+        block = builder.build_block()
+
+        if self._execution_result_cache is not None:
+            result = self._squash_recorder.get_result(state_hash)
+            if result is not None:
+                self._execution_result_cache.put(
+                    self._squash_recorder.state_root_hash,
+                    builder.block_header.batch_ids,
+                    result)
+
+        return block
 
 
 class BlockPublisher(object):
@@ -265,7 +303,8 @@ class BlockPublisher(object):
                  squash_handler,
                  chain_head,
                  identity_signing_key,
-                 data_dir):
+                 data_dir,
+                 execution_result_cache=None):
         """
         Initialize the BlockPublisher object
 
@@ -283,6 +322,9 @@ class BlockPublisher(object):
             identity_signing_key (str): Private key for signing blocks
             data_dir (str): path to location where persistent data for the
              consensus module can be stored.
+            execution_result_cache (:obj:`ExecutionResultCache`): receives
+                the results of executing the batches of published blocks,
+                so that they are not executed again to validate the blocks.
         """
         self._lock = RLock()
         self._candidate_block = None  # _CandidateBlock helper,
@@ -293,15 +335,22 @@ class BlockPublisher(object):
         self._block_sender = block_sender
         self._batch_publisher = BatchPublisher(identity_signing_key,
                                                batch_sender)
-        self._pending_batches = []  # batches we are waiting for validation,
-        # arranged in the order of batches received.
+        # batches we are waiting for validation, arranged in the order of
+        # batches received.
+        self._pending_batches = PendingBatchPool()
+
+        # the number of batches in each of the latest blocks of the chain
+        self._block_batch_counts = deque(maxlen=BATCHES_PER_BLOCK_WINDOW)
 
         self._chain_head = chain_head  # block (BlockWrapper)
+        if chain_head is not None:
+            self._block_cache.pin(chain_head.identifier)
         self._squash_handler = squash_handler
         self._identity_signing_key = identity_signing_key
         self._identity_public_key = \
             signing.generate_pubkey(self._identity_signing_key)
         self._data_dir = data_dir
+        self._execution_result_cache = execution_result_cache
 
     def _build_candidate_block(self, chain_head):
         """ Build a candidate block and construct the consensus object to
@@ -339,8 +388,14 @@ class BlockPublisher(object):
             return None
 
         # create a new scheduler
+        squash_handler = self._squash_handler
+        squash_recorder = None
+        if self._execution_result_cache is not None:
+            squash_recorder = SquashRecorder(
+                squash_handler, chain_head.state_root_hash)
+            squash_handler = squash_recorder
         scheduler = self._transaction_executor.create_scheduler(
-            self._squash_handler, chain_head.state_root_hash)
+            squash_handler, chain_head.state_root_hash)
 
         # build the TransactionCache
         committed_txn_cache = TransactionCache(self._block_cache.block_store)
@@ -350,20 +405,40 @@ class BlockPublisher(object):
                                                 consensus, scheduler,
                                                 committed_txn_cache,
                                                 block_builder,
-                                                max_batches)
+                                                max_batches,
+                                                squash_recorder,
+                                                self._execution_result_cache)
         for batch in self._pending_batches:
             if self._candidate_block.can_add_batch:
                 self._candidate_block.add_batch(batch)
             else:
                 break
 
+    @property
+    def pending_batch_count(self):
+        """
+        The number of batches waiting to be published.
+        """
+        return len(self._pending_batches)
+
+    @property
+    def average_batches_per_block(self):
+        """
+        The average number of batches in the latest blocks of the chain, or
+        None if the chain has not been updated yet.
+        """
+        counts = list(self._block_batch_counts)
+        if not counts:
+            return None
+        return sum(counts) / len(counts)
+
     def on_batch_received(self, batch):
         """
         A new batch is received, send it for validation
         :param batch: the new pending batch
         :return: None
         """
-        self._pending_batches.append(batch)
+        self._pending_batches.add(batch)
         # if we are building a block then send schedule it for
         # execution.
         if self._candidate_block and self._candidate_block.can_add_batch:
@@ -384,18 +459,14 @@ class BlockPublisher(object):
 
         committed_set = set([x.header_signature for x in committed_batches])
 
-        pending_batches = self._pending_batches
-        self._pending_batches = []
+        for batch in committed_batches:
+            self._pending_batches.remove(batch.header_signature)
 
         # Uncommitted and pending disjoint sets
         # since batches can only be committed to a chain once.
-        for batch in uncommitted_batches:
-            if batch.header_signature not in committed_set:
-                self._pending_batches.append(batch)
-
-        for batch in pending_batches:
-            if batch.header_signature not in committed_set:
-                self._pending_batches.append(batch)
+        self._pending_batches.add_first(
+            [batch for batch in uncommitted_batches
+             if batch.header_signature not in committed_set])
 
     def on_chain_updated(self, chain_head,
                          committed_batches=None,
@@ -415,6 +486,14 @@ class BlockPublisher(object):
             with self._lock:
                 LOGGER.info('Now building on top of block: %s', chain_head)
 
+                # the chain head is pinned in the block cache while it is
+                # built on
+                if chain_head is not None:
+                    self._block_cache.pin(chain_head.identifier)
+                    self._block_batch_counts.append(
+                        len(chain_head.header.batch_ids))
+                if self._chain_head is not None:
+                    self._block_cache.unpin(self._chain_head.identifier)
                 self._chain_head = chain_head
 
                 self._candidate_block = None  # we need to make a new
@@ -449,8 +528,8 @@ class BlockPublisher(object):
 
                     pending_batches = []  # will receive the list of batches
                     # that were not added to the block
-                    last_batch = self._candidate_block.last_batch
-                    block = self._candidate_block.finalize_block(
+                    candidate_block = self._candidate_block
+                    block = candidate_block.finalize_block(
                         self._identity_signing_key,
                         pending_batches)
                     self._candidate_block = None
@@ -459,15 +538,14 @@ class BlockPublisher(object):
                         LOGGER.info("Claimed Block: %s", blkw)
                         self._block_sender.send(blkw.block)
 
-                        # check if we have batches that were not
-                        # sent to the CandidateBlock.
-                        last_batch_index =\
-                            self._pending_batches.index(last_batch)
-                        additional_batches =\
-                            self._pending_batches[last_batch_index + 1:]
-
-                        self._pending_batches =\
-                            pending_batches + additional_batches
+                        # the batches offered to the CandidateBlock are no
+                        # longer pending, other than those it did not
+                        # execute in time.
+                        unexecuted_set = set(
+                            [x.header_signature for x in pending_batches])
+                        for batch_id in candidate_block.offered_batch_ids:
+                            if batch_id not in unexecuted_set:
+                                self._pending_batches.remove(batch_id)
 
                         # We built our candidate, disable processing until
                         # the chain head is updated. Only set this if
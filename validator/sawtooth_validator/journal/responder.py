@@ -20,6 +20,7 @@ from threading import RLock
 from sawtooth_validator.networking.dispatch import Handler
 from sawtooth_validator.networking.dispatch import HandlerResult
 from sawtooth_validator.networking.dispatch import HandlerStatus
+from sawtooth_validator.networking.dispatch import decode_embedded_message
 from sawtooth_validator.journal.timed_cache import TimedCache
 from sawtooth_validator.protobuf import network_pb2
 from sawtooth_validator.protobuf import validator_pb2
@@ -117,10 +118,10 @@ class ResponderBlockResponseHandler(Handler):
         self._gossip = gossip
 
     def handle(self, connection_id, message_content):
-        block_response = network_pb2.GossipBlockResponse()
-        block_response.ParseFromString(message_content)
-        block = block_pb2.Block()
-        block.ParseFromString(block_response.content)
+        # the completer may have completed the block's batches, but its id
+        # is unchanged
+        block = decode_embedded_message(
+            message_content, network_pb2.GossipBlockResponse, block_pb2.Block)
         open_request = self._responder.get_request(block.header_signature)
 
         if open_request is None:
@@ -241,10 +242,8 @@ class ResponderBatchResponseHandler(Handler):
         self._gossip = gossip
 
     def handle(self, connection_id, message_content):
-        batch_response = network_pb2.GossipBatchResponse()
-        batch_response.ParseFromString(message_content)
-        batch = batch_pb2.Batch()
-        batch.ParseFromString(batch_response.content)
+        batch = decode_embedded_message(
+            message_content, network_pb2.GossipBatchResponse, batch_pb2.Batch)
         open_request = self._responder.get_request(batch.header_signature)
 
         if open_request is None:
@@ -13,6 +13,7 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 # pylint: disable=no-name-in-module
+from collections import OrderedDict
 from collections.abc import MutableMapping
 from threading import RLock
 import time
@@ -22,6 +23,10 @@ class TimedCache(MutableMapping):
     """
     A dict like interface to access blocks. Stores BlockState objects.
 
+    Entries are kept in the order they were last set or accessed, so that
+    expired entries are found, and the least recently used evicted when the
+    cache is full, without visiting the others.
+
     Accesses are Thread safe.
     """
     class CachedValue(object):
@@ -36,30 +41,68 @@ class TimedCache(MutableMapping):
             """
             self.timestamp = time.time()
 
-    def __init__(self, keep_time=10):
+    def __init__(self, keep_time=10, max_size=None):
+        """
+        Args:
+            keep_time (float): the seconds an entry is kept, after it is
+                last set or accessed, before purge_expired removes it
+            max_size (int, optional): the number of entries kept; when it
+                is exceeded, the least recently used entry is evicted
+        """
         super(TimedCache, self).__init__()
         self._lock = RLock()
-        self._cache = {}
+        self._cache = OrderedDict()
         self._keep_time = keep_time  # time in seconds before purging blocks
         # from cache.
+        self._max_size = max_size
+        self._expired_count = 0
+        self._evicted_count = 0
 
     def __setitem__(self, key, value):
         with self._lock:
             self._cache[key] = self.CachedValue(value)
+            self._cache.move_to_end(key)
+            if self._max_size is not None:
+                self._evict(key)
+
+    def _evict(self, new_key):
+        """Evicts the least recently used entries until the cache is within
+        its size, visiting only those evicted and any pinned entries before
+        them. Pinned entries are kept, as if they were accessed, and the
+        entry under new_key, the most recently used, is never evicted.
+        """
+        for _ in range(len(self._cache)):
+            if len(self._cache) <= self._max_size:
+                return
+            old_key = next(iter(self._cache))
+            if old_key == new_key:
+                return
+            if self._is_pinned(old_key):
+                self._cache[old_key].touch()
+                self._cache.move_to_end(old_key)
+                # the new entry stays the most recently used
+                self._cache.move_to_end(new_key)
+            else:
+                del self._cache[old_key]
+                self._removed(old_key)
+                self._evicted_count += 1
 
     def __getitem__(self, key):
         with self._lock:
             value = self._cache[key]
             value.touch()
+            self._cache.move_to_end(key)
             return value.value
 
     def __delitem__(self, key):
         with self._lock:
             del self._cache[key]
+            self._removed(key)
 
     def __iter__(self):
+        # iterates a copy of the keys, as accessing an entry reorders them
         with self._lock:
-            return iter(self._cache)
+            return iter(list(self._cache))
 
     def __len__(self):
         with self._lock:
@@ -72,6 +115,20 @@ class TimedCache(MutableMapping):
                 out.append(str(v.value))
             return ','.join(out)
 
+    def items(self):
+        """Returns the (key, value) pairs of the entries, least recently
+        used first, without marking them accessed.
+        """
+        with self._lock:
+            return [(key, cached.value) for key, cached in self._cache.items()]
+
+    def values(self):
+        """Returns the values of the entries, least recently used first,
+        without marking them accessed.
+        """
+        with self._lock:
+            return [cached.value for cached in self._cache.values()]
+
     @property
     def cache(self):
         return self._cache
@@ -80,14 +137,54 @@ class TimedCache(MutableMapping):
     def keep_time(self):
         return self._keep_time
 
+    @property
+    def max_size(self):
+        return self._max_size
+
+    @property
+    def expired_count(self):
+        """The number of entries removed by purge_expired.
+        """
+        with self._lock:
+            return self._expired_count
+
+    @property
+    def evicted_count(self):
+        """The number of entries evicted because the cache was full.
+        """
+        with self._lock:
+            return self._evicted_count
+
+    def _is_pinned(self, key):
+        """Returns whether the entry under key is kept, while it is
+        pinned, however long since it was used. Subclasses pinning entries
+        override this.
+        """
+        return False
+
+    def _removed(self, key):
+        """Called, with the lock held, when the entry under key is deleted,
+        evicted or expired. Subclasses keeping state per entry override
+        this.
+        """
+        pass
+
     def purge_expired(self):
         """
-        Remove all expired entries from the cache.
+        Remove all expired entries from the cache, visiting only the expired
+        entries, from the least recently used. Expired entries which are
+        pinned are kept, as if they were accessed.
         """
         with self._lock:
             time_horizon = time.time() - self._keep_time
-            new_cache = {}
-            for (k, v) in self._cache.items():
-                if v.timestamp > time_horizon:
-                    new_cache[k] = v
-            self._cache = new_cache
+            while self._cache:
+                key, value = next(iter(self._cache.items()))
+                if value.timestamp > time_horizon:
+                    break
+                if self._is_pinned(key):
+                    value.touch()
+                    self._cache.move_to_end(key)
+                else:
+                    del self._cache[key]
+                    self._removed(key)
+                    self._expired_count += 1
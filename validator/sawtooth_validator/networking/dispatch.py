@@ -13,13 +13,16 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 import abc
+from collections import deque
+from collections import namedtuple
+from concurrent.futures import Future
 import enum
 from functools import partial
 import logging
 from threading import Condition
 from threading import Lock
 from threading import Thread
-import queue
+import time
 import uuid
 
 from sawtooth_validator.networking.interconnect import ThreadsafeDict
@@ -29,19 +32,189 @@ from sawtooth_validator.protobuf import validator_pb2
 LOGGER = logging.getLogger(__name__)
 
 
+class MessagePriority(enum.IntEnum):
+    HIGH = 0  # Consensus-critical messages, such as blocks
+    NORMAL = 1  # The default
+    LOW = 2  # Messages which may wait, such as client queries
+
+
+class QueueFullPolicy(enum.Enum):
+    """How a full queue sheds messages. Only messages which a handler
+    defines a busy_result for may be shed; others are queued regardless,
+    as their senders wait on a reply.
+    """
+    DROP_NEWEST = 1  # Drop the arriving message, without a reply
+    DROP_OLDEST = 2  # Drop the queued message which arrived first
+    REJECT = 3  # Reply to the arriving message that the validator is busy
+
+
+# The maximum size, or None if unbounded, and QueueFullPolicy of the queue
+# of each priority. Messages are rejected, rather than dropped, so that no
+# sender waits on a reply which never comes.
+DEFAULT_QUEUE_POLICIES = {
+    MessagePriority.HIGH: (None, QueueFullPolicy.REJECT),
+    MessagePriority.NORMAL: (10000, QueueFullPolicy.REJECT),
+    MessagePriority.LOW: (1000, QueueFullPolicy.REJECT),
+}
+
+
+MessageQueueMetrics = namedtuple(
+    'MessageQueueMetrics',
+    ['dispatcher', 'message_type', 'priority', 'queue_depth', 'dispatched',
+     'dropped', 'rejected', 'average_wait_time'])
+
+
 def _gen_message_id():
     return uuid.uuid4().hex.encode()
 
 
+class MessageContent(bytes):
+    """The content of a dispatched message, passed to each handler of the
+    message in place of the content bytes. The protobufs decoded from it
+    are cached, so that the handlers of a message share a single decoding
+    of it. The decoded protobufs are shared, and must not be modified,
+    except by the last handler to use them.
+    """
+    def __new__(cls, content):
+        message_content = super().__new__(cls, content)
+        message_content._decoded = {}
+        message_content._decoded_lock = Lock()
+        return message_content
+
+    def __reduce__(self):
+        # handlers run in a process pool receive the content without its
+        # cache, which cannot be shared between processes
+        return (MessageContent, (bytes(self),))
+
+    def decode_as(self, proto_class):
+        """Returns the content decoded as a proto_class.
+
+        Raises:
+            DecodeError: the content is not a proto_class.
+        """
+        return self._get_decoded(
+            proto_class, partial(_decode, proto_class, self))
+
+    def decode_embedded(self, proto_class, embedded_class):
+        """Returns the content field, of the content decoded as a
+        proto_class, decoded as an embedded_class.
+
+        Raises:
+            DecodeError: the content is not a proto_class, or its content
+                field is not an embedded_class.
+        """
+        return self._get_decoded(
+            (proto_class, embedded_class),
+            lambda: _decode(
+                embedded_class, self.decode_as(proto_class).content))
+
+    def _get_decoded(self, key, decode):
+        with self._decoded_lock:
+            if key in self._decoded:
+                return self._decoded[key]
+        decoded = decode()
+        with self._decoded_lock:
+            return self._decoded.setdefault(key, decoded)
+
+
+def _decode(proto_class, content):
+    message = proto_class()
+    message.ParseFromString(content)
+    return message
+
+
+def decode_message(message_content, proto_class):
+    """Returns message content decoded as a proto_class. If the content is a
+    MessageContent, its cached decoding is returned, which must not be
+    modified.
+
+    Args:
+        message_content (bytes): the content passed to a Handler
+        proto_class (class): the protobuf class of the content
+
+    Raises:
+        DecodeError: the content is not a proto_class.
+    """
+    if isinstance(message_content, MessageContent):
+        return message_content.decode_as(proto_class)
+    return _decode(proto_class, message_content)
+
+
+def decode_embedded_message(message_content, proto_class, embedded_class):
+    """Returns the content field of message content decoded as a
+    proto_class, decoded as an embedded_class, for messages such as
+    GossipMessage which embed another message. If the content is a
+    MessageContent, its cached decoding is returned, which must not be
+    modified.
+
+    Raises:
+        DecodeError: the content is not a proto_class, or its content field
+            is not an embedded_class.
+    """
+    if isinstance(message_content, MessageContent):
+        return message_content.decode_embedded(proto_class, embedded_class)
+    return _decode(embedded_class,
+                   _decode(proto_class, message_content).content)
+
+
 class Dispatcher(Thread):
-    def __init__(self):
+    """Dispatches messages to the chain of handlers of their message types.
+
+    Messages wait to be dispatched in a queue for each MessagePriority,
+    taken highest priority first, in order of arrival. If max_in_flight is
+    set, messages are taken from the queues only while fewer handlers than
+    it are running, so that messages wait in the queues rather than in the
+    executors, and higher priority messages are handled first when the
+    validator is busy. The queues may be bounded; when a message arrives to
+    a full queue, it is handled according to the QueueFullPolicy of the
+    queue, if a handler of the message defines a busy_result, or else
+    queued regardless.
+    """
+    def __init__(self, name='', max_in_flight=None, queue_policies=None):
+        """
+        Args:
+            name (str): the name of the dispatcher, as reported in its
+                metrics
+            max_in_flight (int): the number of handlers which may be running
+                at once, for messages taken from the queues; unbounded if
+                None
+            queue_policies (dict): the maximum size, or None if
+                unbounded, and QueueFullPolicy of the queue of each
+                MessagePriority, as a tuple; defaults to
+                DEFAULT_QUEUE_POLICIES
+        """
         super().__init__()
+        self._name = name
         self._msg_type_handlers = ThreadsafeDict()
-        self._in_queue = queue.Queue()
         self._send_message = ThreadsafeDict()
         self._message_information = ThreadsafeDict()
         self._condition = Condition()
 
+        self._max_in_flight = max_in_flight
+        self._queue_policies = dict(DEFAULT_QUEUE_POLICIES)
+        if queue_policies is not None:
+            self._queue_policies.update(queue_policies)
+        self._priorities = {}
+        # priority: deque of (message_id, message_type, enqueued_at)
+        self._queues = {priority: deque() for priority in MessagePriority}
+        self._queue_condition = Condition()
+        self._in_flight = 0
+        self._stopped = False
+        # (message_type, priority): _MessageTypeMetrics
+        self._metrics = {}
+
+    def set_priority(self, message_type, priority):
+        """Sets the priority with which messages of a type are dispatched,
+        which is MessagePriority.NORMAL if not set.
+
+        Args:
+            message_type (int): validator_pb2.Message.* enum value
+            priority (MessagePriority or function): the priority, or a
+                function returning the priority of a message, given its
+                MessageContent
+        """
+        self._priorities[message_type] = priority
+
     def add_send_message(self, connection, send_message):
         """Adds a send_message function to the Dispatcher's
         dictionary of functions indexed by connection.
@@ -78,20 +251,179 @@ class Dispatcher(Thread):
     def dispatch(self, connection, message, connection_id):
         if message.message_type in self._msg_type_handlers:
             message_id = _gen_message_id()
+            content = MessageContent(message.content)
             self._message_information[message_id] = (
                 connection,
                 connection_id,
                 message,
+                content,
                 _ManagerCollection(
                     self._msg_type_handlers[message.message_type])
             )
-            self._in_queue.put_nowait(message_id)
+            self._enqueue(message_id, message.message_type,
+                          self._get_priority(message.message_type, content))
         else:
             LOGGER.info("received a message of type %s "
                         "from %s but have no handler for that type",
                         get_enum_name(message.message_type),
                         connection_id)
 
+    def _get_priority(self, message_type, content):
+        priority = self._priorities.get(message_type, MessagePriority.NORMAL)
+        if callable(priority):
+            try:
+                return priority(content)
+            # pylint: disable=broad-except
+            except Exception:
+                LOGGER.exception("Unable to prioritize message of type %s",
+                                 get_enum_name(message_type))
+                return MessagePriority.NORMAL
+        return priority
+
+    def _enqueue(self, message_id, message_type, priority):
+        max_size, policy = self._queue_policies[priority]
+        dropped_id = None
+        rejected_id = None
+        with self._queue_condition:
+            queue = self._queues[priority]
+            if max_size is not None and len(queue) >= max_size and \
+                    self._is_sheddable(message_type):
+                if policy == QueueFullPolicy.REJECT:
+                    self._get_metrics(message_type, priority).rejected += 1
+                    rejected_id = message_id
+                else:
+                    if policy == QueueFullPolicy.DROP_OLDEST:
+                        dropped_id = self._remove_oldest_sheddable(
+                            queue, priority)
+                    if dropped_id is None:
+                        self._get_metrics(
+                            message_type, priority).dropped += 1
+                        dropped_id = message_id
+
+            if message_id not in (dropped_id, rejected_id):
+                queue.append((message_id, message_type, time.time()))
+                self._get_metrics(message_type, priority).queue_depth += 1
+                self._queue_condition.notify()
+
+        if dropped_id is not None:
+            self._drop(dropped_id)
+        if rejected_id is not None:
+            self._reject(rejected_id)
+
+    def _is_sheddable(self, message_type):
+        """Returns whether messages of a type may be dropped or rejected,
+        which is only if a handler of the type defines a busy_result.
+        """
+        return any(
+            type(handler_manager.handler).busy_result is not
+            Handler.busy_result
+            for handler_manager in self._msg_type_handlers[message_type])
+
+    def _remove_oldest_sheddable(self, queue, priority):
+        """Removes the oldest message from a queue which may be shed, and
+        returns its id, or None if no queued message may be shed. Called
+        holding the queue condition.
+        """
+        for index, (message_id, message_type, _) in enumerate(queue):
+            if self._is_sheddable(message_type):
+                del queue[index]
+                metrics = self._get_metrics(message_type, priority)
+                metrics.queue_depth -= 1
+                metrics.dropped += 1
+                return message_id
+        return None
+
+    def _dequeue(self):
+        """Returns the id of the next message to dispatch, once a handler
+        may be run for it, or None if the dispatcher is stopped.
+        """
+        with self._queue_condition:
+            while True:
+                if self._stopped:
+                    return None
+                if self._max_in_flight is None \
+                        or self._in_flight < self._max_in_flight:
+                    for priority in MessagePriority:
+                        queue = self._queues[priority]
+                        if queue:
+                            message_id, message_type, enqueued_at = \
+                                queue.popleft()
+                            metrics = self._get_metrics(
+                                message_type, priority)
+                            metrics.queue_depth -= 1
+                            metrics.dispatched += 1
+                            metrics.total_wait_time += \
+                                time.time() - enqueued_at
+                            return message_id
+                self._queue_condition.wait()
+
+    def _get_metrics(self, message_type, priority):
+        # called holding the queue condition
+        try:
+            return self._metrics[(message_type, priority)]
+        except KeyError:
+            metrics = _MessageTypeMetrics()
+            self._metrics[(message_type, priority)] = metrics
+            return metrics
+
+    def _drop(self, message_id):
+        _, connection_id, message, _, _ = \
+            self._message_information[message_id]
+        LOGGER.debug("Dropped message of type %s from %s, as the "
+                     "dispatcher's queue is full",
+                     get_enum_name(message.message_type), connection_id)
+        self._finish(message_id)
+
+    def _reject(self, message_id):
+        """Replies to a message that the validator is too busy to handle
+        it, with the busy result of the first of its handlers which has
+        one, or drops it if none do.
+        """
+        connection, connection_id, original_message, content, _ = \
+            self._message_information[message_id]
+        handler_managers = \
+            self._msg_type_handlers[original_message.message_type]
+        for handler_manager in handler_managers:
+            result = handler_manager.handler.busy_result(
+                connection_id, content)
+            if result is not None:
+                break
+        else:
+            self._drop(message_id)
+            return
+
+        self._finish(message_id)
+        self._send(connection, connection_id, validator_pb2.Message(
+            content=result.message_out.SerializeToString(),
+            correlation_id=original_message.correlation_id,
+            message_type=result.message_type))
+
+    def get_metrics(self):
+        """Returns the current metrics of the dispatcher's queues.
+
+        Returns:
+            list of MessageQueueMetrics: for each message type and
+                priority of the messages received, the number of messages
+                waiting in the queue, dispatched to handlers, dropped and
+                rejected, and the average time in seconds messages waited
+                in the queue
+        """
+        with self._queue_condition:
+            return [
+                MessageQueueMetrics(
+                    dispatcher=self._name,
+                    message_type=get_enum_name(message_type),
+                    priority=priority.name,
+                    queue_depth=metrics.queue_depth,
+                    dispatched=metrics.dispatched,
+                    dropped=metrics.dropped,
+                    rejected=metrics.rejected,
+                    average_wait_time=(
+                        metrics.total_wait_time / metrics.dispatched
+                        if metrics.dispatched > 0 else 0.0))
+                for (message_type, priority), metrics
+                in sorted(self._metrics.items())]
+
     def add_handler(self, message_type, handler, executor):
         if not isinstance(handler, Handler):
             raise TypeError("%s is not a Handler subclass" % handler)
@@ -104,71 +436,88 @@ class Dispatcher(Thread):
 
     def _process(self, message_id):
         _, connection_id, \
-            message, collection = self._message_information[message_id]
+            _, content, collection = self._message_information[message_id]
         try:
             handler_manager = next(collection)
-            future = handler_manager.execute(connection_id, message.content)
-            future.add_done_callback(partial(self._determine_next, message_id))
         except IndexError:
             # IndexError is raised if done with handlers
-            del self._message_information[message_id]
+            self._finish(message_id)
+            return
+
+        with self._queue_condition:
+            self._in_flight += 1
+        future = handler_manager.execute(connection_id, content)
+        future.add_done_callback(partial(self._handler_done, message_id))
+
+    def _handler_done(self, message_id, future):
+        with self._queue_condition:
+            self._in_flight -= 1
+            self._queue_condition.notify()
+        self._determine_next(message_id, future)
+
+    def _finish(self, message_id):
+        del self._message_information[message_id]
+        with self._condition:
+            if len(self._message_information) == 0:
+                self._condition.notify()
+
+    def _send(self, connection, connection_id, message):
+        try:
+            self._send_message[connection](msg=message,
+                                           connection_id=connection_id)
+        except KeyError:
+            LOGGER.info("Can't send message %s back to "
+                        "%s because connection %s not in dispatcher",
+                        get_enum_name(message.message_type), connection_id,
+                        connection)
 
     def _determine_next(self, message_id, future):
+        if isinstance(future.result(), Future):
+            # the handler will complete later, without holding a thread
+            future.result().add_done_callback(
+                partial(self._determine_next, message_id))
+            return
+
         if future.result().status == HandlerStatus.DROP:
-            del self._message_information[message_id]
+            self._finish(message_id)
 
         elif future.result().status == HandlerStatus.PASS:
             self._process(message_id)
 
         elif future.result().status == HandlerStatus.RETURN_AND_PASS:
-            connection, connection_id, \
-                original_message, _ = self._message_information[message_id]
+            connection, connection_id, original_message, _, _ = \
+                self._message_information[message_id]
 
             message = validator_pb2.Message(
                 content=future.result().message_out.SerializeToString(),
                 correlation_id=original_message.correlation_id,
                 message_type=future.result().message_type)
-            try:
-                self._send_message[connection](msg=message,
-                                               connection_id=connection_id)
-            except KeyError:
-                LOGGER.info("Can't send message %s back to "
-                            "%s because connection %s not in dispatcher",
-                            get_enum_name(message.message_type), connection_id,
-                            connection)
+            self._send(connection, connection_id, message)
             self._process(message_id)
 
         elif future.result().status == HandlerStatus.RETURN:
-            connection, connection_id,  \
-                original_message, _ = self._message_information[message_id]
+            connection, connection_id, original_message, _, _ = \
+                self._message_information[message_id]
 
-            del self._message_information[message_id]
+            self._finish(message_id)
 
             message = validator_pb2.Message(
                 content=future.result().message_out.SerializeToString(),
                 correlation_id=original_message.correlation_id,
                 message_type=future.result().message_type)
-            try:
-                self._send_message[connection](msg=message,
-                                               connection_id=connection_id)
-            except KeyError:
-                LOGGER.info("Can't send message %s back to "
-                            "%s because connection %s not in dispatcher",
-                            get_enum_name(message.message_type), connection_id,
-                            connection)
-        with self._condition:
-            if len(self._message_information) == 0:
-                self._condition.notify()
+            self._send(connection, connection_id, message)
 
     def run(self):
         while True:
-            msg_id = self._in_queue.get()
-            if msg_id == -1:
+            msg_id = self._dequeue()
+            if msg_id is None:
                 break
             self._process(msg_id)
 
     def stop(self):
-        self._in_queue.put_nowait(-1)
+        with self._queue_condition:
+            self._stopped = True
+            self._queue_condition.notify()
 
     def block_until_complete(self):
         """Blocks until no more messages are in flight,
@@ -179,6 +528,31 @@ class Dispatcher(Thread):
                 self._condition.wait()
 
 
+class _MessageTypeMetrics(object):
+    def __init__(self):
+        self.queue_depth = 0
+        self.dispatched = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.total_wait_time = 0.0
+
+
+def log_message_queue_metrics(metrics_list):
+    """Logs the metrics of dispatchers' queues at debug level.
+
+    Args:
+        metrics_list (list of MessageQueueMetrics): the metrics of each
+            message type
+    """
+    for metrics in metrics_list:
+        LOGGER.debug(
+            "dispatcher %s %s (%s): %s queued, %s dispatched, %s dropped, "
+            "%s rejected, %.3fs average wait",
+            metrics.dispatcher, metrics.message_type, metrics.priority,
+            metrics.queue_depth, metrics.dispatched, metrics.dropped,
+            metrics.rejected, metrics.average_wait_time)
+
+
 class _HandlerManager(object):
     def __init__(self, executor, handler):
         """
@@ -189,6 +563,10 @@ class _HandlerManager(object):
         self._handler = handler
         self._lock = Lock()
 
+    @property
+    def handler(self):
+        return self._handler
+
     def execute(self, connection_id, message):
         with self._lock:
             return self._executor.submit(
@@ -239,9 +617,29 @@ class Handler(object, metaclass=abc.ABCMeta):
         :param connection_id: A unique identifier for the connection that
                               sent the message
         :param message_content: The bytes to be deserialized
-                                into a protobuf python class
+                                into a protobuf python class, which may
+                                be a MessageContent shared with the other
+                                handlers of the message; decode it with
+                                decode_message to share its decoding
         :return HandlerResult: The status of the handling
                                 and optionally the message
-                                and message_type to send out
+                                and message_type to send out, or a
+                                concurrent.futures.Future of the
+                                HandlerResult, for handlers that wait
+                                on an event without holding a thread
         """
         raise NotImplementedError()
+
+    def busy_result(self, connection_id, message_content):
+        """
+        Returns the result to send back in reply to a message the
+        dispatcher rejects, because it is too busy to handle it.
+
+        :param connection_id: A unique identifier for the connection that
+                              sent the message
+        :param message_content: The message content
+        :return HandlerResult: The message and message_type to send out, or
+                               None if the message is dropped without a
+                               reply
+        """
+        return None
@@ -22,6 +22,8 @@ import sawtooth_signing as signing
 
 from sawtooth_validator.config.path import load_path_config
 from sawtooth_validator.config.logs import get_log_config
+from sawtooth_validator.networking.dispatch import MessagePriority
+from sawtooth_validator.networking.dispatch import QueueFullPolicy
 from sawtooth_validator.server.core import Validator
 from sawtooth_validator.server.keys import load_identity_signing_key
 from sawtooth_validator.server.log import init_console_logging
@@ -33,6 +35,31 @@ from sawtooth_validator.exceptions import LocalConfigurationError
 LOGGER = logging.getLogger(__name__)
 
 
+def _positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(
+            "must be a positive integer: {}".format(value))
+    return number
+
+
+def _queue_policy(value):
+    """Parses a dispatch queue policy of the form priority:size:policy,
+    such as low:1000:reject, where the size may be unbounded.
+    """
+    try:
+        priority, size, policy = value.split(':')
+        return (MessagePriority[priority.upper()],
+                (None if size == 'unbounded' else _positive_int(size),
+                 QueueFullPolicy[policy.upper()]))
+    except (ValueError, KeyError):
+        raise argparse.ArgumentTypeError(
+            "must be priority:size:policy, with a priority of high, normal "
+            "or low, a size which is a positive integer or unbounded, and "
+            "a policy of drop_newest, drop_oldest or reject: "
+            "{}".format(value))
+
+
 def parse_args(args):
     parser = argparse.ArgumentParser(
         formatter_class=argparse.RawTextHelpFormatter)
@@ -83,6 +110,112 @@ def parse_args(args):
                              'parameters',
                         action='append',
                         type=str)
+    parser.add_argument('--component-thread-pool-workers',
+                        help='The number of threads handling messages from '
+                             'transaction processors and clients',
+                        default=10,
+                        type=_positive_int)
+    parser.add_argument('--network-thread-pool-workers',
+                        help='The number of threads handling messages from '
+                             'peers',
+                        default=10,
+                        type=_positive_int)
+    parser.add_argument('--signature-process-pool-workers',
+                        help='The number of processes verifying signatures',
+                        default=3,
+                        type=_positive_int)
+    parser.add_argument('--executor-waiting-workers',
+                        help='The number of threads waiting for transaction '
+                             'processors to register',
+                        default=3,
+                        type=_positive_int)
+    parser.add_argument('--executor-workers',
+                        help='The number of threads executing blocks and '
+                             'batches',
+                        default=5,
+                        type=_positive_int)
+    parser.add_argument('--max-executor-workers',
+                        help='If given, the number of threads the executor '
+                             'may grow to while executions are waiting for a '
+                             'thread and transaction processors have idle '
+                             'capacity',
+                        type=_positive_int)
+    parser.add_argument('--processor-routing',
+                        help='How transactions are routed among the '
+                             'transaction processors of a type. Choices are '
+                             '\'round_robin\', which sends to each in turn, '
+                             'and \'least_loaded\', which sends to the '
+                             'processor expected to answer soonest, given '
+                             'its requests in flight and recent latency',
+                        choices=['round_robin', 'least_loaded'],
+                        default='round_robin',
+                        type=str)
+    parser.add_argument('--dispatch-queue-policy',
+                        help='The maximum number of messages of a priority '
+                             'waiting to be handled, and what is done with '
+                             'messages arriving when it is reached, as '
+                             'priority:size:policy, where the size may be '
+                             '\'unbounded\'. Priorities are \'high\', '
+                             'for blocks and transaction processor requests, '
+                             '\'normal\' and \'low\', for client requests. '
+                             'Policies are \'drop_newest\', \'drop_oldest\' '
+                             'and \'reject\', which replies to clients that '
+                             'the validator is busy; dropped clients get no '
+                             'reply. Only messages with a busy reply, such '
+                             'as client requests, are dropped or rejected; '
+                             'others are queued regardless. Defaults to '
+                             'high:unbounded:reject, normal:10000:reject '
+                             'and low:1000:reject',
+                        action='append',
+                        type=_queue_policy)
+    parser.add_argument('--max-pending-batches',
+                        help='The most batches which may be waiting to be '
+                             'published before batches submitted by '
+                             'clients are rejected as the queue is full. '
+                             'Fewer are admitted while blocks are published '
+                             'with few batches, to keep the backlog within '
+                             'a few blocks',
+                        default=10000,
+                        type=_positive_int)
+    parser.add_argument('--database-durability',
+                        help='When writes to the state and block databases '
+                             'are flushed to disk. Choices are \'sync\', '
+                             'after every write, \'group_commit\', which '
+                             'flushes the writes of an interval together, '
+                             'and \'os\', which leaves flushing to the '
+                             'operating system. Writes not yet flushed may '
+                             'be lost if the host fails',
+                        choices=['sync', 'group_commit', 'os'],
+                        default='sync',
+                        type=str)
+    parser.add_argument('--database-group-commit-interval',
+                        help='The most milliseconds a write remains '
+                             'unflushed when --database-durability is '
+                             '\'group_commit\'',
+                        default=50,
+                        type=_positive_int)
+    parser.add_argument('--state-pruning-keep-blocks',
+                        help='The number of committed blocks, back from the '
+                             'chain head, whose state is retained when old '
+                             'state is pruned',
+                        default=1000,
+                        type=_positive_int)
+    parser.add_argument('--state-pruning-interval',
+                        help='The number of seconds between collections of '
+                             'old state',
+                        default=600,
+                        type=_positive_int)
+    parser.add_argument('--state-pruning-step-budget',
+                        help='The most milliseconds spent pruning state at '
+                             'a time, so that block validation is not '
+                             'stalled',
+                        default=50,
+                        type=_positive_int)
+    parser.add_argument('--state-pruning-step-interval',
+                        help='The number of milliseconds between steps of '
+                             'state pruning',
+                        default=1000,
+                        type=_positive_int)
     parser.add_argument('-v', '--verbose',
                         action='count',
                         default=0,
@@ -200,14 +333,44 @@ def main(args=sys.argv[1:]):
                      "ERROR messages), shutting down.")
         sys.exit(1)
 
-    validator = Validator(opts.network_endpoint,
-                          opts.component_endpoint,
-                          opts.public_uri,
-                          opts.peering,
-                          opts.join,
-                          opts.peers,
-                          path_config.data_dir,
-                          identity_signing_key)
+    try:
+        validator = Validator(opts.network_endpoint,
+                              opts.component_endpoint,
+                              opts.public_uri,
+                              opts.peering,
+                              opts.join,
+                              opts.peers,
+                              path_config.data_dir,
+                              identity_signing_key,
+                              component_thread_pool_workers=(
+                                  opts.component_thread_pool_workers),
+                              network_thread_pool_workers=(
+                                  opts.network_thread_pool_workers),
+                              signature_process_pool_workers=(
+                                  opts.signature_process_pool_workers),
+                              executor_waiting_workers=(
+                                  opts.executor_waiting_workers),
+                              executor_workers=opts.executor_workers,
+                              max_executor_workers=opts.max_executor_workers,
+                              processor_routing=opts.processor_routing,
+                              dispatch_queue_policies=dict(
+                                  opts.dispatch_queue_policy or []),
+                              max_pending_batches=opts.max_pending_batches,
+                              database_durability=opts.database_durability,
+                              database_group_commit_interval=(
+                                  opts.database_group_commit_interval /
+                                  1000),
+                              state_pruning_keep_blocks=(
+                                  opts.state_pruning_keep_blocks),
+                              state_pruning_interval=(
+                                  opts.state_pruning_interval),
+                              state_pruning_step_budget=(
+                                  opts.state_pruning_step_budget / 1000),
+                              state_pruning_step_interval=(
+                                  opts.state_pruning_step_interval / 1000))
+    except LocalConfigurationError as local_config_err:
+        LOGGER.error(str(local_config_err))
+        sys.exit(1)
 
     # pylint: disable=broad-except
     try:
@@ -13,7 +13,6 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
-from concurrent.futures import ThreadPoolExecutor
 from concurrent.futures import ProcessPoolExecutor
 import hashlib
 import logging
@@ -22,14 +21,25 @@ import signal
 import time
 import threading
 
+from sawtooth_validator.concurrent.threadpool import \
+    InstrumentedThreadPoolExecutor
+from sawtooth_validator.concurrent.threadpool import log_thread_pool_metrics
 from sawtooth_validator.execution.context_manager import ContextManager
 from sawtooth_validator.database.lmdb_nolock_database import LMDBNoLockDatabase
+from sawtooth_validator.database.lmdb_nolock_database import DURABILITY_SYNC
+from sawtooth_validator.database.migrate import check_database_format
 from sawtooth_validator.journal.genesis import GenesisController
+from sawtooth_validator.journal.journal import BatchSubmitAdmissionHandler
+from sawtooth_validator.journal.journal import DEFAULT_MAX_PENDING_BATCHES
 from sawtooth_validator.journal.journal import Journal
+from sawtooth_validator.journal.journal import log_pending_batch_metrics
 from sawtooth_validator.protobuf import validator_pb2
 from sawtooth_validator.execution import tp_state_handlers
 from sawtooth_validator.journal.batch_sender import BroadcastBatchSender
 from sawtooth_validator.journal.block_sender import BroadcastBlockSender
+from sawtooth_validator.journal.block_cache import BlockCache
+from sawtooth_validator.journal.block_cache import \
+    DEFAULT_BLOCK_CACHE_BYTES
 from sawtooth_validator.journal.block_store import BlockStore
 from sawtooth_validator.journal.completer import CompleterGossipHandler
 from sawtooth_validator.journal.completer import \
@@ -47,12 +57,17 @@ from sawtooth_validator.journal.responder import ResponderBatchResponseHandler
 from sawtooth_validator.journal.responder import \
     BatchByTransactionIdResponderHandler
 from sawtooth_validator.networking.dispatch import Dispatcher
+from sawtooth_validator.networking.dispatch import MessagePriority
+from sawtooth_validator.networking.dispatch import log_message_queue_metrics
 from sawtooth_validator.journal.chain_id_manager import ChainIdManager
 from sawtooth_validator.execution.executor import TransactionExecutor
 from sawtooth_validator.execution import processor_handlers
 from sawtooth_validator.state import client_handlers
 from sawtooth_validator.state.config_view import ConfigViewFactory
 from sawtooth_validator.state.state_delta_store import StateDeltaStore
+from sawtooth_validator.state.state_pruner import DEFAULT_KEEP_BLOCKS
+from sawtooth_validator.state.state_pruner import StatePruner
+from sawtooth_validator.state.state_pruner import StatePrunerThread
 from sawtooth_validator.state.state_view import StateViewFactory
 from sawtooth_validator.gossip import signature_verifier
 from sawtooth_validator.networking.interconnect import Interconnect
@@ -67,6 +82,7 @@ from sawtooth_validator.gossip.gossip_handlers import PeerRegisterHandler
 from sawtooth_validator.gossip.gossip_handlers import PeerUnregisterHandler
 from sawtooth_validator.gossip.gossip_handlers import GetPeersRequestHandler
 from sawtooth_validator.gossip.gossip_handlers import GetPeersResponseHandler
+from sawtooth_validator.gossip.gossip_handlers import gossip_message_priority
 from sawtooth_validator.networking.handlers import PingHandler
 from sawtooth_validator.networking.handlers import ConnectHandler
 from sawtooth_validator.networking.handlers import DisconnectHandler
@@ -78,7 +94,22 @@ LOGGER = logging.getLogger(__name__)
 class Validator(object):
     def __init__(self, network_endpoint, component_endpoint, public_uri,
                  peering, join_list, peer_list, data_dir,
-                 identity_signing_key):
+                 identity_signing_key,
+                 component_thread_pool_workers=10,
+                 network_thread_pool_workers=10,
+                 signature_process_pool_workers=3,
+                 executor_waiting_workers=3,
+                 executor_workers=5,
+                 max_executor_workers=None,
+                 processor_routing='round_robin',
+                 dispatch_queue_policies=None,
+                 max_pending_batches=DEFAULT_MAX_PENDING_BATCHES,
+                 database_durability=DURABILITY_SYNC,
+                 database_group_commit_interval=0.05,
+                 state_pruning_keep_blocks=DEFAULT_KEEP_BLOCKS,
+                 state_pruning_interval=600,
+                 state_pruning_step_budget=0.05,
+                 state_pruning_step_interval=1):
         """Constructs a validator instance.
 
         Args:
@@ -101,19 +132,65 @@ class Validator(object):
             peer_list (list of str): a list of peer addresses
             data_dir (str): path to the data directory
             key_dir (str): path to the key directory
+            component_thread_pool_workers (int): the number of threads
+                handling messages from components
+            network_thread_pool_workers (int): the number of threads
+                handling messages from the network
+            signature_process_pool_workers (int): the number of processes
+                verifying signatures
+            executor_waiting_workers (int): the number of threads waiting
+                for transaction processors to register
+            executor_workers (int): the number of threads executing
+                schedulers
+            max_executor_workers (int): the number of threads the executor
+                may grow to while transaction processors have idle capacity;
+                the executor does not grow if None
+            processor_routing (str): how transactions are routed among
+                transaction processors of a type, either 'round_robin' or
+                'least_loaded'
+            dispatch_queue_policies (dict): the maximum size and
+                QueueFullPolicy of the queues of messages of each
+                MessagePriority waiting to be handled, as a tuple, in place
+                of the defaults
+            max_pending_batches (int): the most batches which may be pending
+                before batches submitted by clients are rejected; fewer are
+                admitted while blocks are published with few batches
+            database_durability (str): when writes to the merkle, state
+                delta and block databases are flushed to disk; one of
+                'sync', after every write, 'group_commit', at most every
+                database_group_commit_interval, or 'os', when the operating
+                system chooses
+            database_group_commit_interval (float): the maximum time in
+                seconds that a write remains unflushed under group commit
+            state_pruning_keep_blocks (int): the number of committed blocks,
+                back from the chain head, whose state is retained
+            state_pruning_interval (float): the delay in seconds between
+                state pruning collections
+            state_pruning_step_budget (float): the time in seconds spent
+                per step of state pruning
+            state_pruning_step_interval (float): the delay in seconds
+                between steps of state pruning
         """
         db_filename = os.path.join(data_dir,
                                    'merkle-{}.lmdb'.format(
                                        network_endpoint[-2:]))
         LOGGER.debug('database file is %s', db_filename)
 
-        merkle_db = LMDBNoLockDatabase(db_filename, 'c')
+        merkle_db = LMDBNoLockDatabase(
+            db_filename, 'c',
+            durability=database_durability,
+            group_commit_interval=database_group_commit_interval)
+        check_database_format(merkle_db, db_filename)
 
         delta_db_filename = os.path.join(data_dir,
                                          'state-deltas-{}.lmdb'.format(
                                              network_endpoint[-2:]))
         LOGGER.debug('state delta store file is %s', delta_db_filename)
-        state_delta_db = LMDBNoLockDatabase(delta_db_filename, 'c')
+        state_delta_db = LMDBNoLockDatabase(
+            delta_db_filename, 'c',
+            durability=database_durability,
+            group_commit_interval=database_group_commit_interval)
+        check_database_format(state_delta_db, delta_db_filename)
 
         state_delta_store = StateDeltaStore(state_delta_db)
 
@@ -126,18 +203,44 @@ class Validator(object):
                                          network_endpoint[-2:]))
         LOGGER.debug('block store file is %s', block_db_filename)
 
-        block_db = LMDBNoLockDatabase(block_db_filename, 'c')
+        block_db = LMDBNoLockDatabase(
+            block_db_filename, 'c',
+            durability=database_durability,
+            group_commit_interval=database_group_commit_interval)
+        check_database_format(block_db, block_db_filename)
         block_store = BlockStore(block_db)
+        block_cache = BlockCache(block_store, keep_time=300,
+                                 max_bytes=DEFAULT_BLOCK_CACHE_BYTES)
 
-        # setup network
-        self._dispatcher = Dispatcher()
+        self._state_pruner_thread = StatePrunerThread(
+            StatePruner(merkle_db, block_store, block_cache,
+                        keep_blocks=state_pruning_keep_blocks),
+            time_budget=state_pruning_step_budget,
+            step_frequency=state_pruning_step_interval,
+            cycle_interval=state_pruning_interval)
 
-        thread_pool = ThreadPoolExecutor(max_workers=10)
-        process_pool = ProcessPoolExecutor(max_workers=3)
+        # setup network
+        # twice as many handlers as workers are run at once, so that the
+        # workers are kept busy while the messages beyond them wait in the
+        # dispatcher, by priority
+        self._dispatcher = Dispatcher(
+            name='Component',
+            max_in_flight=2 * component_thread_pool_workers,
+            queue_policies=dispatch_queue_policies)
+
+        thread_pool = InstrumentedThreadPoolExecutor(
+            max_workers=component_thread_pool_workers,
+            name='Component')
+        process_pool = ProcessPoolExecutor(
+            max_workers=signature_process_pool_workers)
 
         self._thread_pool = thread_pool
         self._process_pool = process_pool
 
+        # verifies signatures in the process pool, remembering those
+        # verified for every signature verifying handler
+        verifier = signature_verifier.SignatureVerifier(process_pool)
+
         self._service = Interconnect(component_endpoint,
                                      self._dispatcher,
                                      secured=False,
@@ -147,16 +250,28 @@ class Validator(object):
         executor = TransactionExecutor(service=self._service,
                                        context_manager=context_manager,
                                        config_view_factory=ConfigViewFactory(
-                                           StateViewFactory(merkle_db)))
+                                           StateViewFactory(merkle_db)),
+                                       waiting_threadpool_workers=(
+                                           executor_waiting_workers),
+                                       executing_threadpool_workers=(
+                                           executor_workers),
+                                       max_executing_workers=(
+                                           max_executor_workers),
+                                       processor_routing=processor_routing)
         self._executor = executor
 
         zmq_identity = hashlib.sha512(
             time.time().hex().encode()).hexdigest()[:23]
 
-        network_thread_pool = ThreadPoolExecutor(max_workers=10)
+        network_thread_pool = InstrumentedThreadPoolExecutor(
+            max_workers=network_thread_pool_workers,
+            name='Network')
         self._network_thread_pool = network_thread_pool
 
-        self._network_dispatcher = Dispatcher()
+        self._network_dispatcher = Dispatcher(
+            name='Network',
+            max_in_flight=2 * network_thread_pool_workers,
+            queue_policies=dispatch_queue_policies)
 
         # Server public and private keys are hardcoded here due to
         # the decision to avoid having separate identities for each
@@ -205,7 +320,9 @@ class Validator(object):
             data_dir=data_dir,
             check_publish_block_frequency=0.1,
             block_cache_purge_frequency=30,
-            block_cache_keep_time=300
+            block_cache_keep_time=300,
+            block_cache=block_cache,
+            max_pending_batches=max_pending_batches
         )
 
         self._genesis_controller = GenesisController(
@@ -291,8 +408,8 @@ class Validator(object):
         # GOSSIP_MESSAGE 2) Verifies signature
         self._network_dispatcher.add_handler(
             validator_pb2.Message.GOSSIP_MESSAGE,
-            signature_verifier.GossipMessageSignatureVerifier(),
-            process_pool)
+            signature_verifier.GossipMessageSignatureVerifier(verifier),
+            network_thread_pool)
 
         # GOSSIP_MESSAGE 3) Determines if we should broadcast the
         # message to our peers. It is important that this occur prior
@@ -328,8 +445,8 @@ class Validator(object):
         # GOSSIP_BLOCK_RESPONSE 2) Verifies signature
         self._network_dispatcher.add_handler(
             validator_pb2.Message.GOSSIP_BLOCK_RESPONSE,
-            signature_verifier.GossipBlockResponseSignatureVerifier(),
-            process_pool)
+            signature_verifier.GossipBlockResponseSignatureVerifier(verifier),
+            network_thread_pool)
 
         # GOSSIP_BLOCK_RESPONSE 3) Send message to completer
         self._network_dispatcher.add_handler(
@@ -362,8 +479,8 @@ class Validator(object):
         # GOSSIP_BATCH_RESPONSE 2) Verifies signature
         self._network_dispatcher.add_handler(
             validator_pb2.Message.GOSSIP_BATCH_RESPONSE,
-            signature_verifier.GossipBatchResponseSignatureVerifier(),
-            process_pool)
+            signature_verifier.GossipBatchResponseSignatureVerifier(verifier),
+            network_thread_pool)
 
         # GOSSIP_BATCH_RESPONSE 3) Send message to completer
         self._network_dispatcher.add_handler(
@@ -379,8 +496,13 @@ class Validator(object):
 
         self._dispatcher.add_handler(
             validator_pb2.Message.CLIENT_BATCH_SUBMIT_REQUEST,
-            signature_verifier.BatchListSignatureVerifier(),
-            process_pool)
+            BatchSubmitAdmissionHandler(self._journal),
+            thread_pool)
+
+        self._dispatcher.add_handler(
+            validator_pb2.Message.CLIENT_BATCH_SUBMIT_REQUEST,
+            signature_verifier.BatchListSignatureVerifier(verifier),
+            thread_pool)
 
         self._dispatcher.add_handler(
             validator_pb2.Message.CLIENT_BATCH_SUBMIT_REQUEST,
@@ -453,6 +575,42 @@ class Validator(object):
             client_handlers.StateCurrentRequest(
                 self._journal.get_current_root), thread_pool)
 
+        # the messages the chain depends on are handled first, and client
+        # requests last, when the validator is busy
+        for message_type in [
+                validator_pb2.Message.TP_STATE_GET_REQUEST,
+                validator_pb2.Message.TP_STATE_SET_REQUEST,
+                validator_pb2.Message.TP_REGISTER_REQUEST,
+                validator_pb2.Message.TP_UNREGISTER_REQUEST]:
+            self._dispatcher.set_priority(message_type, MessagePriority.HIGH)
+
+        for message_type in [
+                validator_pb2.Message.CLIENT_BATCH_SUBMIT_REQUEST,
+                validator_pb2.Message.CLIENT_BATCH_STATUS_REQUEST,
+                validator_pb2.Message.CLIENT_STATE_LIST_REQUEST,
+                validator_pb2.Message.CLIENT_STATE_GET_REQUEST,
+                validator_pb2.Message.CLIENT_BLOCK_LIST_REQUEST,
+                validator_pb2.Message.CLIENT_BLOCK_GET_REQUEST,
+                validator_pb2.Message.CLIENT_BATCH_LIST_REQUEST,
+                validator_pb2.Message.CLIENT_BATCH_GET_REQUEST,
+                validator_pb2.Message.CLIENT_TRANSACTION_LIST_REQUEST,
+                validator_pb2.Message.CLIENT_TRANSACTION_GET_REQUEST,
+                validator_pb2.Message.CLIENT_STATE_CURRENT_REQUEST]:
+            self._dispatcher.set_priority(message_type, MessagePriority.LOW)
+
+        for message_type in [
+                validator_pb2.Message.NETWORK_PING,
+                validator_pb2.Message.NETWORK_CONNECT,
+                validator_pb2.Message.NETWORK_DISCONNECT,
+                validator_pb2.Message.GOSSIP_REGISTER,
+                validator_pb2.Message.GOSSIP_UNREGISTER,
+                validator_pb2.Message.GOSSIP_BLOCK_REQUEST,
+                validator_pb2.Message.GOSSIP_BLOCK_RESPONSE]:
+            self._network_dispatcher.set_priority(
+                message_type, MessagePriority.HIGH)
+        self._network_dispatcher.set_priority(
+            validator_pb2.Message.GOSSIP_MESSAGE, gossip_message_priority)
+
     def start(self):
         self._dispatcher.start()
         self._service.start()
@@ -467,6 +625,7 @@ class Validator(object):
 
         self._gossip.start()
         self._journal.start()
+        self._state_pruner_thread.start()
 
         signal_event = threading.Event()
 
@@ -476,6 +635,15 @@ class Validator(object):
         # validator's life.
         while not signal_event.is_set():
             signal_event.wait(timeout=20)
+            log_thread_pool_metrics(
+                [self._thread_pool.get_metrics(),
+                 self._network_thread_pool.get_metrics()] +
+                self._executor.get_thread_pool_metrics())
+            log_message_queue_metrics(
+                self._dispatcher.get_metrics() +
+                self._network_dispatcher.get_metrics())
+            log_pending_batch_metrics(
+                self._journal.get_pending_batch_metrics())
 
     def stop(self):
         self._gossip.stop()
@@ -491,6 +659,8 @@ class Validator(object):
         self._context_manager.stop()
 
         self._journal.stop()
+        self._state_pruner_thread.stop()
+        self._journal.get_block_store().persist_stored_keys()
 
         threads = threading.enumerate()
 
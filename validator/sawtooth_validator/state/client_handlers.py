@@ -14,6 +14,7 @@
 # ------------------------------------------------------------------------------
 
 import abc
+from concurrent.futures import Future
 import logging
 # pylint: disable=import-error,no-name-in-module
 # needed for google.protobuf import
@@ -87,7 +88,8 @@ class _ClientRequestHandler(Handler, metaclass=abc.ABCMeta):
             message_content (bytes): Byte encoded request protobuf to be parsed
 
         Returns:
-            HandlerResult: result to be sent in response back to client
+            HandlerResult: result to be sent in response back to client, or
+                a Future of it, if the response waits on an event
         """
         try:
             request = self._request_proto()
@@ -101,8 +103,17 @@ class _ClientRequestHandler(Handler, metaclass=abc.ABCMeta):
         except _ResponseFailed as e:
             response = e.status
 
+        if isinstance(response, Future):
+            return response
+
         return self._wrap_result(response)
 
+    def busy_result(self, connection_id, message_content):
+        """Responds with a BUSY status to requests the validator is too busy
+        to handle.
+        """
+        return self._wrap_result(self._status.BUSY)
+
     @abc.abstractmethod
     def _respond(self, request):
         """This method must be implemented by each child to build its response.
@@ -112,10 +123,39 @@ class _ClientRequestHandler(Handler, metaclass=abc.ABCMeta):
 
         Returns:
             enum: An enum status, or...
-            dict: A dict of attributes for the response protobuf
+            dict: A dict of attributes for the response protobuf, or...
+            Future: A Future of the HandlerResult, from _respond_when_done
         """
         raise NotImplementedError('Client Handler must have _respond method')
 
+    def _respond_when_done(self, future, respond):
+        """Defers a response until a future is done, so that no thread is
+        held while waiting for it.
+
+        Args:
+            future (Future): The future to wait for
+            respond (function): Called with no arguments once future is done,
+                returning the response as _respond would
+
+        Returns:
+            Future: resolves to the HandlerResult to be sent back to client
+        """
+        result = Future()
+
+        def _on_done(_):
+            try:
+                try:
+                    response = respond()
+                except _ResponseFailed as e:
+                    response = e.status
+                result.set_result(self._wrap_result(response))
+            # pylint: disable=broad-except
+            except Exception as e:
+                result.set_exception(e)
+
+        future.add_done_callback(_on_done)
+        return result
+
     def _wrap_result(self, response):
         """Wraps child's response in a HandlerResult to be sent back to client.
 
@@ -341,6 +381,193 @@ class _Pager(object):
 
         return paged_resources, paging_response
 
+    @classmethod
+    def paginate_chain(cls, request, block_store, head, block_xform,
+                       block_fetcher, chain_count, on_fail_status):
+        """Fetches a page of the resources of the chain ending at a head
+        block, based on PagingControls, as paginate_resources would from
+        the resources listed newest to oldest. The page is found using the
+        block store's block number index, and only the blocks holding the
+        page are read.
+
+        Args:
+            request (object): The parsed protobuf request object
+            block_store (BlockStore): The block store
+            head (Block): The head block of the chain
+            block_xform (function): Transforms a block into a list of
+                resources
+            block_fetcher (function): Fetches the BlockWrapper holding a
+                resource by its id
+            chain_count (function): Returns the number of resources in the
+                chain up to and including the block with a given number
+
+        Returns:
+            list: The paginated list of resources
+            object: The PagingResponse to be sent back to the client
+            None: if the head is not on the indexed chain, in which case
+                the resources should be listed and paginated instead
+        """
+        header = BlockHeader()
+        header.ParseFromString(head.header)
+        head_num = header.block_num
+        try:
+            if block_store.get_block_by_number(head_num).header_signature \
+                    != head.header_signature:
+                return None
+            total = chain_count(head_num)
+        except KeyError:
+            return None
+
+        if total == 0:
+            return [], client_pb2.PagingResponse(total_resources=0)
+
+        paging = request.paging
+        count = min(paging.count, MAX_PAGE_SIZE) or MAX_PAGE_SIZE
+
+        def index_by_id(resource_id):
+            try:
+                blkw = block_fetcher(resource_id)
+                if blkw.block_num > head_num or \
+                        block_store.get_block_by_number(
+                            blkw.block_num).header_signature != \
+                        blkw.header_signature:
+                    raise AssertionError
+            except (KeyError, ValueError):
+                raise AssertionError
+            ids = [r.header_signature for r in block_xform(blkw.block)]
+            if resource_id not in ids:
+                raise AssertionError
+            return total - chain_count(blkw.block_num) + \
+                ids.index(resource_id)
+
+        def locate(index):
+            # the resources of block n have indexes from
+            # total - chain_count(n) to total - chain_count(n - 1) - 1
+            target = total - index
+            low, high = 0, head_num
+            while low < high:
+                mid = (low + high) // 2
+                if chain_count(mid) >= target:
+                    high = mid
+                else:
+                    low = mid + 1
+            return low, index - (total - chain_count(low))
+
+        # Find the start index from the location marker sent
+        try:
+            if paging.start_id:
+                start_index = index_by_id(paging.start_id)
+            elif paging.end_id:
+                end_index = index_by_id(paging.end_id)
+                start_index = end_index + 1 - count
+            else:
+                start_index = paging.start_index
+
+            if start_index < 0 or start_index >= total:
+                raise AssertionError
+        except AssertionError:
+            raise _ResponseFailed(on_fail_status)
+
+        # Collect the page, and the resource after it, walking back from
+        # the block holding the start of the page
+        block_num, offset = locate(start_index)
+        resources = []
+        while block_num >= 0 and len(resources) <= count:
+            block = block_store.get_block_by_number(block_num).block
+            resources += block_xform(block)[offset:]
+            block_num -= 1
+            offset = 0
+
+        previous_id = ''
+        if start_index > 0:
+            block_num, offset = locate(start_index - 1)
+            previous_id = block_xform(
+                block_store.get_block_by_number(block_num).block)[
+                    offset].header_signature
+
+        paging_response = client_pb2.PagingResponse(
+            next_id=cls.id_by_index(count, resources),
+            previous_id=previous_id,
+            start_index=start_index,
+            total_resources=total)
+
+        return resources[:count], paging_response
+
+    @staticmethod
+    def paginate_leaves(request, tree, prefix, on_fail_status):
+        """Fetches a page of the leaves under a prefix of a merkle tree,
+        based on PagingControls. Leaves are read in address order, starting
+        from the page, so only the leaves returned are fetched.
+
+        Args:
+            request (object): The parsed protobuf request object
+            tree (MerkleDatabase): The state tree, set to the requested root
+            prefix (str): The address prefix of the leaves to be paginated
+
+        Returns:
+            list: The paginated list of Leaf protobufs
+            object: The PagingResponse to be sent back to the client
+        """
+        total = tree.leaf_count(prefix)
+        if total == 0:
+            return [], client_pb2.PagingResponse(total_resources=0)
+
+        paging = request.paging
+        count = min(paging.count, MAX_PAGE_SIZE) or MAX_PAGE_SIZE
+
+        # Find the start index from the location marker sent
+        try:
+            if paging.start_id:
+                start_index = _Pager._leaf_index_by_id(
+                    paging.start_id, tree, prefix)
+            elif paging.end_id:
+                end_index = _Pager._leaf_index_by_id(
+                    paging.end_id, tree, prefix)
+                start_index = end_index + 1 - count
+            else:
+                start_index = paging.start_index
+
+            if start_index < 0 or start_index >= total:
+                raise AssertionError
+        except AssertionError:
+            raise _ResponseFailed(on_fail_status)
+
+        start = tree.leaf_address(prefix, start_index)
+        leaves = []
+        next_id = ''
+        for address, value in tree.iter_leaves(prefix, start=start):
+            if len(leaves) == count:
+                next_id = address
+                break
+            leaves.append(client_pb2.Leaf(address=address, data=value))
+
+        previous_id = ''
+        if start_index > 0:
+            previous_id = tree.leaf_address(prefix, start_index - 1)
+
+        paging_response = client_pb2.PagingResponse(
+            next_id=next_id,
+            previous_id=previous_id,
+            start_index=start_index,
+            total_resources=total)
+
+        return leaves, paging_response
+
+    @staticmethod
+    def _leaf_index_by_id(address, tree, prefix):
+        """Helper method to fetch the index of a leaf by its address
+
+        Raises:
+            AssertionError: Raised if the leaf is not found
+        """
+        index = tree.leaf_index(prefix, address)
+        try:
+            if tree.leaf_address(prefix, index) != address:
+                raise AssertionError
+        except IndexError:
+            raise AssertionError
+        return index
+
     @classmethod
     def index_by_id(cls, target_id, resources):
         """Helper method to fetch the index of a resource by its id or address
@@ -397,12 +624,12 @@ class BatchSubmitFinisher(_ClientRequestHandler):
 
         batch_ids = [b.header_signature for b in request.batches]
 
-        self._block_store.wait_for_batch_commits(
-            batch_ids=batch_ids,
-            timeout=request.timeout or DEFAULT_TIMEOUT)
-
-        statuses = self._get_statuses(batch_ids)
-        return self._wrap_response(batch_statuses=statuses)
+        return self._respond_when_done(
+            self._block_store.wait_for_batch_commits_async(
+                batch_ids=batch_ids,
+                timeout=request.timeout or DEFAULT_TIMEOUT),
+            lambda: self._wrap_response(
+                batch_statuses=self._get_statuses(batch_ids)))
 
 
 class BatchStatusRequest(_ClientRequestHandler):
@@ -416,10 +643,15 @@ class BatchStatusRequest(_ClientRequestHandler):
 
     def _respond(self, request):
         if request.wait_for_commit:
-            self._block_store.wait_for_batch_commits(
-                batch_ids=request.batch_ids,
-                timeout=request.timeout or DEFAULT_TIMEOUT)
+            return self._respond_when_done(
+                self._block_store.wait_for_batch_commits_async(
+                    batch_ids=request.batch_ids,
+                    timeout=request.timeout or DEFAULT_TIMEOUT),
+                lambda: self._respond_with_statuses(request))
+
+        return self._respond_with_statuses(request)
 
+    def _respond_with_statuses(self, request):
         statuses = self._get_statuses(request.batch_ids)
         if not statuses:
             return self._status.NO_RESOURCE
@@ -445,23 +677,16 @@ class StateListRequest(_ClientRequestHandler):
             client_pb2.ClientStateListRequest,
             client_pb2.ClientStateListResponse,
             validator_pb2.Message.CLIENT_STATE_LIST_RESPONSE,
-            tree=MerkleDatabase(database),
+            tree=MerkleDatabase(database, read_only=True),
             block_store=block_store)
 
     def _respond(self, request):
         head_id = self._set_root(request)
 
-        # Fetch leaves and encode as protobuf
-        leaves = [
-            client_pb2.Leaf(address=a, data=v) for a, v in
-            self._tree.leaves(request.address or '').items()]
-
-        # Order leaves, remove if tree.leaves refactored to be ordered
-        leaves.sort(key=lambda l: l.address)
-
-        leaves, paging = _Pager.paginate_resources(
+        leaves, paging = _Pager.paginate_leaves(
             request,
-            leaves,
+            self._tree,
+            request.address or '',
             self._status.INVALID_PAGING)
 
         if not leaves:
@@ -482,7 +707,7 @@ class StateGetRequest(_ClientRequestHandler):
             client_pb2.ClientStateGetRequest,
             client_pb2.ClientStateGetResponse,
             validator_pb2.Message.CLIENT_STATE_GET_RESPONSE,
-            tree=MerkleDatabase(database),
+            tree=MerkleDatabase(database, read_only=True),
             block_store=block_store)
 
     def _respond(self, request):
@@ -510,18 +735,32 @@ class BlockListRequest(_ClientRequestHandler):
             block_store=block_store)
 
     def _respond(self, request):
-        head_id = self._get_head_block(request).header_signature
-        blocks = self._list_store_resources(
-            request,
-            head_id,
-            request.block_ids,
-            lambda filter_id: self._block_store[filter_id].block,
-            lambda block: [block])
-
-        blocks, paging = _Pager.paginate_resources(
-            request,
-            blocks,
-            self._status.INVALID_PAGING)
+        head = self._get_head_block(request)
+        head_id = head.header_signature
+        page = None
+        if not request.block_ids:
+            page = _Pager.paginate_chain(
+                request,
+                self._block_store,
+                head,
+                lambda block: [block],
+                lambda block_id: self._block_store[block_id],
+                lambda block_num: block_num + 1,
+                self._status.INVALID_PAGING)
+
+        if page is None:
+            blocks = self._list_store_resources(
+                request,
+                head_id,
+                request.block_ids,
+                lambda filter_id: self._block_store[filter_id].block,
+                lambda block: [block])
+            page = _Pager.paginate_resources(
+                request,
+                blocks,
+                self._status.INVALID_PAGING)
+
+        blocks, paging = page
 
         if not blocks:
             return self._wrap_response(
@@ -561,18 +800,33 @@ class BatchListRequest(_ClientRequestHandler):
             block_store=block_store)
 
     def _respond(self, request):
-        head_id = self._get_head_block(request).header_signature
-        batches = self._list_store_resources(
-            request,
-            head_id,
-            request.batch_ids,
-            self._block_store.get_batch,
-            lambda block: [a for a in block.batches])
-
-        batches, paging = _Pager.paginate_resources(
-            request,
-            batches,
-            self._status.INVALID_PAGING)
+        head = self._get_head_block(request)
+        head_id = head.header_signature
+        page = None
+        if not request.batch_ids:
+            page = _Pager.paginate_chain(
+                request,
+                self._block_store,
+                head,
+                lambda block: [a for a in block.batches],
+                self._block_store.get_block_by_batch_id,
+                lambda block_num: self._block_store.get_chain_counts(
+                    block_num)[0],
+                self._status.INVALID_PAGING)
+
+        if page is None:
+            batches = self._list_store_resources(
+                request,
+                head_id,
+                request.batch_ids,
+                self._block_store.get_batch,
+                lambda block: [a for a in block.batches])
+            page = _Pager.paginate_resources(
+                request,
+                batches,
+                self._status.INVALID_PAGING)
+
+        batches, paging = page
 
         if not batches:
             return self._wrap_response(
@@ -612,18 +866,35 @@ class TransactionListRequest(_ClientRequestHandler):
             block_store=block_store)
 
     def _respond(self, request):
-        head_id = self._get_head_block(request).header_signature
-        transactions = self._list_store_resources(
-            request,
-            head_id,
-            request.transaction_ids,
-            self._block_store.get_transaction,
-            lambda block: [t for a in block.batches for t in a.transactions])
-
-        transactions, paging = _Pager.paginate_resources(
-            request,
-            transactions,
-            self._status.INVALID_PAGING)
+        head = self._get_head_block(request)
+        head_id = head.header_signature
+        page = None
+        if not request.transaction_ids:
+            page = _Pager.paginate_chain(
+                request,
+                self._block_store,
+                head,
+                lambda block: [
+                    t for a in block.batches for t in a.transactions],
+                self._block_store.get_block_by_transaction_id,
+                lambda block_num: self._block_store.get_chain_counts(
+                    block_num)[1],
+                self._status.INVALID_PAGING)
+
+        if page is None:
+            transactions = self._list_store_resources(
+                request,
+                head_id,
+                request.transaction_ids,
+                self._block_store.get_transaction,
+                lambda block: [
+                    t for a in block.batches for t in a.transactions])
+            page = _Pager.paginate_resources(
+                request,
+                transactions,
+                self._status.INVALID_PAGING)
+
+        transactions, paging = page
 
         if not transactions:
             return self._wrap_response(
@@ -13,13 +13,66 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
+from collections import OrderedDict
 import hashlib
+from threading import Lock
 
 from sawtooth_validator.protobuf.setting_pb2 import Setting
+from sawtooth_validator.state.state_view import StateView
 
 
 CONFIG_STATE_NAMESPACE = '000000'
 
+# the number of state roots whose settings are cached
+DEFAULT_SETTINGS_CACHE_SIZE = 64
+
+_NOT_FOUND = object()
+
+
+class SettingsCache(object):
+    """A cache of the setting values read at each state root, holding the
+    values already converted to their value types. The settings at a state
+    root never change, so entries never go stale; the state roots least
+    recently used are evicted.
+    """
+    def __init__(self, max_state_roots=DEFAULT_SETTINGS_CACHE_SIZE):
+        """
+        Args:
+            max_state_roots (int): the number of state roots whose settings
+                are kept
+        """
+        self._max_state_roots = max_state_roots
+        self._snapshots = OrderedDict()
+        self._lock = Lock()
+
+    def get_snapshot(self, state_root_hash):
+        """Returns the settings cached at a state root.
+
+        Args:
+            state_root_hash (str): the state root
+
+        Returns:
+            dict: the setting values, keyed by (key, value_type). Values
+                may be added to it, but never changed.
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(state_root_hash)
+            if snapshot is None:
+                snapshot = {}
+                self._snapshots[state_root_hash] = snapshot
+                while len(self._snapshots) > self._max_state_roots:
+                    self._snapshots.popitem(last=False)
+            else:
+                self._snapshots.move_to_end(state_root_hash)
+            return snapshot
+
+    def __len__(self):
+        with self._lock:
+            return len(self._snapshots)
+
+
+_SETTINGS_CACHE = SettingsCache()
+
 
 class ConfigView(object):
     """
@@ -29,13 +82,25 @@ class ConfigView(object):
     particular merkle tree root. This access is read-only.
     """
 
-    def __init__(self, state_view):
+    def __init__(self, state_view, settings_cache=None):
         """Creates a ConfigView, given a StateView for merkle tree access.
 
+        Settings read from a StateView are cached by its state root, so
+        that reading them again at the same state root, through any
+        ConfigView, does not read the merkle tree.
+
         Args:
             state_view (:obj:`StateView`): a state view
+            settings_cache (:obj:`SettingsCache`, optional): the cache of
+                settings, by default one shared by all ConfigViews
         """
         self._state_view = state_view
+        self._settings = None
+        if isinstance(state_view, StateView):
+            if settings_cache is None:
+                settings_cache = _SETTINGS_CACHE
+            self._settings = settings_cache.get_snapshot(
+                state_view.merkle_root)
 
     def get_setting(self, key, default_value=None, value_type=str):
         """Get the setting stored at the given key.
@@ -45,26 +110,38 @@ class ConfigView(object):
             default_value (str, optional): The default value, if none is
                 found. Defaults to None.
             value_type (function, optional): The type of a setting value.
-                Defaults to `str`.
+                Defaults to `str`. Converted values are cached by
+                value_type, and shared, so it should be a module level
+                function whose results are not modified.
 
         Returns:
             str: The value of the setting if found, default_value
             otherwise.
         """
+        if self._settings is not None:
+            value = self._settings.get((key, value_type))
+            if value is not None:
+                return default_value if value is _NOT_FOUND else value
+
         try:
             state_entry = self._state_view.get(
                 ConfigView.setting_address(key))
         except KeyError:
-            return default_value
+            state_entry = None
 
+        value = _NOT_FOUND
         if state_entry is not None:
             setting = Setting()
             setting.ParseFromString(state_entry)
             for setting_entry in setting.entries:
                 if setting_entry.key == key:
-                    return value_type(setting_entry.value)
+                    value = value_type(setting_entry.value)
+                    break
+
+        if self._settings is not None:
+            self._settings[(key, value_type)] = value
 
-        return default_value
+        return default_value if value is _NOT_FOUND else value
 
     def get_setting_list(self,
                          key,
@@ -13,9 +13,12 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
-import copy
+from collections import OrderedDict
 import logging
 import hashlib
+from threading import RLock
+import weakref
+
 import cbor
 
 LOGGER = logging.getLogger(__name__)
@@ -27,41 +30,357 @@ NODE_PROTO = {"v": None,
               "c": {}
               }
 
+# the encoding and hash of the empty tree's root node, which is NODE_PROTO
+_EMPTY_ROOT_PACKED = cbor.dumps(NODE_PROTO, sort_keys=True)
+EMPTY_ROOT_HASH = hashlib.sha512(_EMPTY_ROOT_PACKED).hexdigest()[:64]
+
 TOKEN_SIZE = 2
 
+# default budget, in bytes of encoded nodes, for a database's node cache
+DEFAULT_NODE_CACHE_SIZE = 64 * 1024 * 1024
+
+# default number of subtree leaf counts cached for a database
+DEFAULT_LEAF_COUNT_CACHE_SIZE = 64 * 1024
+
+
+class NodeCache(object):
+    """A bounded, least-recently-used cache of decoded merkle nodes, keyed
+    by node hash.
+
+    Nodes are content-addressed, so an entry never goes stale for as long as
+    the node exists in the underlying database. The size of an entry is
+    accounted as the length of its encoded form.
+
+    Attributes:
+        hits (int): the number of lookups served from the cache
+        misses (int): the number of lookups not found in the cache
+        evictions (int): the number of entries evicted to stay in budget
+    """
+
+    def __init__(self, max_size=DEFAULT_NODE_CACHE_SIZE):
+        """
+        Args:
+            max_size (int): the budget, in bytes of encoded nodes, for the
+                cache
+        """
+        self._lock = RLock()
+        self._cache = OrderedDict()
+        self._max_size = max_size
+        self._size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key_hash):
+        """Returns the decoded node for key_hash, or None if it is not
+        cached. The returned node is shared, and must not be modified.
+        """
+        with self._lock:
+            entry = self._cache.get(key_hash)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key_hash)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key_hash, node, size):
+        """Adds the decoded node for key_hash to the cache.
+
+        Args:
+            key_hash (str): the hash of the node
+            node (dict): the decoded node, which must not be modified after
+                it has been cached
+            size (int): the length of the node's encoded form
+        """
+        if size > self._max_size:
+            return
+
+        with self._lock:
+            if key_hash in self._cache:
+                self._cache.move_to_end(key_hash)
+                return
+            self._cache[key_hash] = (node, size)
+            self._size += size
+            while self._size > self._max_size:
+                _, (_, evicted_size) = self._cache.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+
+    def discard(self, key_hash):
+        """Removes key_hash from the cache, if present.
+        """
+        with self._lock:
+            entry = self._cache.pop(key_hash, None)
+            if entry is not None:
+                self._size -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._size = 0
+
+    def __contains__(self, key_hash):
+        with self._lock:
+            return key_hash in self._cache
+
+    def __len__(self):
+        with self._lock:
+            return len(self._cache)
+
+    @property
+    def size(self):
+        """The total encoded size, in bytes, of the cached nodes.
+        """
+        return self._size
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    def stats(self):
+        """
+        Returns:
+            dict: the counters and current occupancy of the cache
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._cache),
+                'size': self._size,
+                'max_size': self._max_size
+            }
+
+
+_NODE_CACHES = weakref.WeakKeyDictionary()
+_NODE_CACHES_LOCK = RLock()
+
+
+def get_node_cache(database, max_size=None):
+    """Returns the NodeCache shared by every MerkleDatabase over database,
+    creating it if necessary.
+
+    Args:
+        database (:obj:`Database`): the database holding the merkle nodes
+        max_size (int, optional): the byte budget to use if the cache is
+            created by this call; defaults to DEFAULT_NODE_CACHE_SIZE
+
+    Returns:
+        NodeCache: the cache for the database
+    """
+    with _NODE_CACHES_LOCK:
+        node_cache = _NODE_CACHES.get(database)
+        if node_cache is None:
+            if max_size is None:
+                max_size = DEFAULT_NODE_CACHE_SIZE
+            node_cache = NodeCache(max_size=max_size)
+            _NODE_CACHES[database] = node_cache
+        return node_cache
+
+
+_LEAF_COUNT_CACHES = weakref.WeakKeyDictionary()
+
+
+def _get_leaf_count_cache(database):
+    """Returns the cache of subtree leaf counts shared by every
+    MerkleDatabase over database. Counts are keyed by node hash, and so,
+    like nodes, never go stale. Each entry is accounted with a size of one,
+    so the cache is bounded by its number of entries.
+    """
+    with _NODE_CACHES_LOCK:
+        leaf_counts = _LEAF_COUNT_CACHES.get(database)
+        if leaf_counts is None:
+            leaf_counts = NodeCache(max_size=DEFAULT_LEAF_COUNT_CACHE_SIZE)
+            _LEAF_COUNT_CACHES[database] = leaf_counts
+        return leaf_counts
+
+
+_WRITE_LISTENERS = weakref.WeakKeyDictionary()
+
+
+def add_write_listener(database, listener):
+    """Registers a callable to be notified of the node hashes written to
+    database by any MerkleDatabase. The listener is called with the list of
+    hashes before they are written.
+
+    Args:
+        database (:obj:`Database`): the database holding the merkle nodes
+        listener (callable): a function taking a list of node hashes
+    """
+    with _NODE_CACHES_LOCK:
+        _WRITE_LISTENERS.setdefault(database, []).append(listener)
+
+
+def remove_write_listener(database, listener):
+    """Removes a listener registered with add_write_listener.
+    """
+    with _NODE_CACHES_LOCK:
+        listeners = _WRITE_LISTENERS.get(database, [])
+        if listener in listeners:
+            listeners.remove(listener)
+
 
 class MerkleDatabase(object):
-    def __init__(self, database, merkle_root=INIT_ROOT_KEY):
+    def __init__(self, database, merkle_root=INIT_ROOT_KEY, read_only=False):
+        """
+        Args:
+            database (:obj:`Database`): the database holding the nodes
+            merkle_root (str, optional): the root of the tree; by default,
+                the root of the empty tree
+            read_only (bool, optional): if True, the tree never writes to
+                the database, even to store the empty tree's root, and
+                writing to it raises a ValueError
+        """
         self._database = database
+        self._read_only = read_only
+        self._node_cache = get_node_cache(database)
+        self._leaf_counts = _get_leaf_count_cache(database)
         self.set_merkle_root(merkle_root)
 
     def __iter__(self):
-        for item in self._yield_iter('', self._root_hash):
+        for item in self.iter_leaves(''):
             yield item
 
-    def _yield_iter(self, path, hash_key):
+    def iter_leaves(self, prefix, start=None):
+        """Yields the (address, value) pairs of the leaves under prefix, in
+        address order. Only the nodes on the way to the leaves yielded are
+        read, so taking the first few items is cheap however many leaves
+        the prefix holds.
+
+        Args:
+            prefix (str): the address prefix of the leaves
+            start (str, optional): the address to start from; leaves with
+                addresses before it are skipped without being read
+        """
+        try:
+            node = self._get_by_addr(prefix)
+        except KeyError:
+            return
+
+        with self._database.snapshot() as reader:
+            stack = [(prefix, node)]
+            while stack:
+                path, node = stack.pop()
+                if node["v"] is not None and (start is None or path >= start):
+                    yield (path, self._decode(node["v"]))
+
+                # pushed in reverse, so that the least address is popped first
+                for token in sorted(node["c"], reverse=True):
+                    child_path = path + token
+                    if start is not None and \
+                            child_path < start[:len(child_path)]:
+                        continue
+                    stack.append(
+                        (child_path,
+                         self._get_by_hash(node["c"][token], reader)))
+
+    def leaf_count(self, prefix):
+        """Returns the number of leaves under prefix. Subtree counts are
+        cached by node hash, so after the first count only the nodes which
+        have changed since are read.
+
+        Args:
+            prefix (str): the address prefix of the leaves
+        """
+        try:
+            node = self._get_by_addr(prefix)
+        except KeyError:
+            return 0
+
+        with self._database.snapshot() as reader:
+            return self._count_node_leaves(node, reader)
+
+    def leaf_index(self, prefix, address):
+        """Returns the number of leaves under prefix whose addresses come
+        before address.
+
+        Args:
+            prefix (str): the address prefix of the leaves
+            address (str): the address to find the position of
+        """
         try:
-            node = self._get_by_addr(path)
+            node = self._get_by_addr(prefix)
         except KeyError:
-            raise StopIteration()
+            return 0
+
+        index = 0
+        path = prefix
+        with self._database.snapshot() as reader:
+            while True:
+                if node["v"] is not None and path < address:
+                    index += 1
+                token = address[len(path):len(path) + TOKEN_SIZE]
+                for child in node["c"]:
+                    if path + child < address[:len(path) + len(child)]:
+                        index += self._count_leaves(node["c"][child], reader)
+                if not token or token not in node["c"]:
+                    return index
+                path += token
+                node = self._get_by_hash(node["c"][token], reader)
+
+    def leaf_address(self, prefix, index):
+        """Returns the address of the leaf at index, in address order, of
+        the leaves under prefix.
 
-        if path == INIT_ROOT_KEY:
-            node = self._get_by_hash(hash_key)
+        Args:
+            prefix (str): the address prefix of the leaves
+            index (int): the position of the leaf
 
-        if node["v"] is not None:
-            yield (path, self._decode(node["v"]))
+        Raises:
+            IndexError: There are not more than index leaves under prefix.
+        """
+        try:
+            node = self._get_by_addr(prefix)
+        except KeyError:
+            raise IndexError("no leaf at index {}".format(index))
+
+        path = prefix
+        with self._database.snapshot() as reader:
+            while index >= 0:
+                if node["v"] is not None:
+                    if index == 0:
+                        return path
+                    index -= 1
+                for token in sorted(node["c"]):
+                    count = self._count_leaves(node["c"][token], reader)
+                    if index < count:
+                        path += token
+                        node = self._get_by_hash(node["c"][token], reader)
+                        break
+                    index -= count
+                else:
+                    break
 
-        for child in node["c"]:
-            for value in self._yield_iter(path + child, node["c"][child]):
-                yield value
+        raise IndexError("no leaf at index {}".format(index))
+
+    def _count_leaves(self, key_hash, reader):
+        count = self._leaf_counts.get(key_hash)
+        if count is None:
+            count = self._count_node_leaves(
+                self._get_by_hash(key_hash, reader), reader)
+            self._leaf_counts.put(key_hash, count, 1)
+        return count
+
+    def _count_node_leaves(self, node, reader):
+        return int(node["v"] is not None) + sum(
+            self._count_leaves(child, reader)
+            for child in node["c"].values())
 
     def get_merkle_root(self):
         return self._root_hash
 
     def set_merkle_root(self, merkle_root):
         if merkle_root == INIT_ROOT_KEY:
-            self._root_hash = self._set_kv(NODE_PROTO)
-            self._root_node = self._get_by_hash(self._root_hash)
+            if not self._read_only and \
+                    EMPTY_ROOT_HASH not in self._node_cache and \
+                    self._database.get_raw(EMPTY_ROOT_HASH) is None:
+                self._set_batch(
+                    [(EMPTY_ROOT_HASH, _EMPTY_ROOT_PACKED, NODE_PROTO)])
+            self._root_hash = EMPTY_ROOT_HASH
+            self._root_node = self._get_by_hash(EMPTY_ROOT_HASH)
         else:
             self._root_node = self._get_by_hash(merkle_root)
             self._root_hash = merkle_root
@@ -70,11 +389,53 @@ class MerkleDatabase(object):
     def hash(cls, stuff):
         return hashlib.sha512(stuff).hexdigest()[:64]
 
-    def _get_by_hash(self, key_hash):
-        if key_hash in self._database:
-            return self._decode(self._database.get(key_hash))
+    def _get_by_hash(self, key_hash, reader=None):
+        """Returns the decoded node for key_hash. The node may be shared
+        with the node cache, so it must be copied before it is modified.
+
+        Args:
+            key_hash (str): the hash of the node
+            reader (:obj:`DatabaseReader`, optional): a reader to use for
+                the node, if it is not cached, so that a series of lookups
+                shares one database snapshot
+        """
+        node = self._node_cache.get(key_hash)
+        if node is not None:
+            return node
+
+        if reader is None:
+            packed = self._database.get_raw(key_hash)
         else:
-            raise KeyError("hash {} not found in database".format(key_hash))
+            packed = reader.get_raw(key_hash)
+        if packed is None:
+            if key_hash != EMPTY_ROOT_HASH:
+                raise KeyError(
+                    "hash {} not found in database".format(key_hash))
+            # the empty tree's root is not stored by read-only trees
+            packed = _EMPTY_ROOT_PACKED
+
+        node = self._decode(packed)
+        self._node_cache.put(key_hash, node, len(packed))
+        return node
+
+    def _set_batch(self, batch):
+        """Writes the (hash, packed, node) triples in batch to the database
+        in a single write, and adds the written nodes to the node cache.
+        """
+        if self._read_only:
+            raise ValueError("Cannot write to a read-only MerkleDatabase")
+
+        with _NODE_CACHES_LOCK:
+            listeners = list(_WRITE_LISTENERS.get(self._database, []))
+        if listeners:
+            key_hashes = [key_hash for key_hash, _, _ in batch]
+            for listener in listeners:
+                listener(key_hashes)
+
+        self._database.set_batch_raw(
+            [(key_hash, packed) for key_hash, packed, _ in batch])
+        for key_hash, packed, node in batch:
+            self._node_cache.put(key_hash, node, len(packed))
 
     def __getitem__(self, address):
         return self.get(address)
@@ -100,38 +461,41 @@ class MerkleDatabase(object):
 
         node = self._root_node
 
-        for token in tokens:
-            if token in node['c']:
-                node = self._get_by_hash(node['c'][token])
-            else:
-                raise KeyError("invalid address {} "
-                               "from root {}".format(address,
-                                                     self._root_hash))
+        with self._database.snapshot() as reader:
+            for token in tokens:
+                if token in node['c']:
+                    node = self._get_by_hash(node['c'][token], reader)
+                else:
+                    raise KeyError("invalid address {} "
+                                   "from root {}".format(address,
+                                                         self._root_hash))
         return node
 
     def _get_path_by_addr(self, address, return_empty=False):
         tokens = self._tokenize_address(address)
-        node = copy.deepcopy(self._root_node)
+        node = _copy_node(self._root_node)
         path = ''
         nodes = {}
 
         nodes[path] = node
         new_branch = False
 
-        for token in tokens:
-            if token in node['c'] and not new_branch:
-                path = path + token
-                node = self._get_by_hash(node['c'][token])
-                nodes[path] = node
-            else:
-                if return_empty:
+        with self._database.snapshot() as reader:
+            for token in tokens:
+                if token in node['c'] and not new_branch:
                     path = path + token
-                    nodes[path] = {"v": None, "c": {}}
-                    new_branch = True
+                    node = _copy_node(
+                        self._get_by_hash(node['c'][token], reader))
+                    nodes[path] = node
                 else:
-                    raise KeyError("invalid address {} "
-                                   "from root {}".format(address,
-                                                         self._root_hash))
+                    if return_empty:
+                        path = path + token
+                        nodes[path] = {"v": None, "c": {}}
+                        new_branch = True
+                    else:
+                        raise KeyError("invalid address {} "
+                                       "from root {}".format(address,
+                                                             self._root_hash))
         return nodes
 
     def _decode(self, encoded):
@@ -158,19 +522,24 @@ class MerkleDatabase(object):
 
             if not leaf_branch:
                 (hash_key, packed) = self._encode_and_hash(path_map[path])
-                batch.append((hash_key, packed))
+                batch.append((hash_key, packed, path_map[path]))
                 if path != '':
                     path_map[parent_address]['c'][path_branch] = hash_key
             else:
                 if path != '':
                     del path_map[parent_address]['c'][path_branch]
 
-        self._database.set_batch(batch)
+        self._set_batch(batch)
 
         return hash_key
 
     def update(self, set_items, virtual=True):
-        """
+        """Sets the values of many addresses in a single pass.
+
+        The addresses are applied in sorted order, so every node on the
+        paths to them is loaded from the database at most once, no matter
+        how many of the addresses share it. The new hashes are then
+        computed bottom-up, a depth at a time, and written in one batch.
 
         Args:
             set_items (dict): dict key, values where keys are addresses
@@ -179,29 +548,64 @@ class MerkleDatabase(object):
         Returns:
             the state root after the operations
         """
-        path_map = {}
-        batch = []
-        key_hash = None
+        path_map = {'': _copy_node(self._root_node)}
+
+        with self._database.snapshot() as reader:
+            for set_address in sorted(set_items):
+                self._load_path(set_address, path_map, reader)
+                path_map[set_address]["v"] = \
+                    self._encode(set_items[set_address])
 
-        for set_address in set_items:
-            path_map.update(self._get_path_by_addr(set_address,
-                                                   return_empty=True))
-            path_map[set_address]["v"] = self._encode(set_items[set_address])
+        depths = {}
+        for path in path_map:
+            depths.setdefault(len(path), []).append(path)
 
         # Rebuild the hashes to the new root
-        for path in sorted(path_map, key=len, reverse=True):
-            (key_hash, packed) = self._encode_and_hash(path_map[path])
-            batch.append((key_hash, packed))
-            if path != '':
-                parent_address = path[:-TOKEN_SIZE]
-                path_branch = path[-TOKEN_SIZE:]
-                path_map[parent_address]['c'][path_branch] = key_hash
+        batch = []
+        key_hash = None
+        for depth in sorted(depths, reverse=True):
+            for path in depths[depth]:
+                node = path_map[path]
+                (key_hash, packed) = self._encode_and_hash(node)
+                batch.append((key_hash, packed, node))
+                if path != '':
+                    parent_address = path[:-TOKEN_SIZE]
+                    path_branch = path[-TOKEN_SIZE:]
+                    path_map[parent_address]['c'][path_branch] = key_hash
 
         if not virtual:
             # Apply all new hash, value pairs to the database
-            self._database.set_batch(batch)
+            self._set_batch(batch)
         return key_hash
 
+    def _load_path(self, address, path_map, reader=None):
+        """Adds copies of the nodes on the path to address to path_map,
+        reusing any nodes on the path which are already in path_map, and
+        creating empty nodes where the path leaves the existing tree.
+
+        Args:
+            address (str): the address to load the path to
+            path_map (dict): the nodes loaded so far, keyed by path; must
+                contain the root node under ''
+            reader (:obj:`DatabaseReader`, optional): the reader to load
+                nodes with
+        """
+        node = path_map['']
+        path = ''
+        for token in self._tokenize_address(address):
+            path = path + token
+            child = path_map.get(path)
+            if child is None:
+                # New nodes have no children until the hashes are rebuilt,
+                # so a missing token means the rest of the path is new.
+                if token in node['c']:
+                    child = _copy_node(
+                        self._get_by_hash(node['c'][token], reader))
+                else:
+                    child = {"v": None, "c": {}}
+                path_map[path] = child
+            node = child
+
     def _set_by_addr(self, address, value):
         tokens = self._tokenize_address(address)
         path_addresses = [''.join(tokens[0:i]) for i in range(len(tokens),
@@ -221,22 +625,22 @@ class MerkleDatabase(object):
             parent_address = path_address[:-TOKEN_SIZE]
             path_branch = path_address[-TOKEN_SIZE:]
             path_map[parent_address]["c"][path_branch] = key_hash
-            batch.append((key_hash, packed))
+            batch.append((key_hash, packed, child))
             child = path_map[parent_address]
 
         # Update the child of the root node to the prior hash
-        root_node = copy.deepcopy(self._root_node)
+        root_node = _copy_node(self._root_node)
         root_node["c"][tokens[0]] = key_hash
         (root_hash, packed) = self._encode_and_hash(root_node)
 
-        batch.append((root_hash, packed))
+        batch.append((root_hash, packed, root_node))
 
-        self._database.set_batch(batch)
+        self._set_batch(batch)
 
         return root_hash
 
     def _get_kv(self, key):
-        packed = self._database.get(key)
+        packed = self._database.get_raw(key)
         if packed is not None:
             return self._decode(packed)
         else:
@@ -245,7 +649,7 @@ class MerkleDatabase(object):
     def _set_kv(self, value):
         packed = self._encode(value)
         hashed_key = MerkleDatabase.hash(packed)
-        self._database.set(hashed_key, packed)
+        self._set_batch([(hashed_key, packed, value)])
         return hashed_key
 
     def addresses(self):
@@ -257,9 +661,17 @@ class MerkleDatabase(object):
 
     def leaves(self, prefix):
         leaves = {}
-        for address, value in self._yield_iter(prefix, self._root_hash):
+        for address, value in self.iter_leaves(prefix):
             leaves[address] = value
         return leaves
 
     def close(self):
         self._database.close()
+
+
+def _copy_node(node):
+    """Returns a copy of node which can be modified without affecting the
+    original. Values are immutable encoded bytes, so only the children map
+    needs to be copied.
+    """
+    return {"v": node["v"], "c": dict(node["c"])}
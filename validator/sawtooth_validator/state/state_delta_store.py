@@ -42,7 +42,8 @@ class StateDeltaStore(object):
         """
         delta_set = StateDeltaSet(state_changes=state_changes)
 
-        self._delta_db[state_root_hash] = delta_set.SerializeToString()
+        self._delta_db.set_batch_raw(
+            [(state_root_hash, delta_set.SerializeToString())])
 
     def get_state_deltas(self, state_root_hash):
         """Returns the state deltas stored for a given state root hash.
@@ -54,11 +55,11 @@ class StateDeltaStore(object):
         Raises:
             KeyError: if the state_root_hash is unknown.
         """
-        if state_root_hash not in self._delta_db:
+        delta_set_bytes = self._delta_db.get_raw(state_root_hash)
+        if delta_set_bytes is None:
             raise KeyError(
                 'Unknown state_root_hash {}'.format(state_root_hash))
 
-        delta_set_bytes = self._delta_db[state_root_hash]
         delta_set = StateDeltaSet()
         delta_set.ParseFromString(delta_set_bytes)
         return delta_set.state_changes
@@ -0,0 +1,323 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import logging
+from threading import Event
+from threading import RLock
+from threading import Thread
+import time
+
+import cbor
+
+from sawtooth_validator.database.migrate import FORMAT_KEY
+from sawtooth_validator.state.merkle import EMPTY_ROOT_HASH
+from sawtooth_validator.state.merkle import add_write_listener
+from sawtooth_validator.state.merkle import get_node_cache
+from sawtooth_validator.state.merkle import remove_write_listener
+
+
+LOGGER = logging.getLogger(__name__)
+
+# the number of committed blocks, back from the chain head, whose state
+# is retained
+DEFAULT_KEEP_BLOCKS = 1000
+
+# the number of keys examined per delete in the sweep phase
+_SWEEP_CHUNK_SIZE = 1000
+
+_IDLE = 'idle'
+_MARK = 'mark'
+_SWEEP = 'sweep'
+
+
+class StatePruner(object):
+    """Removes merkle nodes which are no longer reachable from any retained
+    state root.
+
+    The retained roots are those of the last keep_blocks blocks of the
+    committed chain, and of every block in the block cache, which covers
+    live forks and blocks being validated or published. Collection is a
+    mark-and-sweep performed in small steps, each bounded by a time budget,
+    so that it can run alongside block validation.
+
+    Nodes written while a collection is in progress are treated as
+    reachable, so state persisted during a collection is never removed.
+    """
+
+    def __init__(self, database, block_store, block_cache,
+                 keep_blocks=DEFAULT_KEEP_BLOCKS):
+        """
+        Args:
+            database (:obj:`Database`): the database holding the merkle nodes
+            block_store (:obj:`BlockStore`): the store of committed blocks
+            block_cache (:obj:`BlockCache`): the cache of recent blocks
+            keep_blocks (int): the number of committed blocks, back from
+                the chain head, whose state is retained
+        """
+        self._database = database
+        self._block_store = block_store
+        self._block_cache = block_cache
+        self._keep_blocks = keep_blocks
+        self._node_cache = get_node_cache(database)
+        self._empty_root = EMPTY_ROOT_HASH
+
+        self._lock = RLock()
+        self._phase = _IDLE
+        self._marked = set()
+        self._mark_stack = []
+        self._roots = set()
+        # block id: its state root and previous block id, of the committed
+        # blocks last walked, so that each is read from the store once
+        self._chain_roots = {}
+        # the ids of the committed blocks whose roots are retained by the
+        # collection in progress
+        self._retained_blocks = set()
+        # the last key examined by the sweep, from which it resumes
+        self._sweep_after = None
+
+        self.cycles = 0
+        self.nodes_deleted = 0
+
+    @property
+    def in_progress(self):
+        """Whether a collection has been started and not yet completed.
+        """
+        return self._phase != _IDLE
+
+    def start(self):
+        """Begins a collection, if one is not already in progress.
+        """
+        with self._lock:
+            if self._phase != _IDLE:
+                return
+            add_write_listener(self._database, self._on_nodes_written)
+            self._marked = set()
+            self._roots = set()
+            self._mark_stack = []
+            self._chain_roots = self._walk_chain(())
+            self._retained_blocks = set(self._chain_roots)
+            self._add_roots(
+                self._cached_state_roots() |
+                {root for root, _ in self._chain_roots.values() if root})
+            self._phase = _MARK
+
+    def step(self, time_budget):
+        """Performs collection work until the collection completes or
+        time_budget is exhausted. A collection is started if none is in
+        progress.
+
+        Args:
+            time_budget (float): the time in seconds to spend
+
+        Returns:
+            bool: True if the collection completed during this step
+        """
+        deadline = time.time() + time_budget
+        self.start()
+
+        while time.time() < deadline:
+            if self._phase == _MARK:
+                self._mark(deadline)
+            elif self._phase == _SWEEP:
+                if self._sweep():
+                    return True
+        return False
+
+    def prune(self):
+        """Performs a complete collection.
+        """
+        while not self.step(1):
+            pass
+
+    def _mark(self, deadline):
+        while self._mark_stack:
+            if time.time() >= deadline:
+                return
+            key_hash = self._mark_stack.pop()
+            with self._lock:
+                if key_hash in self._marked:
+                    continue
+                self._marked.add(key_hash)
+            try:
+                node = self._get_node(key_hash)
+            except KeyError:
+                # roots of blocks which failed validation may never have
+                # been persisted
+                continue
+            self._mark_stack.extend(
+                child for child in node['c'].values()
+                if child not in self._marked)
+
+        # Roots may have been committed or cached while marking; mark from
+        # any that are new before moving on to the sweep. Only the blocks
+        # committed since the chain was last walked are read.
+        committed = self._walk_chain(self._retained_blocks)
+        self._chain_roots.update(committed)
+        self._retained_blocks.update(committed)
+        new_roots = (
+            self._cached_state_roots() |
+            {root for root, _ in committed.values() if root}) - self._roots
+        if new_roots:
+            self._add_roots(new_roots)
+            return
+
+        self._sweep_after = None
+        self._phase = _SWEEP
+
+    def _sweep(self):
+        chunk = self._next_sweep_keys()
+
+        with self._lock:
+            del_keys = [key for key in chunk
+                        if key not in self._marked and key != FORMAT_KEY]
+            if del_keys:
+                self._database.set_batch_raw([], del_keys)
+                for key in del_keys:
+                    self._node_cache.discard(key)
+            self.nodes_deleted += len(del_keys)
+
+        if len(chunk) == _SWEEP_CHUNK_SIZE:
+            self._sweep_after = chunk[-1]
+            return False
+
+        with self._lock:
+            remove_write_listener(self._database, self._on_nodes_written)
+            LOGGER.debug(
+                'State pruning retained %s nodes from %s roots',
+                len(self._marked), len(self._roots))
+            self._marked = set()
+            self._roots = set()
+            self._retained_blocks = set()
+            self._phase = _IDLE
+            self.cycles += 1
+        return True
+
+    def _next_sweep_keys(self):
+        """Returns the next keys of the database to examine, in key order,
+        resuming after the last key examined.
+        """
+        chunk = []
+        # values are not needed, so they are not copied out of the database
+        with self._database.snapshot(buffers=True) as reader:
+            for key, _ in reader.scan(start=self._sweep_after):
+                if key == self._sweep_after:
+                    continue
+                chunk.append(key)
+                if len(chunk) == _SWEEP_CHUNK_SIZE:
+                    break
+        return chunk
+
+    def _on_nodes_written(self, key_hashes):
+        with self._lock:
+            self._marked.update(key_hashes)
+
+    def _add_roots(self, roots):
+        self._roots.update(roots)
+        self._mark_stack.extend(roots)
+
+    def _get_node(self, key_hash):
+        node = self._node_cache.get(key_hash)
+        if node is not None:
+            return node
+        packed = self._database.get_raw(key_hash)
+        if packed is None:
+            raise KeyError("hash {} not found in database".format(key_hash))
+        return cbor.loads(packed)
+
+    def _cached_state_roots(self):
+        """Returns the state roots of the blocks in the block cache, and the
+        root of the empty state.
+        """
+        roots = {self._empty_root}
+        for block in self._block_cache.values():
+            if block is not None:
+                roots.add(block.state_root_hash)
+        roots.discard('')
+        return roots
+
+    def _walk_chain(self, stop_blocks):
+        """Walks the last keep_blocks blocks of the committed chain back
+        from its head, until a block in stop_blocks. Blocks walked before
+        are not read from the block store again.
+
+        Args:
+            stop_blocks (set of str): the ids of the blocks to stop at
+
+        Returns:
+            dict: block id: its state root and previous block id, of the
+                blocks walked
+        """
+        walked = {}
+        head = self._block_store.chain_head
+        if head is None:
+            return walked
+        block_id = head.identifier
+        self._chain_roots.setdefault(
+            block_id, (head.state_root_hash, head.previous_block_id))
+
+        for _ in range(self._keep_blocks):
+            if block_id in stop_blocks:
+                break
+            entry = self._chain_roots.get(block_id)
+            if entry is None:
+                try:
+                    block = self._block_store[block_id]
+                except KeyError:
+                    break
+                entry = (block.state_root_hash, block.previous_block_id)
+            walked[block_id] = entry
+            block_id = entry[1]
+        return walked
+
+
+class StatePrunerThread(Thread):
+    """Runs a StatePruner in the background, performing a bounded step of
+    collection work at a fixed frequency, and starting a new collection at
+    a fixed interval after the previous one completes.
+    """
+
+    def __init__(self, state_pruner, time_budget=0.05, step_frequency=1,
+                 cycle_interval=600):
+        """
+        Args:
+            state_pruner (:obj:`StatePruner`): the pruner to run
+            time_budget (float): the time in seconds to spend per step
+            step_frequency (float): the delay in seconds between steps
+            cycle_interval (float): the delay in seconds between collections
+        """
+        super(StatePrunerThread, self).__init__(name='StatePrunerThread')
+        self._state_pruner = state_pruner
+        self._time_budget = time_budget
+        self._step_frequency = step_frequency
+        self._cycle_interval = cycle_interval
+        self._exit = Event()
+
+    def run(self):
+        # pylint: disable=broad-except
+        try:
+            while not self._exit.wait(self._step_frequency):
+                if self._state_pruner.step(self._time_budget):
+                    LOGGER.info(
+                        'State pruning removed %s nodes in %s collections',
+                        self._state_pruner.nodes_deleted,
+                        self._state_pruner.cycles)
+                    if self._exit.wait(self._cycle_interval):
+                        return
+        except Exception as exc:
+            LOGGER.exception(exc)
+            LOGGER.critical("StatePrunerThread exited with error.")
+
+    def stop(self):
+        self._exit.set()
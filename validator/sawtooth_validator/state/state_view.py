@@ -13,6 +13,7 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
+from sawtooth_validator.state.merkle import INIT_ROOT_KEY
 from sawtooth_validator.state.merkle import MerkleDatabase
 
 
@@ -38,14 +39,15 @@ class StateViewFactory(object):
         Args:
             state_root_hash (str): The state root hash of the state view
                 to return.  If None, returns the state view for the
+                empty tree.
         Returns:
             StateView: state view locked to the given root hash.
         """
-        # Create a default Merkle database and if we have a state root hash,
-        # update the Merkle database's root to that
-        merkle_db = MerkleDatabase(self._database)
-        if state_root_hash is not None:
-            merkle_db.set_merkle_root(state_root_hash)
+        # Views are read-only, so creating one never writes to the database
+        if state_root_hash is None:
+            state_root_hash = INIT_ROOT_KEY
+        merkle_db = MerkleDatabase(self._database, state_root_hash,
+                                   read_only=True)
 
         return StateView(merkle_db)
 
@@ -67,6 +69,14 @@ class StateView(object):
         """
         self._tree = tree
 
+    @property
+    def merkle_root(self):
+        """
+        Returns:
+            str: the merkle root of this view
+        """
+        return self._tree.get_merkle_root()
+
     def get(self, address):
         """
         Returns:
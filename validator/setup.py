@@ -63,6 +63,7 @@ setup(
     data_files=data_files,
     entry_points={
         'console_scripts': [
-            'validator = sawtooth_validator.server.cli:main'
+            'validator = sawtooth_validator.server.cli:main',
+            'validator-migrate-db = sawtooth_validator.database.migrate:main'
         ]
     })
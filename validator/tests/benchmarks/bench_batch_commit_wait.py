@@ -0,0 +1,99 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Benchmarks clients waiting for their batches to commit, each served by a
+thread parked on the block store's commit condition as before, against
+futures resolved by a BatchCommitNotifier. Reports the threads started for the
+waiting clients, and the time from the commit until every client is
+answered.
+
+Run from the validator directory:
+
+    python3 tests/benchmarks/bench_batch_commit_wait.py --clients 100 1000
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+from sawtooth_validator.journal.batch_commit_notifier import \
+    BatchCommitNotifier
+
+
+def _wait_with_threads(clients):
+    committed = set()
+    condition = threading.Condition()
+    answered = threading.Semaphore(0)
+    threads = threading.active_count()
+
+    def wait(batch_id):
+        with condition:
+            while batch_id not in committed:
+                condition.wait(300)
+        answered.release()
+
+    for i in range(clients):
+        threading.Thread(target=wait, args=(str(i),), daemon=True).start()
+    threads = threading.active_count() - threads
+
+    start = time.time()
+    with condition:
+        committed.update(str(i) for i in range(clients))
+        condition.notify_all()
+    for _ in range(clients):
+        answered.acquire()
+    return threads, time.time() - start
+
+
+def _wait_with_notifier(clients):
+    committed = set()
+    notifier = BatchCommitNotifier(lambda batch_id: batch_id in committed)
+    answered = threading.Semaphore(0)
+    threads = threading.active_count()
+
+    for i in range(clients):
+        notifier.wait_for_batch_commits([str(i)], 300).add_done_callback(
+            lambda _: answered.release())
+    threads = threading.active_count() - threads
+
+    start = time.time()
+    committed.update(str(i) for i in range(clients))
+    notifier.notify_batches_committed(str(i) for i in range(clients))
+    for _ in range(clients):
+        answered.acquire()
+    return threads, time.time() - start
+
+
+def main(args=sys.argv[1:]):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients',
+                        nargs='+',
+                        type=int,
+                        default=[100, 1000])
+    opts = parser.parse_args(args)
+
+    print('{:>8} {:>14} {:>14} {:>14} {:>14}'.format(
+        'clients', 'threads(old)', 'threads(new)', 'answer(old)s',
+        'answer(new)s'))
+    for clients in opts.clients:
+        old_threads, old_time = _wait_with_threads(clients)
+        new_threads, new_time = _wait_with_notifier(clients)
+        print('{:>8} {:>14} {:>14} {:>14.4f} {:>14.4f}'.format(
+            clients, old_threads, new_threads, old_time, new_time))
+
+
+if __name__ == '__main__':
+    main()
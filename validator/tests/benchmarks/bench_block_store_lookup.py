@@ -0,0 +1,122 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Benchmarks BlockStore.has_transaction, for transactions committed and
+not, against looking each transaction up in the LMDB database, as it was
+before the BlockStore filtered lookups with a Bloom filter, and the time
+to build a BlockStore, with its filter persisted and not.
+
+Run from the validator directory:
+
+    python3 tests/benchmarks/bench_block_store_lookup.py --blocks 100 1000
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from sawtooth_validator.database.lmdb_nolock_database import \
+    LMDBNoLockDatabase
+from sawtooth_validator.journal.block_store import BlockStore
+from sawtooth_validator.journal.block_wrapper import BlockWrapper
+from sawtooth_validator.protobuf.batch_pb2 import Batch
+from sawtooth_validator.protobuf.block_pb2 import Block
+from sawtooth_validator.protobuf.block_pb2 import BlockHeader
+from sawtooth_validator.protobuf.transaction_pb2 import Transaction
+
+
+def _signature(name):
+    # ids are hex signatures, of the same length
+    return hashlib.sha512(name.encode()).hexdigest()
+
+
+def _make_block(block_num, batch_count, txn_count):
+    block_id = _signature('B-{}'.format(block_num))
+    batches = [
+        Batch(header_signature=_signature('B-{}-b{}'.format(block_num, i)),
+              transactions=[
+                  Transaction(header_signature=_signature(
+                      'B-{}-b{}-t{}'.format(block_num, i, j)))
+                  for j in range(txn_count)])
+        for i in range(batch_count)]
+    header = BlockHeader(
+        block_num=block_num,
+        previous_block_id=_signature('B-{}'.format(block_num - 1)))
+    return BlockWrapper(Block(header=header.SerializeToString(),
+                              header_signature=block_id,
+                              batches=batches))
+
+
+def _time_lookups(has_transaction, txn_ids):
+    start = time.time()
+    for txn_id in txn_ids:
+        has_transaction(txn_id)
+    return time.time() - start
+
+
+def main(args=sys.argv[1:]):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--blocks',
+                        nargs='+',
+                        type=int,
+                        default=[100, 1000])
+    parser.add_argument('--lookups', type=int, default=100000)
+    opts = parser.parse_args(args)
+
+    print('{:>8} {:>8} {:>10} {:>12} {:>8}'.format(
+        'blocks', 'lookups', 'ids', 'database(s)', 'filtered(s)'))
+    for block_count in opts.blocks:
+        data_dir = tempfile.mkdtemp()
+        try:
+            database = LMDBNoLockDatabase(
+                os.path.join(data_dir, 'block.lmdb'), 'n')
+            block_store = BlockStore(database)
+            for block_num in range(block_count):
+                block_store.update_chain([_make_block(block_num, 10, 10)])
+
+            missing = [_signature('missing-{}'.format(i))
+                       for i in range(opts.lookups)]
+            found = [_signature('B-{}-b{}-t{}'.format(
+                i % block_count, i % 10, i % 7))
+                     for i in range(opts.lookups)]
+            for name, txn_ids in (('missing', missing), ('committed', found)):
+                old_time = _time_lookups(
+                    lambda txn_id: txn_id in database, txn_ids)
+                new_time = _time_lookups(
+                    block_store.has_transaction, txn_ids)
+                print('{:>8} {:>8} {:>10} {:>12.3f} {:>8.3f}'.format(
+                    block_count, opts.lookups, name, old_time, new_time))
+
+            start = time.time()
+            BlockStore(database)
+            built_time = time.time() - start
+            block_store.persist_stored_keys()
+            start = time.time()
+            BlockStore(database)
+            loaded_time = time.time() - start
+            print('{:>8} {:>8} {:>10} {:>12.3f} {:>8.3f}'.format(
+                block_count, 1, 'startup', built_time, loaded_time))
+
+            database.close()
+        finally:
+            shutil.rmtree(data_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Benchmarks the time a block message waits to be handled behind a flood of
+batch messages, when every message is dispatched in order of arrival, as
+before, against dispatching block messages first, with the handlers in
+flight bounded to twice the workers.
+
+Run from the validator directory:
+
+    python3 tests/benchmarks/bench_dispatch_priority.py --flood 1000 5000
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import sys
+import threading
+import time
+
+from sawtooth_validator.networking import dispatch
+from sawtooth_validator.protobuf import validator_pb2
+
+
+BLOCK = validator_pb2.Message.GOSSIP_BLOCK_RESPONSE
+BATCH = validator_pb2.Message.GOSSIP_BATCH_RESPONSE
+
+
+class _WorkHandler(dispatch.Handler):
+    def __init__(self, work_time, on_handled=None):
+        self._work_time = work_time
+        self._on_handled = on_handled
+
+    def handle(self, connection_id, message_content):
+        time.sleep(self._work_time)
+        if self._on_handled is not None:
+            self._on_handled()
+        return dispatch.HandlerResult(dispatch.HandlerStatus.DROP)
+
+
+def _time_block(dispatcher, flood, workers, work_time):
+    handled = threading.Event()
+    thread_pool = ThreadPoolExecutor(max_workers=workers)
+    dispatcher.add_handler(BATCH, _WorkHandler(work_time), thread_pool)
+    dispatcher.add_handler(
+        BLOCK, _WorkHandler(work_time, handled.set), thread_pool)
+    dispatcher.start()
+
+    for _ in range(flood):
+        dispatcher.dispatch('connection',
+                            validator_pb2.Message(message_type=BATCH),
+                            'connection_id')
+    start = time.time()
+    dispatcher.dispatch('connection',
+                        validator_pb2.Message(message_type=BLOCK),
+                        'connection_id')
+    handled.wait()
+    elapsed = time.time() - start
+
+    dispatcher.block_until_complete()
+    dispatcher.stop()
+    thread_pool.shutdown()
+    return elapsed
+
+
+def main(args=sys.argv[1:]):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--flood',
+                        nargs='+',
+                        type=int,
+                        default=[1000, 5000])
+    parser.add_argument('--workers', type=int, default=10)
+    parser.add_argument('--work-time', type=float, default=0.001)
+    opts = parser.parse_args(args)
+
+    print('{:>8} {:>14} {:>14}'.format(
+        'flood', 'in-order(s)', 'priority(s)'))
+    for flood in opts.flood:
+        old_time = _time_block(
+            dispatch.Dispatcher(), flood, opts.workers, opts.work_time)
+
+        dispatcher = dispatch.Dispatcher(max_in_flight=2 * opts.workers)
+        dispatcher.set_priority(BLOCK, dispatch.MessagePriority.HIGH)
+        new_time = _time_block(
+            dispatcher, flood, opts.workers, opts.work_time)
+
+        print('{:>8} {:>14.4f} {:>14.4f}'.format(flood, old_time, new_time))
+
+
+if __name__ == '__main__':
+    main()
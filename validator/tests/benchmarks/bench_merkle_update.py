@@ -0,0 +1,118 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Benchmarks MerkleDatabase.update against the previous per-address
+implementation, which loaded the full path to every address independently.
+
+Run from the validator directory:
+
+    python3 tests/benchmarks/bench_merkle_update.py --sizes 1000 10000 100000
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from sawtooth_validator.database.lmdb_nolock_database import \
+    LMDBNoLockDatabase
+from sawtooth_validator.state.merkle import MerkleDatabase
+from sawtooth_validator.state.merkle import TOKEN_SIZE
+
+
+def per_address_update(tree, set_items, virtual=True):
+    """The update algorithm prior to the bulk implementation.
+    """
+    path_map = {}
+    batch = []
+    key_hash = None
+
+    for set_address in set_items:
+        path_map.update(tree._get_path_by_addr(set_address,
+                                               return_empty=True))
+        path_map[set_address]["v"] = tree._encode(set_items[set_address])
+
+    for path in sorted(path_map, key=len, reverse=True):
+        (key_hash, packed) = tree._encode_and_hash(path_map[path])
+        batch.append((key_hash, packed, path_map[path]))
+        if path != '':
+            parent_address = path[:-TOKEN_SIZE]
+            path_branch = path[-TOKEN_SIZE:]
+            path_map[parent_address]['c'][path_branch] = key_hash
+
+    if not virtual:
+        tree._set_batch(batch)
+    return key_hash
+
+
+def _make_items(count, generation):
+    return {
+        MerkleDatabase.hash('{}'.format(i).encode()) + '000000':
+        '{}-{}'.format(generation, i).encode()
+        for i in range(count)
+    }
+
+
+def _time_update(update, data_dir, size):
+    database = LMDBNoLockDatabase(
+        os.path.join(data_dir, 'merkle-{}.lmdb'.format(size)), 'n')
+    tree = MerkleDatabase(database)
+
+    # populate the tree, so the timed update modifies existing paths
+    tree.set_merkle_root(tree.update(_make_items(size, 0), virtual=False))
+
+    items = _make_items(size, 1)
+    start = time.time()
+    root = update(tree, items)
+    elapsed = time.time() - start
+
+    database.close()
+    return root, elapsed
+
+
+def main(args=sys.argv[1:]):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes',
+                        nargs='+',
+                        type=int,
+                        default=[1000, 10000, 100000])
+    opts = parser.parse_args(args)
+
+    data_dir = tempfile.mkdtemp()
+    try:
+        print('{:>8} {:>14} {:>14} {:>8}'.format(
+            'keys', 'per-address(s)', 'bulk(s)', 'speedup'))
+        for size in opts.sizes:
+            old_root, old_time = _time_update(
+                lambda tree, items: per_address_update(
+                    tree, items, virtual=False),
+                data_dir, size)
+            new_root, new_time = _time_update(
+                lambda tree, items: tree.update(items, virtual=False),
+                data_dir, size)
+            if old_root != new_root:
+                raise AssertionError(
+                    'Roots differ for {} keys: {} != {}'.format(
+                        size, old_root, new_root))
+            print('{:>8} {:>14.3f} {:>14.3f} {:>7.1f}x'.format(
+                size, old_time, new_time, old_time / new_time))
+    finally:
+        shutil.rmtree(data_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Benchmarks the CPU time spent decoding a gossiped block by the handlers
+of a GOSSIP_MESSAGE, run in the main process, when each handler decodes the
+message content itself, against sharing a MessageContent's decoding.
+
+Run from the validator directory:
+
+    python3 tests/benchmarks/bench_message_decode.py --batches 10 100 1000
+"""
+
+import argparse
+import sys
+import time
+
+from sawtooth_validator.networking.dispatch import MessageContent
+from sawtooth_validator.networking.dispatch import decode_embedded_message
+from sawtooth_validator.networking.dispatch import decode_message
+from sawtooth_validator.protobuf.batch_pb2 import Batch
+from sawtooth_validator.protobuf.block_pb2 import Block
+from sawtooth_validator.protobuf.network_pb2 import GossipMessage
+from sawtooth_validator.protobuf.transaction_pb2 import Transaction
+
+
+def _make_gossip_block(batch_count, txn_count=5):
+    batches = [
+        Batch(header=b'h' * 100,
+              header_signature='b{}'.format(i) * 16,
+              transactions=[Transaction(header=b'h' * 300,
+                                        header_signature='t{}'.format(j) * 32,
+                                        payload=b'p' * 100)
+                            for j in range(txn_count)])
+        for i in range(batch_count)]
+    block = Block(header=b'h' * 200,
+                  header_signature='block' * 25,
+                  batches=batches)
+    return GossipMessage(content_type='BLOCK',
+                         content=block.SerializeToString()).SerializeToString()
+
+
+def handle_gossip_block(message_content):
+    """The decoding done by the GossipMessageHandler, GossipBroadcastHandler
+    and CompleterGossipHandler, in order.
+    """
+    decode_message(message_content, GossipMessage)
+    for _ in range(2):
+        gossip_message = decode_message(message_content, GossipMessage)
+        if gossip_message.content_type == "BLOCK":
+            decode_embedded_message(message_content, GossipMessage, Block)
+
+
+def _time_messages(content, count, wrap):
+    start = time.process_time()
+    for _ in range(count):
+        handle_gossip_block(wrap(content))
+    return (time.process_time() - start) / count
+
+
+def main(args=sys.argv[1:]):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batches',
+                        nargs='+',
+                        type=int,
+                        default=[10, 100, 1000])
+    parser.add_argument('--messages', type=int, default=200)
+    opts = parser.parse_args(args)
+
+    print('{:>8} {:>10} {:>14} {:>14} {:>8}'.format(
+        'batches', 'bytes', 'per-handler(s)', 'shared(s)', 'speedup'))
+    for batch_count in opts.batches:
+        content = _make_gossip_block(batch_count)
+        old_time = _time_messages(content, opts.messages, bytes)
+        new_time = _time_messages(content, opts.messages, MessageContent)
+        print('{:>8} {:>10} {:>14.6f} {:>14.6f} {:>7.1f}x'.format(
+            batch_count, len(content), old_time, new_time,
+            old_time / new_time))
+
+
+if __name__ == '__main__':
+    main()
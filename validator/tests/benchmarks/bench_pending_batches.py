@@ -0,0 +1,105 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Benchmarks removing the batches committed by a block from the publisher's
+pending batches, with the PendingBatchPool, against the previous list of
+pending batches, which was rebuilt on every chain update.
+
+Run from the validator directory:
+
+    python3 tests/benchmarks/bench_pending_batches.py --pending 10000 100000
+"""
+
+import argparse
+import sys
+import time
+
+from sawtooth_validator.journal.pending_batch_pool import PendingBatchPool
+from sawtooth_validator.protobuf.batch_pb2 import Batch
+from sawtooth_validator.protobuf.batch_pb2 import BatchHeader
+from sawtooth_validator.protobuf.transaction_pb2 import Transaction
+from sawtooth_validator.protobuf.transaction_pb2 import TransactionHeader
+
+
+def _make_batch(i):
+    txn = Transaction(
+        header=TransactionHeader(
+            signer_pubkey='signer', nonce=str(i)).SerializeToString(),
+        header_signature='txn' + str(i))
+    return Batch(
+        header=BatchHeader(signer_pubkey='signer').SerializeToString(),
+        header_signature='batch' + str(i),
+        transactions=[txn])
+
+
+def rebuild_pending_batches(pending_batches, committed_batches):
+    """The chain update prior to the PendingBatchPool.
+    """
+    committed_set = set([x.header_signature for x in committed_batches])
+    rebuilt = []
+    for batch in pending_batches:
+        if batch.header_signature not in committed_set:
+            rebuilt.append(batch)
+    return rebuilt
+
+
+def _time_list(batches, committed_count, updates):
+    pending_batches = list(batches)
+    elapsed = 0
+    for i in range(updates):
+        committed = batches[i * committed_count:(i + 1) * committed_count]
+        start = time.time()
+        pending_batches = rebuild_pending_batches(pending_batches, committed)
+        elapsed += time.time() - start
+    return elapsed / updates
+
+
+def _time_pool(batches, committed_count, updates):
+    pool = PendingBatchPool()
+    for batch in batches:
+        pool.add(batch)
+    elapsed = 0
+    for i in range(updates):
+        committed = batches[i * committed_count:(i + 1) * committed_count]
+        start = time.time()
+        for batch in committed:
+            pool.remove(batch.header_signature)
+        elapsed += time.time() - start
+    return elapsed / updates
+
+
+def main(args=sys.argv[1:]):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pending',
+                        nargs='+',
+                        type=int,
+                        default=[10000, 100000])
+    parser.add_argument('--committed', type=int, default=100)
+    parser.add_argument('--updates', type=int, default=20)
+    opts = parser.parse_args(args)
+
+    print('{:>10} {:>10} {:>14} {:>14}'.format(
+        'pending', 'committed', 'list(ms)', 'pool(ms)'))
+    for pending in opts.pending:
+        batches = [_make_batch(i) for i in range(pending)]
+        updates = min(opts.updates, pending // opts.committed)
+        old_time = _time_list(batches, opts.committed, updates)
+        new_time = _time_pool(batches, opts.committed, updates)
+        print('{:>10} {:>10} {:>14.3f} {:>14.3f}'.format(
+            pending, opts.committed, old_time * 1000, new_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
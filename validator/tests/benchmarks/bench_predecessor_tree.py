@@ -0,0 +1,204 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Benchmarks the PredecessorTree against the previous implementation, which
+searched every node below an address for its readers and writers.
+
+Each transaction finds the predecessors of its inputs and outputs, then is
+added to the tree as a reader and writer, as the ParallelScheduler does.
+The wide workload gives each transaction its own leaf address, with some
+transactions reading a whole namespace; the deep workload concentrates
+transactions under few long shared prefixes, reading and writing at every
+depth.
+
+Run from the validator directory:
+
+    python3 tests/benchmarks/bench_predecessor_tree.py --sizes 1000 10000
+"""
+
+import argparse
+from collections import deque
+import hashlib
+import random
+import sys
+import time
+
+from sawtooth_validator.execution.scheduler_parallel import PredecessorTree
+
+
+class PreviousPredecessorTreeNode:
+    def __init__(self):
+        self.children = {}
+        self.readers = []
+        self.writer = None
+
+
+class PreviousPredecessorTree:
+    """The predecessor tree prior to keeping subtree summaries.
+    """
+    def __init__(self, token_size=2):
+        self._token_size = token_size
+        self._root = PreviousPredecessorTreeNode()
+
+    def _tokenize_address(self, address):
+        return [address[i:i + self._token_size]
+                for i in range(0, len(address), self._token_size)]
+
+    def _get(self, address):
+        node = self._root
+        for token in self._tokenize_address(address):
+            if token not in node.children:
+                node.children[token] = PreviousPredecessorTreeNode()
+            node = node.children[token]
+        return node
+
+    def add_reader(self, address, reader):
+        self._get(address).readers.append(reader)
+
+    def set_writer(self, address, writer):
+        node = self._get(address)
+        node.readers = []
+        node.writer = writer
+        node.children = {}
+
+    def find_write_predecessors(self, address):
+        predecessors = set()
+        node = self._root
+        enclosing_writer = node.writer
+        predecessors.update(set(node.readers))
+        for token in self._tokenize_address(address):
+            if token not in node.children:
+                if enclosing_writer is not None:
+                    predecessors.add(enclosing_writer)
+                return predecessors
+            node = node.children[token]
+            predecessors.update(set(node.readers))
+            if node.writer is not None:
+                enclosing_writer = node.writer
+        if enclosing_writer is not None:
+            predecessors.add(enclosing_writer)
+
+        to_process = deque()
+        to_process.extendleft(node.children.values())
+        while len(to_process) > 0:
+            node = to_process.pop()
+            predecessors.update(node.readers)
+            if node.writer is not None:
+                predecessors.add(node.writer)
+            to_process.extendleft(node.children.values())
+        return predecessors
+
+    def find_read_predecessors(self, address):
+        predecessors = set()
+        node = self._root
+        enclosing_writer = node.writer
+        for token in self._tokenize_address(address):
+            if token not in node.children:
+                if enclosing_writer is not None:
+                    predecessors.add(enclosing_writer)
+                return predecessors
+            node = node.children[token]
+            if node.writer is not None:
+                enclosing_writer = node.writer
+        if enclosing_writer is not None:
+            predecessors.add(enclosing_writer)
+
+        to_process = deque()
+        to_process.extendleft(node.children.values())
+        while len(to_process) > 0:
+            node = to_process.pop()
+            if node.writer is not None:
+                predecessors.add(node.writer)
+            to_process.extendleft(node.children.values())
+        return predecessors
+
+
+def _address(namespace, name):
+    return namespace + hashlib.sha512(name.encode()).hexdigest()[:64]
+
+
+def wide_workload(size):
+    """Returns (inputs, outputs) for each transaction.
+    """
+    rand = random.Random(size)
+    namespaces = ['{:06x}'.format(i) for i in range(4)]
+    txns = []
+    for i in range(size):
+        namespace = rand.choice(namespaces)
+        if i % 100 == 99:
+            # a transaction reading the whole of a namespace
+            txns.append(([namespace], [_address(namespace, str(i))]))
+        else:
+            address = _address(namespace, str(i))
+            txns.append(([address], [address]))
+    return txns
+
+
+def deep_workload(size):
+    rand = random.Random(size)
+    prefixes = [_address('000000', str(i)) for i in range(4)]
+    txns = []
+    for i in range(size):
+        prefix = rand.choice(prefixes)
+        address = prefix[:rand.randrange(6, 70, 2)] + \
+            _address('', str(i))[:rand.randrange(0, 8, 2)]
+        read = prefix[:rand.randrange(6, 70, 2)]
+        if rand.random() < 0.05:
+            # an occasional write of a shorter prefix clears the subtree
+            txns.append(([read], [address[:rand.randrange(8, 20, 2)]]))
+        else:
+            txns.append(([read, address], [address]))
+    return txns
+
+
+def _time_schedule(tree_class, txns):
+    tree = tree_class()
+    start = time.time()
+    for index, (inputs, outputs) in enumerate(txns):
+        predecessors = set()
+        for address in inputs:
+            predecessors.update(tree.find_read_predecessors(address))
+        for address in outputs:
+            predecessors.update(tree.find_write_predecessors(address))
+        for address in inputs:
+            tree.add_reader(address, index)
+        for address in outputs:
+            tree.set_writer(address, index)
+    return time.time() - start
+
+
+def main(args=sys.argv[1:]):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes',
+                        nargs='+',
+                        type=int,
+                        default=[1000, 10000],
+                        help='the numbers of transactions to schedule')
+    opts = parser.parse_args(args)
+
+    print('{:>8} {:>8} {:>14} {:>14} {:>8}'.format(
+        'workload', 'txns', 'previous (s)', 'current (s)', 'speedup'))
+    for workload in (wide_workload, deep_workload):
+        for size in opts.sizes:
+            txns = workload(size)
+            previous = _time_schedule(PreviousPredecessorTree, txns)
+            current = _time_schedule(PredecessorTree, txns)
+            print('{:>8} {:>8} {:>14.3f} {:>14.3f} {:>7.1f}x'.format(
+                workload.__name__.split('_')[0], size, previous, current,
+                previous / current))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Benchmarks verifying the signatures of gossiped batches, then of the
+block containing them, with validate_batch and validate_block, against a
+SignatureVerifier verifying on a process pool.
+
+Run from the validator directory:
+
+    python3 tests/benchmarks/bench_signature_verifier.py --batches 10 100
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import sys
+import time
+
+import sawtooth_signing as signing
+
+from sawtooth_validator.gossip.signature_verifier import SignatureVerifier
+from sawtooth_validator.gossip.signature_verifier import validate_batch
+from sawtooth_validator.gossip.signature_verifier import validate_block
+from sawtooth_validator.protobuf.batch_pb2 import Batch
+from sawtooth_validator.protobuf.batch_pb2 import BatchHeader
+from sawtooth_validator.protobuf.block_pb2 import Block
+from sawtooth_validator.protobuf.block_pb2 import BlockHeader
+from sawtooth_validator.protobuf.transaction_pb2 import Transaction
+from sawtooth_validator.protobuf.transaction_pb2 import TransactionHeader
+
+
+def _make_block(batch_count, txn_count, private_key, public_key):
+    batches = []
+    for i in range(batch_count):
+        txns = []
+        for j in range(txn_count):
+            header = TransactionHeader(
+                signer_pubkey=public_key,
+                batcher_pubkey=public_key,
+                family_name='intkey',
+                family_version='1.0',
+                nonce='{}-{}'.format(i, j)).SerializeToString()
+            txns.append(Transaction(
+                header=header,
+                header_signature=signing.sign(header, private_key)))
+        header = BatchHeader(
+            signer_pubkey=public_key,
+            transaction_ids=[t.header_signature for t in txns]
+        ).SerializeToString()
+        batches.append(Batch(
+            header=header,
+            header_signature=signing.sign(header, private_key),
+            transactions=txns))
+
+    header = BlockHeader(
+        signer_pubkey=public_key,
+        batch_ids=[b.header_signature for b in batches]).SerializeToString()
+    return Block(header=header,
+                 header_signature=signing.sign(header, private_key),
+                 batches=batches)
+
+
+def _time_gossip(block, verify_batch, verify_block):
+    start = time.time()
+    for batch in block.batches:
+        if not verify_batch(batch):
+            raise AssertionError('Batch is invalid')
+    batches_time = time.time() - start
+
+    start = time.time()
+    if not verify_block(block):
+        raise AssertionError('Block is invalid')
+    return batches_time, time.time() - start
+
+
+def main(args=sys.argv[1:]):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batches',
+                        nargs='+',
+                        type=int,
+                        default=[10, 100])
+    parser.add_argument('--transactions', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=3)
+    opts = parser.parse_args(args)
+
+    private_key = signing.generate_privkey()
+    public_key = signing.generate_pubkey(private_key)
+
+    print('{:>8} {:>12} {:>12} {:>12} {:>12}'.format(
+        'batches', 'batches(s)', 'block(s)',
+        'pool bat(s)', 'pool blk(s)'))
+    with ProcessPoolExecutor(max_workers=opts.workers) as executor:
+        for batch_count in opts.batches:
+            block = _make_block(
+                batch_count, opts.transactions, private_key, public_key)
+            old_times = _time_gossip(block, validate_batch, validate_block)
+
+            verifier = SignatureVerifier(executor)
+            new_times = _time_gossip(
+                block,
+                lambda batch: verifier.verify_batches([batch]),
+                verifier.verify_block)
+            print('{:>8} {:>12.3f} {:>12.3f} {:>12.3f} {:>12.3f}'.format(
+                batch_count, *(old_times + new_times)))
+
+
+if __name__ == '__main__':
+    main()
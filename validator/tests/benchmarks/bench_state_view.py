@@ -0,0 +1,104 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Benchmarks StateViewFactory.create_view against the previous
+implementation, which built a writable MerkleDatabase at the empty root,
+storing the empty root node, before switching to the requested root.
+
+Run from the validator directory:
+
+    python3 tests/benchmarks/bench_state_view.py --views 1000 10000
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from sawtooth_validator.database.lmdb_nolock_database import \
+    LMDBNoLockDatabase
+from sawtooth_validator.state.merkle import EMPTY_ROOT_HASH
+from sawtooth_validator.state.merkle import MerkleDatabase
+from sawtooth_validator.state.merkle import NODE_PROTO
+from sawtooth_validator.state.state_view import StateView
+from sawtooth_validator.state.state_view import StateViewFactory
+
+
+def writing_create_view(database, state_root_hash):
+    """The view creation prior to the read-only implementation.
+    """
+    merkle_db = MerkleDatabase(database)
+    # the empty root was stored, and synced, on every construction
+    merkle_db._set_kv(NODE_PROTO)
+    merkle_db.set_merkle_root(state_root_hash)
+    return StateView(merkle_db)
+
+
+def _time_views(create_view, root, count):
+    start = time.time()
+    for _ in range(count):
+        view = create_view(root)
+    elapsed = time.time() - start
+
+    if view.merkle_root != root:
+        raise AssertionError('View at {} != {}'.format(
+            view.merkle_root, root))
+    return elapsed
+
+
+def main(args=sys.argv[1:]):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--views',
+                        nargs='+',
+                        type=int,
+                        default=[1000, 10000])
+    opts = parser.parse_args(args)
+
+    data_dir = tempfile.mkdtemp()
+    try:
+        database = LMDBNoLockDatabase(
+            os.path.join(data_dir, 'merkle.lmdb'), 'n')
+        tree = MerkleDatabase(database)
+        root = tree.update(
+            {MerkleDatabase.hash('{}'.format(i).encode()) + '000000':
+             '{}'.format(i).encode()
+             for i in range(1000)},
+            virtual=False)
+
+        factory = StateViewFactory(database)
+        print('{:>8} {:>12} {:>12} {:>8}'.format(
+            'views', 'writing(s)', 'read-only(s)', 'speedup'))
+        for count in opts.views:
+            old_time = _time_views(
+                lambda root: writing_create_view(database, root),
+                root, count)
+            new_time = _time_views(
+                factory.create_view, root, count)
+            print('{:>8} {:>12.3f} {:>12.3f} {:>7.1f}x'.format(
+                count, old_time, new_time, old_time / new_time))
+
+        # views of the empty tree must not need the empty root stored
+        if factory.create_view().merkle_root != EMPTY_ROOT_HASH:
+            raise AssertionError('Empty view is not at the empty root')
+
+        database.close()
+    finally:
+        shutil.rmtree(data_dir)
+
+
+if __name__ == '__main__':
+    main()
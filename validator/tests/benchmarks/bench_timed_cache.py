@@ -0,0 +1,90 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Benchmarks TimedCache.purge_expired, with a few entries expired, against
+the previous implementation, which rebuilt the cache's dict of entries on
+every purge.
+
+Run from the validator directory:
+
+    python3 tests/benchmarks/bench_timed_cache.py --entries 10000 100000
+"""
+
+import argparse
+import sys
+import time
+
+from sawtooth_validator.journal.timed_cache import TimedCache
+
+
+def rebuilding_purge_expired(cache):
+    """The purge prior to the ordered implementation.
+    """
+    # pylint: disable=protected-access
+    with cache._lock:
+        time_horizon = time.time() - cache.keep_time
+        new_cache = {}
+        for (k, v) in cache._cache.items():
+            if v.timestamp > time_horizon:
+                new_cache[k] = v
+        cache._cache = new_cache
+
+
+def _make_cache(entries, expired):
+    cache = TimedCache(keep_time=60)
+    for i in range(entries):
+        cache[str(i)] = i
+    for i in range(expired):
+        cache.cache[str(i)].timestamp -= 120
+    return cache
+
+
+def _time_purges(purge, entries, expired, purges):
+    elapsed = 0
+    for _ in range(purges):
+        cache = _make_cache(entries, expired)
+        start = time.time()
+        purge(cache)
+        elapsed += time.time() - start
+        if len(cache) != entries - expired:
+            raise AssertionError('{} entries left, expected {}'.format(
+                len(cache), entries - expired))
+    return elapsed / purges
+
+
+def main(args=sys.argv[1:]):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--entries',
+                        nargs='+',
+                        type=int,
+                        default=[10000, 100000])
+    parser.add_argument('--expired', type=int, default=100)
+    parser.add_argument('--purges', type=int, default=10)
+    opts = parser.parse_args(args)
+
+    print('{:>8} {:>8} {:>14} {:>12} {:>8}'.format(
+        'entries', 'expired', 'rebuilding(s)', 'ordered(s)', 'speedup'))
+    for entries in opts.entries:
+        old_time = _time_purges(
+            rebuilding_purge_expired, entries, opts.expired, opts.purges)
+        new_time = _time_purges(
+            TimedCache.purge_expired, entries, opts.expired, opts.purges)
+        print('{:>8} {:>8} {:>14.6f} {:>12.6f} {:>7.1f}x'.format(
+            entries, opts.expired, old_time, new_time,
+            old_time / new_time))
+
+
+if __name__ == '__main__':
+    main()
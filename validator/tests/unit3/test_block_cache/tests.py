@@ -0,0 +1,124 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import unittest
+
+from sawtooth_validator.database.dict_database import DictDatabase
+from sawtooth_validator.journal.block_cache import BlockCache
+from sawtooth_validator.journal.block_store import BlockStore
+from sawtooth_validator.journal.block_wrapper import BlockWrapper
+from sawtooth_validator.protobuf.batch_pb2 import Batch
+from sawtooth_validator.protobuf.block_pb2 import Block
+from sawtooth_validator.protobuf.block_pb2 import BlockHeader
+from sawtooth_validator.protobuf.transaction_pb2 import Transaction
+
+
+def _make_block(block_id, block_num):
+    batches = [Batch(header_signature='{}-b{}'.format(block_id, i),
+                     transactions=[Transaction(payload=b'p' * 1000)])
+               for i in range(2)]
+    header = BlockHeader(block_num=block_num,
+                         previous_block_id='B-{}'.format(block_num - 1))
+    return BlockWrapper(Block(header=header.SerializeToString(),
+                              header_signature=block_id,
+                              batches=batches))
+
+
+class TestBlockCache(unittest.TestCase):
+    def setUp(self):
+        self.block_store = BlockStore(DictDatabase())
+        self.chain = [_make_block('B-{}'.format(i), i) for i in range(3)]
+        for block in self.chain:
+            self.block_store.update_chain([block])
+        self.block_size = max(block.block.ByteSize() for block in self.chain)
+
+    def test_release_committed_batches(self):
+        """Tests that, over its budget, the cache releases the batches of
+        the least recently used committed blocks, keeping their headers,
+        and reloads them when accessed.
+        """
+        cache = BlockCache(self.block_store, keep_time=300,
+                           max_bytes=2 * self.block_size)
+        for block in self.chain:
+            cache[block.identifier] = block
+
+        self.assertTrue(self.chain[0].batches_released)
+        self.assertFalse(self.chain[2].batches_released)
+        self.assertEqual(1, cache.released_count)
+        self.assertEqual(3, len(cache))
+
+        released = cache['B-0']
+        self.assertEqual(0, released.block_num)
+        self.assertEqual('B-0', released.identifier)
+        self.assertTrue(released.batches_released)
+
+        self.assertEqual(2, len(released.batches))
+        self.assertFalse(released.batches_released)
+
+        # reloading B-0 made it the most recently used, and the cache is
+        # over its budget again on the next change
+        cache.purge_expired()
+        self.assertTrue(self.chain[1].batches_released)
+        self.assertFalse(self.chain[0].batches_released)
+
+    def test_evict_uncommitted_and_pin(self):
+        """Tests that blocks not in the store are evicted once the batches
+        of committed blocks are released, and that pinned blocks are
+        neither evicted nor expired.
+        """
+        cache = BlockCache(self.block_store, keep_time=300,
+                           max_bytes=2 * self.block_size)
+        forks = [_make_block('F-{}'.format(i), i) for i in range(1, 4)]
+        cache['B-0'] = self.chain[0]
+        cache.pin('F-1')
+        for block in forks:
+            cache[block.identifier] = block
+
+        self.assertTrue(self.chain[0].batches_released)
+        self.assertIn('F-1', cache)
+        self.assertNotIn('F-2', cache)
+        self.assertIn('F-3', cache)
+        self.assertEqual(1, cache.evicted_count)
+
+        for block_id in ('B-0', 'F-1', 'F-3'):
+            cache.cache[block_id].timestamp -= 600
+        cache.purge_expired()
+        self.assertIn('F-1', cache)
+        self.assertNotIn('F-3', cache)
+
+        cache.unpin('F-1')
+        cache.cache['F-1'].timestamp -= 600
+        cache.purge_expired()
+        self.assertNotIn('F-1', cache)
+
+    def test_removed_blocks_leave_budget(self):
+        """Tests that blocks deleted or expired from the cache no longer
+        count against its budget.
+        """
+        cache = BlockCache(self.block_store, keep_time=300,
+                           max_bytes=2 * self.block_size)
+        cache['B-0'] = self.chain[0]
+        cache['B-1'] = self.chain[1]
+        del cache['B-0']
+
+        cache.cache['B-1'].timestamp -= 600
+        cache.purge_expired()
+        self.assertNotIn('B-1', cache.cache)
+
+        cache['B-2'] = self.chain[2]
+        cache['B-0'] = self.chain[0]
+        self.assertEqual(0, cache.released_count)
+        self.assertFalse(self.chain[0].batches_released)
+        self.assertFalse(self.chain[2].batches_released)
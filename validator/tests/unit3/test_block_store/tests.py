@@ -0,0 +1,244 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import unittest
+from unittest import mock
+
+from sawtooth_validator.database.dict_database import DictDatabase
+from sawtooth_validator.journal.block_store import BlockStore
+from sawtooth_validator.journal.block_store import STORED_KEYS_KEY
+from sawtooth_validator.journal.block_wrapper import BlockWrapper
+from sawtooth_validator.protobuf.batch_pb2 import Batch
+from sawtooth_validator.protobuf.batch_pb2 import BatchHeader
+from sawtooth_validator.protobuf.block_pb2 import Block
+from sawtooth_validator.protobuf.block_pb2 import BlockHeader
+from sawtooth_validator.protobuf.transaction_pb2 import Transaction
+
+
+def _make_block(block_id, block_num, batch_count=2, txn_count=2):
+    batches = []
+    for i in range(batch_count):
+        batch_id = '{}-b{}'.format(block_id, i)
+        txns = [Transaction(header_signature='{}-t{}'.format(batch_id, j))
+                for j in range(txn_count)]
+        header = BatchHeader(
+            signer_pubkey='pubkey',
+            transaction_ids=[txn.header_signature for txn in txns])
+        batches.append(Batch(header=header.SerializeToString(),
+                             header_signature=batch_id,
+                             transactions=txns))
+
+    header = BlockHeader(
+        block_num=block_num,
+        previous_block_id='B-{}'.format(block_num - 1),
+        signer_pubkey='pubkey',
+        batch_ids=[batch.header_signature for batch in batches])
+    return BlockWrapper(Block(header=header.SerializeToString(),
+                              header_signature=block_id,
+                              batches=batches))
+
+
+class TestBlockStore(unittest.TestCase):
+    def setUp(self):
+        self.database = DictDatabase()
+        self.block_store = BlockStore(self.database)
+        self.chain = [_make_block('B-{}'.format(i), i) for i in range(3)]
+        for block in self.chain:
+            self.block_store.update_chain([block])
+
+    def test_get_block_by_number(self):
+        """Tests that blocks of the chain are found by number, and that the
+        numbers of a replaced fork refer to the blocks of the new fork.
+        """
+        for i in range(3):
+            self.assertEqual(
+                'B-{}'.format(i),
+                self.block_store.get_block_by_number(i).identifier)
+        with self.assertRaises(KeyError):
+            self.block_store.get_block_by_number(3)
+
+        fork = [_make_block('F-2', 2), _make_block('F-1', 1)]
+        self.block_store.update_chain(fork, self.chain[:0:-1])
+
+        self.assertEqual(
+            'F-1', self.block_store.get_block_by_number(1).identifier)
+        self.assertEqual(
+            'F-2', self.block_store.get_block_by_number(2).identifier)
+        self.assertEqual(
+            'B-0', self.block_store.get_block_by_number(0).identifier)
+        self.assertFalse(self.block_store.has_batch('B-2-b0'))
+
+    def test_get_chain_counts(self):
+        """Tests that the counts of batches and transactions in the chain up
+        to each block are recorded, and follow a replaced fork.
+        """
+        self.assertEqual((2, 4), self.block_store.get_chain_counts(0))
+        self.assertEqual((6, 12), self.block_store.get_chain_counts(2))
+
+        fork = [_make_block('F-2', 2, batch_count=1, txn_count=3),
+                _make_block('F-1', 1, batch_count=0)]
+        self.block_store.update_chain(fork, self.chain[:0:-1])
+        self.assertEqual((2, 4), self.block_store.get_chain_counts(1))
+        self.assertEqual((3, 7), self.block_store.get_chain_counts(2))
+        with self.assertRaises(KeyError):
+            self.block_store.get_chain_counts(3)
+
+    def test_get_batches_and_transactions_by_position(self):
+        """Tests that batches and transactions are found at their positions
+        in their blocks.
+        """
+        self.assertEqual(
+            'B-1-b1', self.block_store.get_batch('B-1-b1').header_signature)
+        self.assertEqual(
+            'B-1-b1-t1',
+            self.block_store.get_transaction('B-1-b1-t1').header_signature)
+        self.assertEqual(
+            'B-2-b0',
+            self.block_store.get_batch_by_transaction(
+                'B-2-b0-t1').header_signature)
+        self.assertEqual(
+            'B-2',
+            self.block_store.get_block_by_transaction_id(
+                'B-2-b1-t0').identifier)
+
+        with self.assertRaises(ValueError):
+            self.block_store.get_batch('B-3-b0')
+        with self.assertRaises(ValueError):
+            self.block_store.get_transaction('B-3-b0-t0')
+
+    def test_ids_stored_without_positions(self):
+        """Tests that batch and transaction ids which reference only their
+        block, as stored before positions were, are still found.
+        """
+        self.database.set_batch_raw([('B-1-b1', b'B-1'),
+                                     ('B-1-b1-t1', b'B-1')])
+
+        self.assertEqual(
+            'B-1-b1', self.block_store.get_batch('B-1-b1').header_signature)
+        self.assertEqual(
+            'B-1-b1-t1',
+            self.block_store.get_transaction('B-1-b1-t1').header_signature)
+
+    def test_index_stored_chain(self):
+        """Tests that a chain stored before blocks were indexed by number is
+        indexed, with its counts and positions, when a block store is built
+        on it, and that a partially indexed chain is indexed from the last
+        block indexed with its counts.
+        """
+        database = DictDatabase()
+        chain = [_make_block('B-{}'.format(i), i) for i in range(5)]
+        for block in chain:
+            add_pairs = [(block.identifier, block.block.SerializeToString())]
+            for batch in block.batches:
+                add_pairs.append(
+                    (batch.header_signature, block.identifier.encode()))
+                for txn in batch.transactions:
+                    add_pairs.append(
+                        (txn.header_signature, block.identifier.encode()))
+            database.set_batch_raw(add_pairs)
+        database.set_batch_raw([('chain_head_id', b'B-4')])
+
+        with mock.patch(
+                'sawtooth_validator.journal.block_store._INDEX_CHUNK_SIZE',
+                2):
+            block_store = BlockStore(database)
+
+        for i in range(5):
+            self.assertEqual(
+                'B-{}'.format(i),
+                block_store.get_block_by_number(i).identifier)
+        self.assertEqual((6, 12), block_store.get_chain_counts(2))
+        self.assertEqual((10, 20), block_store.get_chain_counts(4))
+        self.assertEqual(b'B-3 1', database.get_raw('B-3-b1'))
+        self.assertEqual(b'B-3 1 0', database.get_raw('B-3-b1-t0'))
+
+        # blocks appended without counts are indexed from the last block
+        # indexed with them
+        database.set_batch_raw([('block_num_3', b'B-3'),
+                                ('block_num_4', b'B-4')])
+        database.delete('block_num_0')
+        block_store = BlockStore(database)
+        self.assertEqual((10, 20), block_store.get_chain_counts(4))
+        self.assertIsNone(database.get_raw('block_num_0'))
+
+    def test_stored_keys_filter(self):
+        """Tests that ids are looked up in the store only if they may have
+        been stored, and that a block store built on a database which
+        already holds blocks finds them.
+        """
+        self.assertTrue(self.block_store.has_batch('B-1-b0'))
+        self.assertTrue(self.block_store.has_transaction('B-1-b0-t1'))
+        self.assertFalse(self.block_store.has_transaction('B-3-b0-t0'))
+
+        # keys written to the database directly are not known to the
+        # filter of a block store built before they were
+        self.database.set_batch_raw([('unfiltered', b'B-1')])
+        self.assertFalse(self.block_store.has_transaction('unfiltered'))
+        with self.assertRaises(KeyError):
+            self.block_store['unfiltered']
+
+        block_store = BlockStore(self.database)
+        self.assertTrue(block_store.has_transaction('unfiltered'))
+        self.assertTrue(block_store.has_transaction('B-2-b1-t1'))
+        self.assertEqual('B-2', block_store.chain_head.identifier)
+
+    def test_persisted_stored_keys_filter(self):
+        """Tests that a block store loads the filter persisted by the last
+        one built on its database, rather than the keys of the database,
+        unless the store was written to since the filter was persisted.
+        """
+        self.block_store.persist_stored_keys()
+        self.database.set_batch_raw([('unfiltered', b'B-1')])
+
+        block_store = BlockStore(self.database)
+        self.assertTrue(block_store.has_transaction('B-2-b1-t1'))
+        self.assertFalse(block_store.has_transaction('unfiltered'))
+
+        block_store.update_chain([_make_block('B-3', 3)])
+        self.assertIsNone(self.database.get_raw(STORED_KEYS_KEY))
+
+        block_store = BlockStore(self.database)
+        self.assertTrue(block_store.has_transaction('unfiltered'))
+        self.assertTrue(block_store.has_transaction('B-3-b1-t1'))
+
+        self.database.set_batch_raw([(STORED_KEYS_KEY, b'malformed')])
+        block_store = BlockStore(self.database)
+        self.assertTrue(block_store.has_transaction('B-3-b1-t1'))
+
+    def test_wait_for_batch_commits(self):
+        """Tests that waiting for batches to commit resolves once all of them
+        are committed, without a thread per waiter, and resolves to False if
+        the timeout is exceeded first.
+        """
+        committed = self.block_store.wait_for_batch_commits_async(
+            ['B-1-b0'], timeout=10)
+        self.assertTrue(committed.result(timeout=1))
+
+        waiting = self.block_store.wait_for_batch_commits_async(
+            ['B-3-b0', 'B-4-b1'], timeout=10)
+        next_commit = self.block_store.wait_for_batch_commits_async(
+            timeout=10)
+        timed_out = self.block_store.wait_for_batch_commits_async(
+            ['B-9-b0'], timeout=0.1)
+        self.assertFalse(timed_out.result(timeout=5))
+        self.assertFalse(waiting.done())
+        self.assertFalse(next_commit.done())
+
+        self.block_store.update_chain([_make_block('B-3', 3)])
+        self.assertTrue(next_commit.result(timeout=5))
+        self.assertFalse(waiting.done())
+
+        self.block_store.update_chain([_make_block('B-4', 4)])
+        self.assertTrue(waiting.result(timeout=5))
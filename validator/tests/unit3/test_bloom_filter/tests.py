@@ -0,0 +1,70 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import unittest
+
+from sawtooth_validator.journal.bloom_filter import BloomFilter
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_contains_added(self):
+        """Tests that the filter contains every string added to it, as it
+        grows past its capacity, and few strings not added.
+        """
+        bloom_filter = BloomFilter(capacity=100, error_rate=0.01)
+        added = ['added-{}'.format(i) for i in range(1000)]
+        bloom_filter.update(added)
+
+        self.assertEqual(1000, len(bloom_filter))
+        for item in added:
+            self.assertIn(item, bloom_filter)
+
+        false_positives = sum(1 for i in range(10000)
+                              if 'other-{}'.format(i) in bloom_filter)
+        self.assertLess(false_positives, 200)
+
+    def test_empty(self):
+        """Tests that an empty filter contains no strings.
+        """
+        bloom_filter = BloomFilter()
+        self.assertEqual(0, len(bloom_filter))
+        self.assertNotIn('', bloom_filter)
+        self.assertNotIn('item', bloom_filter)
+
+    def test_persisted(self):
+        """Tests that a filter loaded from its serialized form contains the
+        strings added to the original, and that malformed data is rejected.
+        """
+        bloom_filter = BloomFilter(capacity=100, error_rate=0.01)
+        added = ['added-{}'.format(i) for i in range(300)]
+        added.append('f' * 128)
+        bloom_filter.update(added)
+
+        data = bloom_filter.to_bytes()
+        loaded = BloomFilter.from_bytes(data)
+        self.assertEqual(len(bloom_filter), len(loaded))
+        for item in added:
+            self.assertIn(item, loaded)
+        others = ['other-{}'.format(i) for i in range(1000)]
+        self.assertEqual([item in bloom_filter for item in others],
+                         [item in loaded for item in others])
+
+        loaded.update(others)
+        self.assertEqual(len(added) + len(others), len(loaded))
+        self.assertIn('other-999', loaded)
+
+        for malformed in (b'', data[:-8], data + b'x', b'\x02' + data[1:]):
+            with self.assertRaises(ValueError):
+                BloomFilter.from_bytes(malformed)
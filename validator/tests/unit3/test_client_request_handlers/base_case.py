@@ -13,6 +13,7 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
+from concurrent.futures import Future
 import unittest
 from sawtooth_validator.protobuf import client_pb2
 
@@ -50,6 +51,9 @@ class ClientHandlerTestCase(unittest.TestCase):
 
     def _handle(self, request):
         result = self._handler.handle(self._identity, request)
+        if isinstance(result, Future):
+            # handlers waiting on an event respond through a future
+            result = result.result()
         return result.message_out
 
     def make_bad_request(self, **kwargs):
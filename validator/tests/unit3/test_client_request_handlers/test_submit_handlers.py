@@ -18,6 +18,7 @@ from time import time, sleep
 
 import sawtooth_validator.state.client_handlers as handlers
 from sawtooth_validator.protobuf import client_pb2
+from sawtooth_validator.protobuf import validator_pb2
 from test_client_request_handlers.base_case import ClientHandlerTestCase
 from test_client_request_handlers.mocks import make_mock_batch
 from test_client_request_handlers.mocks import make_store_and_cache
@@ -55,6 +56,21 @@ class TestBatchSubmitFinisher(ClientHandlerTestCase):
 
         self.assertEqual(self.status.INTERNAL_ERROR, response.status)
 
+    def test_batch_submit_busy(self):
+        """Verifies finisher replies that the validator is busy to requests
+        the dispatcher rejects.
+
+        Expects to find:
+            - a response status of BUSY
+        """
+        result = self._handler.busy_result(
+            self._identity, self._serialize(batches=[make_mock_batch('new')]))
+
+        self.assertEqual(self.status.BUSY, result.message_out.status)
+        self.assertEqual(
+            validator_pb2.Message.CLIENT_BATCH_SUBMIT_RESPONSE,
+            result.message_type)
+
     def test_batch_submit_with_wait(self):
         """Verifies finisher works properly when waiting for commit.
 
@@ -18,6 +18,7 @@ import hashlib
 import cbor
 
 import sawtooth_signing as signing
+from sawtooth_validator.database.dict_database import DictDatabase
 from sawtooth_validator.journal.completer import Completer
 from sawtooth_validator.journal.block_store import BlockStore
 from sawtooth_validator.journal.block_wrapper import NULL_BLOCK_IDENTIFIER
@@ -30,7 +31,7 @@ from test_completer.mock import MockGossip
 
 class TestCompleter(unittest.TestCase):
     def setUp(self):
-        self.block_store = BlockStore({})
+        self.block_store = BlockStore(DictDatabase())
         self.gossip = MockGossip()
         self.completer = Completer(self.block_store, self.gossip)
         self.completer._on_block_received = self._on_block_received
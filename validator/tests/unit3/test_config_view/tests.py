@@ -15,11 +15,14 @@
 
 import hashlib
 import unittest
+from unittest.mock import patch
 
 from sawtooth_validator.database.dict_database import DictDatabase
 from sawtooth_validator.protobuf.setting_pb2 import Setting
 
+from sawtooth_validator.state.config_view import ConfigView
 from sawtooth_validator.state.config_view import ConfigViewFactory
+from sawtooth_validator.state.config_view import SettingsCache
 from sawtooth_validator.state.state_view import StateViewFactory
 
 from sawtooth_validator.state.merkle import MerkleDatabase
@@ -29,11 +32,13 @@ class TestConfigView(unittest.TestCase):
     def __init__(self, test_name):
         super().__init__(test_name)
         self._config_view_factory = None
+        self._state_view_factory = None
         self._current_root_hash = None
 
     def setUp(self):
         database = DictDatabase()
         state_view_factory = StateViewFactory(database)
+        self._state_view_factory = state_view_factory
         self._config_view_factory = ConfigViewFactory(state_view_factory)
 
         merkle_db = MerkleDatabase(database)
@@ -146,6 +151,54 @@ class TestConfigView(unittest.TestCase):
             [10, 11, 12],
             config_view.get_setting_list('my.setting.list', value_type=int))
 
+    def test_settings_cached_by_state_root(self):
+        """Verifies that a setting, or its absence, read at a state root is
+        cached, for each value type, so that reading it again through
+        another ConfigView at the same state root does not read the state.
+        """
+        settings_cache = SettingsCache()
+
+        state_view = self._state_view_factory.create_view(
+            self._current_root_hash)
+        config_view = ConfigView(state_view, settings_cache=settings_cache)
+        self.assertEqual(10, config_view.get_setting('my.setting',
+                                                     value_type=int))
+        self.assertIsNone(config_view.get_setting('non-existant.setting'))
+
+        state_view = self._state_view_factory.create_view(
+            self._current_root_hash)
+        with patch.object(state_view, 'get', wraps=state_view.get) as get:
+            config_view = ConfigView(state_view,
+                                     settings_cache=settings_cache)
+            self.assertEqual(10, config_view.get_setting('my.setting',
+                                                         value_type=int))
+            self.assertEqual(
+                'default',
+                config_view.get_setting('non-existant.setting',
+                                        default_value='default'))
+            self.assertEqual(0, get.call_count)
+
+            self.assertEqual('10', config_view.get_setting('my.setting'))
+            self.assertEqual(1, get.call_count)
+
+    def test_settings_cache_evicts_least_recently_used(self):
+        """Verifies that the SettingsCache keeps the settings of at most
+        max_state_roots state roots, evicting the least recently used.
+        """
+        settings_cache = SettingsCache(max_state_roots=2)
+        snapshot_a = settings_cache.get_snapshot('a')
+        settings_cache.get_snapshot('b')
+        self.assertIs(snapshot_a, settings_cache.get_snapshot('a'))
+
+        settings_cache.get_snapshot('c')
+        self.assertEqual(2, len(settings_cache))
+        self.assertIs(snapshot_a, settings_cache.get_snapshot('a'))
+        self.assertEqual(2, len(settings_cache))
+
+        # 'b' was evicted, so is a new snapshot, evicting 'c'
+        settings_cache.get_snapshot('b')
+        self.assertIs(snapshot_a, settings_cache.get_snapshot('a'))
+
     @staticmethod
     def _address(key):
         return '000000' + hashlib.sha256(key.encode()).hexdigest()
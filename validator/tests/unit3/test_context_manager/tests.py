@@ -734,6 +734,70 @@ class TestContextManager(unittest.TestCase):
                                          "manager calculated merkle hashes "
                                          "are the same")
 
+    def test_latest_write_wins_across_base_contexts(self):
+        """Tests that when base contexts disagree on an address, the value
+        from the latest write is used, whatever the order of the base
+        contexts, and that contexts sharing a common base can be squashed
+        together.
+
+                     i=a         i=a,b
+                     o=a         o=b
+             i=a  +>ctx_2---+--->ctx_3---+
+             o=a  |  a=2    |    b=3     |
+        sh0-->ctx_1         |            |---->sh1
+              a=1           |    i=a,c   |
+                            +--->ctx_4---+
+                                 o=c
+                                 c=4
+        """
+        squash = self.context_manager.get_squash_handler()
+        sh0 = self.first_state_hash
+        address_a = self._create_address('a')
+        address_b = self._create_address('b')
+        address_c = self._create_address('c')
+
+        ctx_1 = self.context_manager.create_context(
+            state_hash=sh0,
+            base_contexts=[],
+            inputs=[address_a],
+            outputs=[address_a])
+        self.context_manager.set(ctx_1, [{address_a: b'1'}])
+
+        ctx_2 = self.context_manager.create_context(
+            state_hash=sh0,
+            base_contexts=[ctx_1],
+            inputs=[address_a],
+            outputs=[address_a])
+        self.context_manager.set(ctx_2, [{address_a: b'2'}])
+
+        # ctx_1 is listed last, but its write of a is the earlier one
+        ctx_3 = self.context_manager.create_context(
+            state_hash=sh0,
+            base_contexts=[ctx_2, ctx_1],
+            inputs=[address_a, address_b],
+            outputs=[address_b])
+        self.assertEqual(
+            [(address_a, b'2')],
+            self.context_manager.get(ctx_3, [address_a]))
+        self.context_manager.set(ctx_3, [{address_b: b'3'}])
+
+        ctx_4 = self.context_manager.create_context(
+            state_hash=sh0,
+            base_contexts=[ctx_2],
+            inputs=[address_a, address_c],
+            outputs=[address_c])
+        self.context_manager.set(ctx_4, [{address_c: b'4'}])
+
+        sh1 = squash(
+            state_root=sh0,
+            context_ids=[ctx_3, ctx_4],
+            persist=False)
+
+        tree = MerkleDatabase(self.database_results)
+        self.assertEqual(
+            tree.update({address_a: b'2', address_b: b'3', address_c: b'4'}),
+            sh1)
+
     def test_check_for_bad_combination(self):
         """Tests that the context manager will raise
         an exception if asked to combine contexts, either via base contexts 
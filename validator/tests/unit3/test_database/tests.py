@@ -0,0 +1,104 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from sawtooth_validator.database.dict_database import DictDatabase
+from sawtooth_validator.database.lmdb_nolock_database import \
+    LMDBNoLockDatabase
+from sawtooth_validator.database.lmdb_nolock_database import \
+    DURABILITY_GROUP_COMMIT
+
+
+class LMDBNoLockDatabaseTest(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = tempfile.mkdtemp()
+        self._database = LMDBNoLockDatabase(
+            os.path.join(self._temp_dir, 'test.lmdb'), 'n')
+
+    def tearDown(self):
+        self._database.close()
+        shutil.rmtree(self._temp_dir)
+
+    def test_snapshot_isolation(self):
+        """Tests that a snapshot reader sees the database as it was when
+        the reader was opened, regardless of later writes.
+        """
+        self._database.set_batch_raw([('a', b'1')])
+
+        with self._database.snapshot() as reader:
+            self._database.set_batch_raw([('a', b'2'), ('b', b'3')])
+
+            self.assertEqual(reader.get_raw('a'), b'1')
+            self.assertNotIn('b', reader)
+
+        self.assertEqual(self._database.get_raw('a'), b'2')
+
+    def test_snapshot_buffers(self):
+        """Tests that a snapshot opened with buffers returns zero-copy
+        buffers of the raw values.
+        """
+        self._database.set_batch_raw([('a', b'value')])
+
+        with self._database.snapshot(buffers=True) as reader:
+            value = reader.get_raw('a')
+            self.assertIsInstance(value, memoryview)
+            self.assertEqual(bytes(value), b'value')
+
+    def test_scan_prefix(self):
+        """Tests that a scan returns exactly the keys with the prefix, in
+        key order.
+        """
+        self._database.set_batch_raw(
+            [(key, key.encode()) for key in
+             ('aa', 'ab01', 'ab00', 'ab', 'ac', 'b')])
+
+        with self._database.snapshot() as reader:
+            self.assertEqual(
+                [(key, bytes(value)) for key, value in reader.scan('ab')],
+                [('ab', b'ab'), ('ab00', b'ab00'), ('ab01', b'ab01')])
+            self.assertEqual(list(reader.scan('zz')), [])
+
+    def test_group_commit(self):
+        """Tests that writes under group commit are readable immediately,
+        and that the database closes cleanly with writes pending.
+        """
+        database = LMDBNoLockDatabase(
+            os.path.join(self._temp_dir, 'group.lmdb'), 'n',
+            durability=DURABILITY_GROUP_COMMIT,
+            group_commit_interval=10)
+
+        for i in range(10):
+            database.set_batch_raw([(str(i), str(i).encode())])
+
+        self.assertEqual(len(database), 10)
+        database.close()
+
+        with self.assertRaises(ValueError):
+            LMDBNoLockDatabase(
+                os.path.join(self._temp_dir, 'bad.lmdb'), 'n',
+                durability='never')
+
+
+class DictDatabaseTest(unittest.TestCase):
+    def test_scan_prefix(self):
+        """Tests that the default reader scans keys with a prefix in order.
+        """
+        database = DictDatabase({'b': 2, 'ab': 1, 'aa': 0})
+        with database.snapshot() as reader:
+            self.assertEqual(list(reader.scan('a')), [('aa', 0), ('ab', 1)])
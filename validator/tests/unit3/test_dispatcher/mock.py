@@ -13,6 +13,8 @@
 # limitations under the License.
 # ------------------------------------------------------------------------------
 
+from concurrent.futures import Future
+from threading import Event
 from threading import RLock
 import time
 
@@ -46,6 +48,65 @@ class MockHandler2(dispatch.Handler):
             message_type=validator_pb2.Message.DEFAULT)
 
 
+class MockDeferredHandler(dispatch.Handler):
+    """Responds through futures, which are resolved by calling respond.
+    """
+    def __init__(self):
+        self.pending = []
+        self._lock = RLock()
+
+    def handle(self, connection_id, message_content):
+        request = validator_pb2.Message()
+        request.ParseFromString(message_content)
+        future = Future()
+        with self._lock:
+            self.pending.append((future, request.correlation_id))
+        return future
+
+    def respond(self):
+        with self._lock:
+            pending, self.pending = self.pending, []
+        for future, correlation_id in pending:
+            future.set_result(dispatch.HandlerResult(
+                dispatch.HandlerStatus.RETURN,
+                message_out=validator_pb2.Message(
+                    correlation_id=correlation_id),
+                message_type=validator_pb2.Message.DEFAULT))
+
+
+class MockRecordingHandler(dispatch.Handler):
+    """Records the correlation ids of the messages handled, in order, once
+    released, and replies that it is busy to messages rejected.
+    """
+    def __init__(self):
+        self.handled = []
+        self.released = Event()
+
+    def handle(self, connection_id, message_content):
+        self.released.wait()
+        request = validator_pb2.Message()
+        request.ParseFromString(message_content)
+        self.handled.append(request.correlation_id)
+        return dispatch.HandlerResult(
+            dispatch.HandlerStatus.RETURN,
+            message_out=validator_pb2.Message(
+                correlation_id=request.correlation_id),
+            message_type=validator_pb2.Message.DEFAULT)
+
+    def busy_result(self, connection_id, message_content):
+        return dispatch.HandlerResult(
+            dispatch.HandlerStatus.RETURN,
+            message_out=validator_pb2.Message(correlation_id='busy'),
+            message_type=validator_pb2.Message.DEFAULT)
+
+
+class MockUnsheddableHandler(MockRecordingHandler):
+    """Records the messages handled, as MockRecordingHandler does, without
+    a busy reply, so that its messages are never dropped or rejected.
+    """
+    busy_result = dispatch.Handler.busy_result
+
+
 class MockSendMessage(object):
 
     def __init__(self, connections):
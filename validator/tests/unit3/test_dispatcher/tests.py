@@ -14,12 +14,19 @@
 # ------------------------------------------------------------------------------
 
 from concurrent.futures import ThreadPoolExecutor
+import pickle
+import time
 import unittest
 
 from sawtooth_validator.networking import dispatch
+from sawtooth_validator.protobuf import network_pb2
 from sawtooth_validator.protobuf import validator_pb2
+from sawtooth_validator.protobuf.block_pb2 import Block
 
+from test_dispatcher.mock import MockDeferredHandler
+from test_dispatcher.mock import MockRecordingHandler
 from test_dispatcher.mock import MockSendMessage
+from test_dispatcher.mock import MockUnsheddableHandler
 from test_dispatcher.mock import MockHandler1
 from test_dispatcher.mock import MockHandler2
 
@@ -72,3 +79,228 @@ class TestDispatcherIdentityMessageMatch(unittest.TestCase):
 
     def tearDown(self):
         self._dispatcher.stop()
+
+
+class TestDispatcherDeferredResult(unittest.TestCase):
+    def setUp(self):
+        self._connection = "TestConnection"
+        self._dispatcher = dispatch.Dispatcher()
+        self._handler = MockDeferredHandler()
+        self._dispatcher.add_handler(
+            validator_pb2.Message.DEFAULT,
+            self._handler,
+            ThreadPoolExecutor(max_workers=1))
+
+        self._identities = [str(i) for i in range(10)]
+        self._connections = {chr(int(x) + 65): x for x in self._identities}
+        self.mock_send_message = MockSendMessage(self._connections)
+        self._dispatcher.add_send_message(self._connection,
+                                          self.mock_send_message.send_message)
+
+    def test_deferred_results(self):
+        """Tests that handlers returning futures release their worker, so
+        that a single worker takes every message, and that the results are
+        sent once the futures resolve.
+        """
+        self._dispatcher.start()
+        for connection_id, identity in self._connections.items():
+            self._dispatcher.dispatch(
+                self._connection,
+                validator_pb2.Message(
+                    content=validator_pb2.Message(
+                        correlation_id=identity).SerializeToString(),
+                    message_type=validator_pb2.Message.DEFAULT),
+                connection_id)
+
+        for _ in range(50):
+            if len(self._handler.pending) == len(self._identities):
+                break
+            time.sleep(0.1)
+        self.assertEqual(len(self._identities), len(self._handler.pending))
+        self.assertEqual([], self.mock_send_message.message_ids)
+
+        self._handler.respond()
+        self._dispatcher.block_until_complete()
+        self.assertEqual(sorted(self._identities),
+                         sorted(self.mock_send_message.message_ids))
+        self.assertEqual(sorted(self.mock_send_message.message_ids),
+                         sorted(self.mock_send_message.identities))
+
+    def tearDown(self):
+        self._dispatcher.stop()
+
+
+class TestDispatcherQueues(unittest.TestCase):
+    def setUp(self):
+        self._connection = "TestConnection"
+        self._dispatcher = dispatch.Dispatcher(
+            name='Test',
+            max_in_flight=1,
+            queue_policies={
+                dispatch.MessagePriority.HIGH:
+                    (1, dispatch.QueueFullPolicy.DROP_NEWEST),
+                dispatch.MessagePriority.NORMAL:
+                    (1, dispatch.QueueFullPolicy.DROP_OLDEST),
+                dispatch.MessagePriority.LOW:
+                    (1, dispatch.QueueFullPolicy.REJECT),
+            })
+        self._handler = MockRecordingHandler()
+        self._message_types = {
+            dispatch.MessagePriority.HIGH:
+                validator_pb2.Message.GOSSIP_BLOCK_REQUEST,
+            dispatch.MessagePriority.NORMAL: validator_pb2.Message.DEFAULT,
+            dispatch.MessagePriority.LOW:
+                validator_pb2.Message.CLIENT_BATCH_LIST_REQUEST,
+        }
+        thread_pool = ThreadPoolExecutor()
+        for priority, message_type in self._message_types.items():
+            self._dispatcher.add_handler(
+                message_type, self._handler, thread_pool)
+            self._dispatcher.set_priority(message_type, priority)
+
+        self.mock_send_message = MockSendMessage({'A': '0'})
+        self._dispatcher.add_send_message(self._connection,
+                                          self.mock_send_message.send_message)
+
+    def _dispatch(self, correlation_id, priority):
+        self._dispatcher.dispatch(
+            self._connection,
+            validator_pb2.Message(
+                content=validator_pb2.Message(
+                    correlation_id=correlation_id).SerializeToString(),
+                message_type=self._message_types[priority]),
+            'A')
+
+    def test_priority_and_queue_policies(self):
+        """Tests that, while the dispatcher is busy, queued messages are
+        handled highest priority first, and that messages arriving to full
+        queues are dropped or rejected according to the queues' policies.
+        """
+        self._dispatcher.start()
+        self._dispatch('first', dispatch.MessagePriority.NORMAL)
+        for _ in range(50):
+            if self._dispatcher.get_metrics()[0].dispatched == 1:
+                break
+            time.sleep(0.1)
+
+        for priority in [dispatch.MessagePriority.LOW,
+                         dispatch.MessagePriority.NORMAL,
+                         dispatch.MessagePriority.HIGH]:
+            for i in range(2):
+                self._dispatch('{}-{}'.format(priority.name, i), priority)
+
+        # the rejected low priority message is replied to at once
+        self.assertEqual(['busy'], self.mock_send_message.message_ids)
+
+        self._handler.released.set()
+        self._dispatcher.block_until_complete()
+        self.assertEqual(['first', 'HIGH-0', 'NORMAL-1', 'LOW-0'],
+                         self._handler.handled)
+
+        metrics = {
+            (m.message_type, m.priority): m
+            for m in self._dispatcher.get_metrics()}
+        high = metrics[('GOSSIP_BLOCK_REQUEST', 'HIGH')]
+        self.assertEqual((1, 1, 0), (high.dispatched, high.dropped,
+                                     high.rejected))
+        normal = metrics[('DEFAULT', 'NORMAL')]
+        self.assertEqual((2, 1, 0), (normal.dispatched, normal.dropped,
+                                     normal.rejected))
+        low = metrics[('CLIENT_BATCH_LIST_REQUEST', 'LOW')]
+        self.assertEqual((1, 0, 1), (low.dispatched, low.dropped,
+                                     low.rejected))
+        self.assertEqual(0, low.queue_depth)
+        self.assertGreater(low.average_wait_time, 0)
+
+    def test_unsheddable_messages_queued(self):
+        """Tests that messages without a busy reply are queued past the
+        size of a full queue, rather than dropped or rejected, and that
+        dropping the oldest message drops the oldest which may be dropped.
+        """
+        handler = MockUnsheddableHandler()
+        handler.released = self._handler.released
+        handler.handled = self._handler.handled
+        self._dispatcher.add_handler(
+            validator_pb2.Message.NETWORK_PING, handler, ThreadPoolExecutor())
+
+        self._dispatcher.start()
+        self._dispatch('first', dispatch.MessagePriority.NORMAL)
+        for _ in range(50):
+            if self._dispatcher.get_metrics()[0].dispatched == 1:
+                break
+            time.sleep(0.1)
+
+        self._dispatch('NORMAL-0', dispatch.MessagePriority.NORMAL)
+        for i in range(2):
+            self._dispatcher.dispatch(
+                self._connection,
+                validator_pb2.Message(
+                    content=validator_pb2.Message(
+                        correlation_id='PING-{}'.format(i)
+                    ).SerializeToString(),
+                    message_type=validator_pb2.Message.NETWORK_PING),
+                'A')
+        self._dispatch('NORMAL-1', dispatch.MessagePriority.NORMAL)
+
+        self._handler.released.set()
+        self._dispatcher.block_until_complete()
+        self.assertEqual(['first', 'PING-0', 'PING-1', 'NORMAL-1'],
+                         self._handler.handled)
+
+        metrics = {
+            m.message_type: m for m in self._dispatcher.get_metrics()}
+        self.assertEqual((2, 0), (metrics['NETWORK_PING'].dispatched,
+                                  metrics['NETWORK_PING'].dropped))
+        self.assertEqual((2, 1), (metrics['DEFAULT'].dispatched,
+                                  metrics['DEFAULT'].dropped))
+
+    def tearDown(self):
+        self._dispatcher.stop()
+
+
+class TestMessageContent(unittest.TestCase):
+    def setUp(self):
+        self._block = Block(header_signature='abcd')
+        self._content = network_pb2.GossipMessage(
+            content_type='BLOCK',
+            content=self._block.SerializeToString()).SerializeToString()
+
+    def test_decoding_shared(self):
+        """Tests that a MessageContent is decoded once for each protobuf
+        class, and that plain content bytes are decoded on each call.
+        """
+        content = dispatch.MessageContent(self._content)
+        self.assertEqual(self._content, content)
+        # the content is still bytes, decoding to text as bytes do
+        self.assertEqual(
+            self._content.decode('latin-1'), content.decode('latin-1'))
+
+        block = dispatch.decode_embedded_message(
+            content, network_pb2.GossipMessage, Block)
+        self.assertEqual(self._block, block)
+        self.assertIs(block, dispatch.decode_embedded_message(
+            content, network_pb2.GossipMessage, Block))
+        self.assertIs(
+            dispatch.decode_message(content, network_pb2.GossipMessage),
+            dispatch.decode_message(content, network_pb2.GossipMessage))
+
+        block = dispatch.decode_embedded_message(
+            self._content, network_pb2.GossipMessage, Block)
+        self.assertEqual(self._block, block)
+        self.assertIsNot(block, dispatch.decode_embedded_message(
+            self._content, network_pb2.GossipMessage, Block))
+
+    def test_pickle(self):
+        """Tests that a MessageContent can be sent to a process pool, without
+        its decodings.
+        """
+        content = dispatch.MessageContent(self._content)
+        dispatch.decode_message(content, network_pb2.GossipMessage)
+
+        unpickled = pickle.loads(pickle.dumps(content))
+        self.assertIsInstance(unpickled, dispatch.MessageContent)
+        self.assertEqual(self._content, unpickled)
+        self.assertEqual(
+            self._block,
+            dispatch.decode_embedded_message(
+                unpickled, network_pb2.GossipMessage, Block))
@@ -22,6 +22,7 @@ from unittest.mock import patch
 
 import sawtooth_signing as signing
 from sawtooth_validator.database.dict_database import DictDatabase
+from sawtooth_validator.protobuf.block_pb2 import Block
 from sawtooth_validator.protobuf.genesis_pb2 import GenesisData
 from sawtooth_validator.journal.block_store import BlockStore
 from sawtooth_validator.journal.chain_id_manager import ChainIdManager
@@ -67,7 +68,7 @@ class TestGenesisController(unittest.TestCase):
 
     def test_does_not_require_genesis_block_exists(self):
         block_store = self.make_block_store({
-            'chain_head_id': 'some_other_id'
+            'chain_head_id': b'some_other_id'
         })
 
         genesis_ctrl = GenesisController(
@@ -138,8 +139,9 @@ class TestGenesisController(unittest.TestCase):
         self._with_empty_batch_file()
 
         block_store = self.make_block_store({
-            'chain_head_id': 'some_other_id',
-            'some_other_id': b''
+            'chain_head_id': b'some_other_id',
+            'some_other_id': Block(
+                header_signature='some_other_id').SerializeToString()
         })
 
         genesis_ctrl = GenesisController(
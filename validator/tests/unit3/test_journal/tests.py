@@ -25,11 +25,23 @@ from sawtooth_validator.journal.block_wrapper import BlockWrapper
 
 from sawtooth_validator.journal.chain import BlockValidator
 from sawtooth_validator.journal.chain import ChainController
+from sawtooth_validator.journal.execution_result_cache import \
+    BlockExecutionResult
+from sawtooth_validator.journal.execution_result_cache import \
+    ExecutionResultCache
+from sawtooth_validator.journal.execution_result_cache import SquashRecorder
+from sawtooth_validator.journal.journal import BatchSubmitAdmissionHandler
 from sawtooth_validator.journal.journal import Journal
+from sawtooth_validator.journal.journal import PendingBatchMetrics
+from sawtooth_validator.journal.pending_batch_pool import PendingBatchPool
 from sawtooth_validator.journal.publisher import BlockPublisher
 from sawtooth_validator.journal.timed_cache import TimedCache
 
+from sawtooth_validator.networking.dispatch import HandlerStatus
+
 from sawtooth_validator.protobuf.batch_pb2 import Batch
+from sawtooth_validator.protobuf.client_pb2 import ClientBatchSubmitRequest
+from sawtooth_validator.protobuf.client_pb2 import ClientBatchSubmitResponse
 
 from sawtooth_validator.state.state_view import StateViewFactory
 from sawtooth_validator.state.config_view import ConfigView
@@ -196,6 +208,83 @@ class TestBlockPublisher(unittest.TestCase):
 
         self.verify_block(new_batches)
 
+    def test_average_batches_per_block(self):
+        '''
+        Test that the publisher averages the number of batches in the
+        blocks the chain head is updated to, and counts its pending batches.
+        '''
+        self.assertIsNone(self.publisher.average_batches_per_block)
+
+        self.receive_batches()
+        self.assertEqual(self.publisher.pending_batch_count, self.batch_count)
+
+        self.publish_block()
+        block = BlockWrapper(self.result_block)
+        self.update_chain_head(head=block, committed=self.batches)
+
+        self.assertEqual(self.publisher.pending_batch_count, 0)
+        self.assertEqual(
+            self.publisher.average_batches_per_block, self.batch_count)
+
+        self.update_chain_head(head=self.init_chain_head)
+        self.assertEqual(
+            self.publisher.average_batches_per_block,
+            (self.batch_count + len(self.init_chain_head.header.batch_ids))
+            / 2)
+
+    def test_dependency_received_later(self):
+        '''
+        Test that a batch received before the batch it depends on, from
+        another signer, is published in the same block
+        '''
+        dependency = self.make_batch()
+        other_signer = BlockTreeManager(with_genesis=False)
+        dependent = other_signer.generate_batch(
+            txns=[other_signer.generate_transaction(
+                deps=[dependency.transactions[0].header_signature])])
+
+        self.receive_batches([dependent, dependency])
+
+        self.publish_block()
+
+        self.verify_block([dependency, dependent])
+
+    def test_execution_result_cached(self):
+        '''
+        Test that the result of executing the batches of a published block
+        is cached, keyed by the state root they were executed against
+        '''
+        def squash(state_root, context_ids, persist):
+            return '0000000000'
+
+        cache = ExecutionResultCache()
+        self.publisher = BlockPublisher(
+            transaction_executor=_MockSquashingTransactionExecutor(),
+            block_cache=self.block_tree_manager.block_cache,
+            state_view_factory=self.state_view_factory,
+            block_sender=self.block_sender,
+            batch_sender=self.batch_sender,
+            squash_handler=squash,
+            chain_head=self.block_tree_manager.chain_head,
+            identity_signing_key=self.block_tree_manager.identity_signing_key,
+            data_dir=None,
+            execution_result_cache=cache)
+
+        self.receive_batches()
+
+        self.publish_block()
+
+        block = BlockWrapper(self.result_block)
+        self.verify_block()
+
+        self.assertEqual(
+            BlockExecutionResult(
+                state_hash='0000000000',
+                squash_state_root=self.init_chain_head.state_root_hash,
+                squash_context_ids=['context_id']),
+            cache.pop(self.init_chain_head.state_root_hash,
+                      block.header.batch_ids))
+
     def test_uncommitted_batches(self):
         '''
         Test that batches uncommitted upon updating the chain head
@@ -405,6 +494,15 @@ class TestBlockPublisher(unittest.TestCase):
         return [self.block_tree_manager.generate_batch(txns=txns)]
 
 
+class _MockSquashingTransactionExecutor(MockTransactionExecutor):
+    """Squashes a context to the state hash of the mock scheduler's
+    batches.
+    """
+    def create_scheduler(self, squash_handler, first_state_root):
+        squash_handler(first_state_root, ['context_id'], False)
+        return super().create_scheduler(squash_handler, first_state_root)
+
+
 class TestBlockValidator(unittest.TestCase):
     def setUp(self):
         self.state_view_factory = MockStateViewFactory()
@@ -579,6 +677,117 @@ class TestBlockValidator(unittest.TestCase):
         """
         pass
 
+    def test_block_execution_result_reused(self):
+        """
+        Test that the batches of a block whose execution result is cached
+        are not executed, and its cached state is persisted.
+        """
+        new_block = self.block_tree_manager.generate_block(
+            previous_block=self.root,
+            add_to_store=True)
+
+        squashes = []
+
+        def squash(state_root, context_ids, persist):
+            squashes.append((state_root, context_ids, persist))
+            return new_block.state_root_hash
+
+        cache = ExecutionResultCache()
+        cache.put(
+            self.root.state_root_hash,
+            new_block.header.batch_ids,
+            BlockExecutionResult(
+                state_hash=new_block.state_root_hash,
+                squash_state_root=self.root.state_root_hash,
+                squash_context_ids=['context_id']))
+
+        # the batches would be invalid, were they executed
+        validator = self.create_block_validator(
+            new_block,
+            self.block_validation_handler.on_block_validated,
+            executor=MockTransactionExecutor(batch_execution_result=False),
+            squash_handler=squash,
+            execution_result_cache=cache)
+        validator.run()
+
+        self.assert_valid_block(new_block)
+        self.assert_new_block_committed()
+        self.assertEqual(
+            [(self.root.state_root_hash, ['context_id'], True)], squashes)
+        self.assertEqual(0, len(cache))
+
+    def test_block_execution_result_lost(self):
+        """
+        Test that the batches of a block are executed if the contexts of its
+        cached execution result are no longer held.
+        """
+        new_block = self.block_tree_manager.generate_block(
+            previous_block=self.root,
+            add_to_store=True)
+
+        def squash(state_root, context_ids, persist):
+            raise KeyError(context_ids[0])
+
+        cache = ExecutionResultCache()
+        cache.put(
+            self.root.state_root_hash,
+            new_block.header.batch_ids,
+            BlockExecutionResult(
+                state_hash=new_block.state_root_hash,
+                squash_state_root=self.root.state_root_hash,
+                squash_context_ids=['context_id']))
+
+        validator = self.create_block_validator(
+            new_block,
+            self.block_validation_handler.on_block_validated,
+            executor=MockTransactionExecutor(batch_execution_result=False),
+            squash_handler=squash,
+            execution_result_cache=cache)
+        validator.run()
+
+        self.assert_invalid_block(new_block)
+        self.assert_new_block_not_committed()
+
+    def test_block_execution_result_lost_dependencies(self):
+        """
+        Test that a block with a transaction depending on a later
+        transaction is invalid when its batches are executed because its
+        cached execution result was lost.
+        """
+        new_block = self.block_tree_manager.generate_block(
+            previous_block=self.root,
+            add_to_cache=True)
+
+        # a transaction depending on a transaction later in the block
+        later = self.block_tree_manager.generate_batch(txn_count=1)
+        earlier = self.block_tree_manager.generate_batch(txns=[
+            self.block_tree_manager.generate_transaction(
+                payload='depends on a later transaction',
+                deps=[later.transactions[0].header_signature])])
+        new_block.block.batches.extend([earlier, later])
+
+        def squash(state_root, context_ids, persist):
+            raise KeyError(context_ids[0])
+
+        cache = ExecutionResultCache()
+        cache.put(
+            self.root.state_root_hash,
+            new_block.header.batch_ids,
+            BlockExecutionResult(
+                state_hash=new_block.state_root_hash,
+                squash_state_root=self.root.state_root_hash,
+                squash_context_ids=['context_id']))
+
+        validator = self.create_block_validator(
+            new_block,
+            self.block_validation_handler.on_block_validated,
+            squash_handler=squash,
+            execution_result_cache=cache)
+        validator.run()
+
+        self.assert_invalid_block(new_block)
+        self.assert_new_block_not_committed()
+
     def test_block_extra_batch(self):
         """
         Test the case where the new block has an extra batch.
@@ -636,7 +845,11 @@ class TestBlockValidator(unittest.TestCase):
 
         validator.run()
 
-    def create_block_validator(self, new_block, on_block_validated):
+    def create_block_validator(self, new_block, on_block_validated,
+                               executor=None, squash_handler=None,
+                               execution_result_cache=None):
+        if executor is None:
+            executor = MockTransactionExecutor()
         return BlockValidator(
             consensus_module=mock_consensus,
             new_block=new_block,
@@ -644,10 +857,11 @@ class TestBlockValidator(unittest.TestCase):
             state_view_factory=self.state_view_factory,
             block_cache=self.block_tree_manager.block_cache,
             done_cb=on_block_validated,
-            executor=MockTransactionExecutor(),
-            squash_handler=None,
+            executor=executor,
+            squash_handler=squash_handler,
             identity_signing_key=self.block_tree_manager.identity_signing_key,
-            data_dir=None)
+            data_dir=None,
+            execution_result_cache=execution_result_cache)
 
     class BlockValidationHandler(object):
         def __init__(self):
@@ -891,6 +1105,22 @@ class TestChainController(unittest.TestCase):
         self.receive_and_process_blocks(extending_block)
         self.assert_is_chain_head(extending_block)
 
+    def test_pending_block_received_again(self):
+        '''Tests that a block received again while it is pending is
+        unpinned from the block cache once it is processed
+        '''
+        candidate = self.generate_block(previous_block=self.init_head)
+        extending_block = self.generate_block(previous_block=candidate)
+
+        # the extending block is pending while the candidate is processing
+        self.chain_ctrl.on_block_received(candidate)
+        self.chain_ctrl.on_block_received(extending_block)
+        self.chain_ctrl.on_block_received(extending_block)
+        self.executor.process_all()
+
+        self.assert_is_chain_head(extending_block)
+        self.assertEqual(self.chain_ctrl._block_cache._pinned, {})
+
     def test_multiple_extended_forks(self):
         '''A more involved example of competing forks
 
@@ -1119,6 +1349,229 @@ class TestJournal(unittest.TestCase):
             if journal is not None:
                 journal.stop()
 
+    def test_batch_admission(self):
+        """
+        Test that batches submitted by clients are rejected with a
+        QUEUE_FULL status once as many batches are pending as the journal
+        admits, and that they are counted.
+        """
+        btm = BlockTreeManager()
+        journal = Journal(
+            block_store=btm.block_store,
+            block_cache=btm.block_cache,
+            state_view_factory=StateViewFactory(DictDatabase()),
+            block_sender=self.block_sender,
+            batch_sender=self.batch_sender,
+            transaction_executor=self.txn_executor,
+            squash_handler=None,
+            identity_signing_key=btm.identity_signing_key,
+            chain_id_manager=None,
+            data_dir=None,
+            max_pending_batches=3)
+        handler = BatchSubmitAdmissionHandler(journal)
+        request = ClientBatchSubmitRequest(
+            batches=[Batch()]).SerializeToString()
+
+        for _ in range(3):
+            result = handler.handle('conn_id', request)
+            self.assertEqual(HandlerStatus.PASS, result.status)
+            journal.on_batch_received(Batch())
+
+        result = handler.handle('conn_id', request)
+        self.assertEqual(HandlerStatus.RETURN, result.status)
+        self.assertEqual(
+            ClientBatchSubmitResponse.QUEUE_FULL, result.message_out.status)
+
+        self.assertEqual(
+            PendingBatchMetrics(pending=3, limit=3, admitted=3, rejected=1),
+            journal.get_pending_batch_metrics())
+
+    def test_pending_batch_limit(self):
+        """
+        Test that the limit of pending batches follows the average number
+        of batches in the latest blocks, within its bounds.
+        """
+        btm = BlockTreeManager()
+        journal = Journal(
+            block_store=btm.block_store,
+            block_cache=btm.block_cache,
+            state_view_factory=StateViewFactory(DictDatabase()),
+            block_sender=self.block_sender,
+            batch_sender=self.batch_sender,
+            transaction_executor=self.txn_executor,
+            squash_handler=None,
+            identity_signing_key=btm.identity_signing_key,
+            chain_id_manager=None,
+            data_dir=None,
+            max_pending_batches=1000)
+        publisher = _MockPendingPublisher()
+        journal._block_publisher = publisher
+
+        self.assertEqual(1000, journal.get_pending_batch_limit())
+
+        publisher.average_batches_per_block = 50
+        self.assertEqual(150, journal.get_pending_batch_limit())
+
+        publisher.average_batches_per_block = 1
+        self.assertEqual(100, journal.get_pending_batch_limit())
+
+        publisher.average_batches_per_block = 500
+        self.assertEqual(1000, journal.get_pending_batch_limit())
+
+        publisher.average_batches_per_block = 50
+        publisher.pending_batch_count = 150
+        self.assertFalse(journal.admit_batches(1))
+        publisher.pending_batch_count = 149
+        self.assertTrue(journal.admit_batches(1))
+
+
+class _MockPendingPublisher(object):
+    def __init__(self):
+        self.pending_batch_count = 0
+        self.average_batches_per_block = None
+
+
+class TestPendingBatchPool(unittest.TestCase):
+    def setUp(self):
+        self.signer = BlockTreeManager(with_genesis=False)
+        self.other_signer = BlockTreeManager(with_genesis=False)
+        self.pool = PendingBatchPool()
+
+    def make_batch(self, signer, dependency=None):
+        deps = None
+        if dependency is not None:
+            deps = [dependency.transactions[0].header_signature]
+        return signer.generate_batch(
+            txns=[signer.generate_transaction(deps=deps)])
+
+    def test_add_remove(self):
+        """
+        Test that batches are kept in the order they were added, once each,
+        and that removing batches leaves the others in order.
+        """
+        batches = [self.make_batch(self.signer) for _ in range(5)]
+        for batch in batches:
+            self.pool.add(batch)
+        self.pool.add(batches[0])
+
+        self.assertEqual(5, len(self.pool))
+        self.assertEqual(batches, list(self.pool))
+
+        self.pool.remove(batches[1].header_signature)
+        self.pool.remove(batches[3].header_signature)
+        self.pool.remove(batches[3].header_signature)
+
+        self.assertEqual(3, len(self.pool))
+        self.assertNotIn(batches[1].header_signature, self.pool)
+        self.assertIn(batches[2].header_signature, self.pool)
+        self.assertEqual(
+            [batches[0], batches[2], batches[4]], list(self.pool))
+
+    def test_add_first(self):
+        """
+        Test that batches added first are kept in order, before the other
+        batches, including one which was already pending.
+        """
+        pending = [self.make_batch(self.signer) for _ in range(2)]
+        for batch in pending:
+            self.pool.add(batch)
+
+        uncommitted = [self.make_batch(self.other_signer), pending[1]]
+        self.pool.add_first(uncommitted)
+
+        self.assertEqual(3, len(self.pool))
+        self.assertEqual(
+            [uncommitted[0], pending[1], pending[0]],
+            [batch for batch in self.pool])
+
+    def test_dependencies(self):
+        """
+        Test that a batch follows the pending batch it depends on, and the
+        earlier batches of its signer, though they were added after it.
+        """
+        dependency = self.make_batch(self.other_signer)
+        dependent = self.make_batch(self.signer, dependency)
+        follower = self.make_batch(self.signer)
+        unrelated = self.make_batch(self.other_signer)
+
+        for batch in [dependent, follower, unrelated, dependency]:
+            self.pool.add(batch)
+
+        self.assertEqual(
+            {dependency.header_signature},
+            self.pool.get_dependencies(dependent.header_signature))
+        self.assertEqual(
+            [unrelated, dependency, dependent, follower], list(self.pool))
+
+        self.pool.remove(dependency.header_signature)
+
+        self.assertEqual(
+            set(), self.pool.get_dependencies(dependent.header_signature))
+        self.assertEqual([dependent, follower, unrelated], list(self.pool))
+
+    def test_circular_dependencies(self):
+        """
+        Test that batches whose dependencies are circular, as when a batch
+        depends on a later batch of its signer, are yielded after the
+        others, in the order they were added.
+        """
+        dependency = self.make_batch(self.signer)
+        dependent = self.make_batch(self.signer, dependency)
+        unrelated = self.make_batch(self.other_signer)
+
+        for batch in [dependent, dependency, unrelated]:
+            self.pool.add(batch)
+
+        self.assertEqual([unrelated, dependent, dependency], list(self.pool))
+
+
+class TestExecutionResultCache(unittest.TestCase):
+    def test_put_pop(self):
+        """
+        Test that results are keyed by state root and ordered batch ids,
+        popped once, and that the oldest are discarded beyond the size.
+        """
+        cache = ExecutionResultCache(size=2)
+        results = [BlockExecutionResult(str(i), 'root', [str(i)])
+                   for i in range(3)]
+
+        cache.put('root', ['a', 'b'], results[0])
+        self.assertIsNone(cache.pop('root', ['b', 'a']))
+        self.assertIsNone(cache.pop('other', ['a', 'b']))
+        self.assertEqual(results[0], cache.pop('root', ['a', 'b']))
+        self.assertIsNone(cache.pop('root', ['a', 'b']))
+
+        for i, result in enumerate(results):
+            cache.put('root', [str(i)], result)
+
+        self.assertEqual(2, len(cache))
+        self.assertIsNone(cache.pop('root', ['0']))
+        self.assertEqual(results[1], cache.pop('root', ['1']))
+        self.assertEqual(results[2], cache.pop('root', ['2']))
+
+    def test_squash_recorder(self):
+        """
+        Test that the squash recorder passes squashes through, recording
+        those not persisted by the state hash they compute.
+        """
+        squashes = []
+
+        def squash(state_root, context_ids, persist):
+            squashes.append((state_root, context_ids, persist))
+            return state_root + ''.join(context_ids)
+
+        recorder = SquashRecorder(squash, 'root')
+
+        self.assertEqual('rootab', recorder('root', ['a', 'b'], False))
+        self.assertEqual('rootc', recorder('root', ['c'], True))
+
+        self.assertEqual(
+            [('root', ['a', 'b'], False), ('root', ['c'], True)], squashes)
+        self.assertEqual(
+            BlockExecutionResult('rootab', 'root', ['a', 'b']),
+            recorder.get_result('rootab'))
+        self.assertIsNone(recorder.get_result('rootc'))
+
 
 class TestTimedCache(unittest.TestCase):
     def test_cache(self):
@@ -1170,3 +1623,68 @@ class TestTimedCache(unittest.TestCase):
         self.assertEqual(len(bc), 2)
         self.assertTrue("test" in bc)
         self.assertTrue("test2" in bc)
+
+    def test_max_size(self):
+        """Tests that the least recently used entries are evicted when the
+        cache exceeds its max size, and that evictions and expirations are
+        counted.
+        """
+        bc = TimedCache(keep_time=1, max_size=2)
+
+        bc["test"] = "value"
+        bc["test2"] = "value2"
+        bc["test"]  # access to make test2 the least recently used
+        bc["test3"] = "value3"
+        self.assertEqual(len(bc), 2)
+        self.assertFalse("test2" in bc)
+        self.assertTrue("test" in bc)
+        self.assertEqual(bc.evicted_count, 1)
+
+        bc.cache["test"].timestamp = bc.cache["test"].timestamp - 2
+        bc.cache["test3"].timestamp = bc.cache["test3"].timestamp - 2
+        bc.purge_expired()
+        self.assertEqual(len(bc), 0)
+        self.assertEqual(bc.expired_count, 2)
+        self.assertEqual(bc.evicted_count, 1)
+
+    def test_max_size_pinned(self):
+        """Tests that pinned entries are kept, as if accessed, when the
+        least recently used entries are evicted, and that an entry is kept
+        if only pinned entries could be evicted before it.
+        """
+        class PinningCache(TimedCache):
+            def _is_pinned(self, key):
+                return key.startswith('pinned')
+
+        bc = PinningCache(keep_time=1, max_size=2)
+        bc["pinned"] = "value"
+        bc["test"] = "value"
+        bc["test2"] = "value2"
+        self.assertEqual(["pinned", "test2"], list(bc))
+        self.assertEqual(bc.evicted_count, 1)
+
+        bc["pinned2"] = "value"
+        self.assertEqual(["pinned", "pinned2"], list(bc))
+        bc["pinned3"] = "value"
+        self.assertEqual(["pinned", "pinned2", "pinned3"], sorted(bc))
+        self.assertEqual(bc.evicted_count, 2)
+
+    def test_iteration(self):
+        """Tests that the entries can be iterated while they are accessed,
+        and that listing them does not reorder them.
+        """
+        bc = TimedCache(keep_time=1)
+
+        bc["test"] = "value"
+        bc["test2"] = "value2"
+
+        for key in bc:
+            bc[key]  # access reorders the entries
+        self.assertEqual(
+            bc.items(), [("test", "value"), ("test2", "value2")])
+        self.assertEqual(bc.values(), ["value", "value2"])
+        self.assertEqual(list(bc), ["test", "test2"])
+
+        bc["test"]  # access to make test2 the least recently used
+        self.assertEqual(bc.values(), ["value2", "value"])
+        self.assertEqual(dict(bc), {"test": "value", "test2": "value2"})
@@ -20,7 +20,12 @@ import tempfile
 from string import ascii_lowercase
 
 from sawtooth_validator.state.merkle import MerkleDatabase
+from sawtooth_validator.state.merkle import NodeCache
+from sawtooth_validator.state.merkle import get_node_cache
 from sawtooth_validator.database import lmdb_nolock_database
+from sawtooth_validator.database.migrate import check_database_format
+from sawtooth_validator.database.migrate import migrate_database
+from sawtooth_validator.exceptions import LocalConfigurationError
 
 
 class TestSawtoothMerkleTrie(unittest.TestCase):
@@ -119,6 +124,124 @@ class TestSawtoothMerkleTrie(unittest.TestCase):
             self.assert_value_at_address(
                 address, value, ishash=True)
 
+    def test_merkle_trie_update_matches_set(self):
+        """Tests that a bulk update produces the same root as setting each
+        address in turn, including addresses which share path prefixes.
+        """
+        set_items = {
+            _hash(key): {key: _random_string(16)} for key in
+            (_random_string(10) for _ in range(200))
+        }
+        # addresses sharing all but the last node of their paths
+        set_items.update({
+            _hash('shared')[:-2] + suffix: {suffix: 1}
+            for suffix in ('00', '01', 'ff')
+        })
+
+        init_root = self.get_merkle_root()
+        update_root = self.update(set_items, virtual=False)
+
+        for address, value in sorted(set_items.items()):
+            self.set_merkle_root(self.set(address, value, ishash=True))
+
+        self.assert_root(update_root)
+
+        # an empty update leaves the root unchanged
+        self.set_merkle_root(init_root)
+        self.assertEqual(self.update({}, virtual=True), init_root)
+
+    def test_merkle_trie_ordered_leaves(self):
+        """Tests that leaves are iterated in address order from a start
+        address, and that leaf counts and positions agree with the order.
+        """
+        prefix = 'abcdef'
+        set_items = {
+            prefix + _hash(key)[6:]: {key: 1} for key in
+            (_random_string(10) for _ in range(100))
+        }
+        set_items[_hash('other')] = {'other': 1}
+        self.set_merkle_root(self.update(set_items, virtual=False))
+
+        addresses = sorted(a for a in set_items if a.startswith(prefix))
+
+        self.assertEqual(
+            [a for a, _ in self.trie.iter_leaves(prefix)], addresses)
+        self.assertEqual(
+            [a for a, _ in self.trie.iter_leaves(prefix, start=addresses[40])],
+            addresses[40:])
+        self.assertEqual(self.trie.leaf_count(prefix), len(addresses))
+        self.assertEqual(self.trie.leaf_count(''), len(set_items))
+        self.assertEqual(self.trie.leaf_count('ffffff'), 0)
+
+        for index in (0, 40, len(addresses) - 1):
+            self.assertEqual(
+                self.trie.leaf_address(prefix, index), addresses[index])
+            self.assertEqual(
+                self.trie.leaf_index(prefix, addresses[index]), index)
+
+        with self.assertRaises(IndexError):
+            self.trie.leaf_address(prefix, len(addresses))
+
+    def test_merkle_trie_shared_node_cache(self):
+        value = {'name': 'baz', 'value': 1}
+
+        new_root = self.set('baz', value)
+
+        node_cache = get_node_cache(self.lmdb)
+        self.assertIs(node_cache, get_node_cache(self.lmdb))
+        self.assertIn(new_root, node_cache)
+
+        # a second tree over the same database is served from the cache
+        other = MerkleDatabase(self.lmdb, new_root)
+        hits = node_cache.hits
+        self.assertEqual(other.get(_hash('baz')), value)
+        self.assertGreater(node_cache.hits, hits)
+
+        # virtual roots are never cached
+        virtual_root = self.update({_hash('qux'): value}, virtual=True)
+        self.assertNotIn(virtual_root, node_cache)
+
+    def test_node_cache_eviction(self):
+        node_cache = NodeCache(max_size=10)
+
+        node_cache.put('a', {'v': None, 'c': {}}, 4)
+        node_cache.put('b', {'v': None, 'c': {}}, 4)
+        self.assertIsNotNone(node_cache.get('a'))
+
+        # 'b' is the least recently used entry
+        node_cache.put('c', {'v': None, 'c': {}}, 4)
+        self.assertIn('a', node_cache)
+        self.assertNotIn('b', node_cache)
+        self.assertIn('c', node_cache)
+
+        self.assertIsNone(node_cache.get('b'))
+        self.assertEqual(
+            node_cache.stats(),
+            {'hits': 1, 'misses': 1, 'evictions': 1,
+             'entries': 2, 'size': 8, 'max_size': 10})
+
+    def test_merkle_trie_migrate_encoded_nodes(self):
+        value = {'name': 'quux', 'value': 1}
+        new_root = self.set('quux', value)
+
+        # rewrite every node as the CBOR-encoding database once stored it
+        nodes = [(key, self.lmdb.get_raw(key)) for key in self.lmdb.keys()]
+        self.lmdb.set_batch(nodes)
+
+        # the validator refuses to start on an unmigrated database
+        with self.assertRaises(LocalConfigurationError):
+            check_database_format(self.lmdb, self.file)
+        self.trie.close()
+
+        self.assertEqual(migrate_database(self.file), len(nodes))
+        # already migrated values are left untouched
+        self.assertEqual(migrate_database(self.file), 0)
+
+        self.lmdb = lmdb_nolock_database.LMDBNoLockDatabase(self.file, 'c')
+        check_database_format(self.lmdb, self.file)
+        self.trie = MerkleDatabase(self.lmdb, new_root)
+        self.assert_value_at_address('quux', value)
+
     # assertions
 
     def assert_value_at_address(self, address, value, ishash=False):
@@ -12,7 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # ------------------------------------------------------------------------------
+from concurrent.futures import ThreadPoolExecutor
 import unittest
+from unittest.mock import patch
 import cbor
 import hashlib
 import random
@@ -205,3 +207,48 @@ class TestMessageValidation(unittest.TestCase):
         block = block_list[0]
         valid = verifier.validate_block(block)
         self.assertFalse(valid)
+
+    def test_signature_verifier(self):
+        """Tests that the SignatureVerifier, verifying signatures on an
+        executor, finds the blocks and batches valid that validate_block
+        and validate_batches do.
+        """
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            sig_verifier = verifier.SignatureVerifier(executor)
+
+            self.assertTrue(sig_verifier.verify_batches(
+                self._create_batches(3, 40)))
+            self.assertTrue(sig_verifier.verify_block(
+                self._create_blocks(1, 2)[0]))
+
+            self.assertFalse(sig_verifier.verify_batches([]))
+            self.assertFalse(sig_verifier.verify_batches(
+                self._create_batches(1, 1, valid_batch=False)))
+            self.assertFalse(sig_verifier.verify_batches(
+                self._create_batches(2, 1, valid_txn=False)))
+            self.assertFalse(sig_verifier.verify_batches(
+                self._create_batches(1, 1, valid_batcher=False)))
+            self.assertFalse(sig_verifier.verify_block(
+                self._create_blocks(1, 1, valid_batch=False)[0]))
+            self.assertFalse(sig_verifier.verify_block(
+                self._create_blocks(1, 1, valid_block=False)[0]))
+
+    def test_signature_verifier_remembers_signatures(self):
+        """Tests that the signatures of a batch verified by a
+        SignatureVerifier are not verified again when the batch arrives in
+        a block, and that invalid signatures are not remembered.
+        """
+        sig_verifier = verifier.SignatureVerifier()
+        block = self._create_blocks(1, 1)[0]
+        self.assertTrue(sig_verifier.verify_batches(block.batches))
+
+        with patch.object(verifier.signing, 'verify',
+                          wraps=verifier.signing.verify) as verify:
+            self.assertTrue(sig_verifier.verify_block(block))
+            # only the block's signature is verified
+            self.assertEqual(1, verify.call_count)
+
+            invalid_batches = self._create_batches(1, 1, valid_txn=False)
+            self.assertFalse(sig_verifier.verify_batches(invalid_batches))
+            self.assertFalse(sig_verifier.verify_batches(invalid_batches))
+            self.assertEqual(4, verify.call_count)
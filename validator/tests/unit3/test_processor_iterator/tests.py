@@ -0,0 +1,105 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+from functools import partial
+import unittest
+
+from sawtooth_validator.execution.processor_iterator import \
+    LeastLoadedProcessorIterator
+from sawtooth_validator.execution.processor_iterator import Processor
+from sawtooth_validator.execution.processor_iterator import \
+    ProcessorIteratorCollection
+from sawtooth_validator.execution.processor_iterator import ProcessorLoad
+from sawtooth_validator.execution.processor_iterator import ProcessorStats
+from sawtooth_validator.execution.processor_iterator import ProcessorType
+
+
+class TestLeastLoadedProcessorIterator(unittest.TestCase):
+    def setUp(self):
+        self.load = ProcessorLoad()
+        self.processor_type = ProcessorType('intkey', '1.0', 'cbor')
+        self.processors = ProcessorIteratorCollection(
+            partial(LeastLoadedProcessorIterator, self.load),
+            processor_load=self.load)
+        for connection_id in ('fast', 'slow'):
+            self.processors[self.processor_type] = Processor(
+                connection_id, ['abcdef'])
+
+    def _next_connection_id(self):
+        return self.processors.get_next_of_type(
+            self.processor_type).connection_id
+
+    def test_spreads_unmeasured_requests(self):
+        """Tests that, before any latency is measured, requests go to the
+        processor with the fewest requests in flight.
+        """
+        first = self._next_connection_id()
+        self.load.request_sent(first)
+        second = self._next_connection_id()
+        self.assertNotEqual(first, second)
+
+    def test_routes_to_least_loaded(self):
+        """Tests that requests go to the processor expected to answer
+        soonest, given its latency and requests in flight.
+        """
+        self.load.request_sent('fast')
+        self.load.request_answered('fast', 0.01)
+        self.load.request_sent('slow')
+        self.load.request_answered('slow', 1.0)
+
+        for _ in range(10):
+            self.assertEqual('fast', self._next_connection_id())
+            self.load.request_sent('fast')
+
+        # the slow processor is chosen once the fast one has enough
+        # requests in flight to answer later than it
+        for _ in range(90):
+            self.load.request_sent('fast')
+        self.assertEqual('slow', self._next_connection_id())
+
+    def test_stats(self):
+        """Tests that the ProcessorLoad counts requests in flight, in total
+        and by processor, averages latency, and forgets the load of removed
+        processors.
+        """
+        load = ProcessorLoad(latency_weight=0.5)
+        load.request_sent('a')
+        load.request_sent('a')
+        load.request_sent('b')
+        self.assertEqual(3, load.in_flight())
+        self.assertEqual(2, load.in_flight('a'))
+
+        load.request_answered('a', 1.0)
+        load.request_answered('a', 3.0)
+        self.assertEqual(
+            [ProcessorStats('a', 0, 2.0), ProcessorStats('b', 1, None)],
+            load.get_stats())
+        # b's latency is taken to be the mean measured
+        self.assertEqual(4.0, load.expected_wait('b'))
+
+        load.remove('b')
+        self.assertEqual([ProcessorStats('a', 0, 2.0)], load.get_stats())
+        load.request_answered('b', 1.0)
+        self.assertEqual(0, load.in_flight())
+
+    def test_remove_processor(self):
+        """Tests that removing a processor from the collection stops
+        routing to it and forgets its load.
+        """
+        self.load.request_sent('slow')
+        self.processors.remove('slow')
+        for _ in range(3):
+            self.assertEqual('fast', self._next_connection_id())
+        self.assertEqual([], self.load.get_stats())
@@ -0,0 +1,251 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import unittest
+from unittest.mock import Mock
+from functools import partial
+import hashlib
+import random
+
+import cbor
+
+import sawtooth_signing as signing
+import sawtooth_validator.protobuf.batch_pb2 as batch_pb2
+import sawtooth_validator.protobuf.transaction_pb2 as transaction_pb2
+
+from sawtooth_validator.database import dict_database
+from sawtooth_validator.execution.context_manager import ContextManager
+from sawtooth_validator.execution.scheduler_parallel import ParallelScheduler
+from sawtooth_validator.execution.scheduler_serial import SerialScheduler
+
+
+INTKEY_PREFIX = hashlib.sha512('intkey'.encode()).hexdigest()[0:6]
+
+
+def make_intkey_address(name):
+    return INTKEY_PREFIX + hashlib.sha512(name.encode()).hexdigest()[-64:]
+
+
+class IntkeyWorkload(object):
+    """Generates random batches of intkey transactions over a fixed set of
+    names. A small set of names gives many conflicting transactions, and
+    invalid transactions (an inc or dec of a missing name, a dec below zero,
+    or a set of an existing name) fail some of the batches.
+    """
+    def __init__(self, seed, name_count):
+        self._random = random.Random(seed)
+        self._names = ['name{}'.format(i) for i in range(name_count)]
+        self._private_key = signing.generate_privkey()
+        self._public_key = signing.generate_pubkey(self._private_key)
+        self._nonce = 0
+
+    def create_batches(self, batch_count, max_batch_size):
+        batches = []
+        for _ in range(batch_count):
+            batch_size = self._random.randint(1, max_batch_size)
+            batches.append(self._create_batch(
+                [self._create_random_transaction()
+                 for _ in range(batch_size)]))
+
+        # end with a valid batch, so that both schedulers report the final
+        # state hash on the same batch
+        self._nonce += 1
+        batches.append(self._create_batch(
+            [self._create_transaction('set', 'last{}'.format(self._nonce),
+                                      1)]))
+        return batches
+
+    def _create_random_transaction(self):
+        verb = self._random.choice(['set', 'inc', 'inc', 'dec'])
+        name = self._random.choice(self._names)
+        value = self._random.randint(0, 10)
+        return self._create_transaction(verb, name, value)
+
+    def _create_transaction(self, verb, name, value):
+        self._nonce += 1
+        payload = cbor.dumps({'Verb': verb, 'Name': name, 'Value': value,
+                              'Nonce': self._nonce})
+        address = make_intkey_address(name)
+
+        header = transaction_pb2.TransactionHeader(
+            signer_pubkey=self._public_key,
+            family_name='intkey',
+            family_version='1.0',
+            inputs=[address],
+            outputs=[address],
+            dependencies=[],
+            payload_encoding="application/cbor",
+            payload_sha512=hashlib.sha512(payload).hexdigest(),
+            batcher_pubkey=self._public_key)
+        header_bytes = header.SerializeToString()
+
+        return transaction_pb2.Transaction(
+            header=header_bytes,
+            payload=payload,
+            header_signature=signing.sign(header_bytes, self._private_key))
+
+    def _create_batch(self, transactions):
+        header = batch_pb2.BatchHeader(
+            signer_pubkey=self._public_key,
+            transaction_ids=[t.header_signature for t in transactions])
+        header_bytes = header.SerializeToString()
+
+        return batch_pb2.Batch(
+            header=header_bytes,
+            transactions=transactions,
+            header_signature=signing.sign(header_bytes, self._private_key))
+
+
+def apply_intkey(context_manager, context_id, txn):
+    """Applies an intkey transaction within a context, as the intkey
+    transaction processor does.
+
+    Returns:
+        bool: True if the transaction is valid
+    """
+    content = cbor.loads(txn.payload)
+    verb, name, value = content['Verb'], content['Name'], content['Value']
+    address = make_intkey_address(name)
+
+    [(_, state_value_rep)] = context_manager.get(context_id, [address])
+    state_value = {} if state_value_rep is None \
+        else cbor.loads(state_value_rep)
+
+    if verb == 'set':
+        if name in state_value:
+            return False
+        state_value[name] = value
+    elif name not in state_value:
+        return False
+    elif verb == 'inc':
+        state_value[name] += value
+    else:
+        if state_value[name] - value < 0:
+            return False
+        state_value[name] -= value
+
+    context_manager.set(context_id, [{address: cbor.dumps(state_value)}])
+    return True
+
+
+class TestSchedulerDeterminism(unittest.TestCase):
+    """Verifies that the ParallelScheduler, and the SerialScheduler with a
+    speculative window, produce the same batch results and state hashes as
+    the SerialScheduler, executing transactions as they become available in
+    a random order.
+    """
+    def setUp(self):
+        self.context_manager = ContextManager(dict_database.DictDatabase(),
+                                              state_delta_store=Mock())
+        self.first_state_root = self.context_manager.get_first_root()
+
+    def tearDown(self):
+        self.context_manager.stop()
+
+    def _run(self, scheduler_class, batches, seed):
+        """Executes the batches with a new scheduler of scheduler_class.
+
+        Returns:
+            list of (bool, str): the validity and state hash of each batch
+            int: the most transactions which were in progress at once
+        """
+        scheduler = scheduler_class(
+            self.context_manager.get_squash_handler(),
+            self.first_state_root,
+            always_persist=False)
+        for batch in batches:
+            scheduler.add_batch(batch)
+        scheduler.finalize()
+
+        execution_order = random.Random(seed)
+        in_progress = []
+        max_in_progress = 0
+        while not scheduler.complete(block=False):
+            txn_info = scheduler.next_transaction()
+            while txn_info is not None:
+                header = transaction_pb2.TransactionHeader()
+                header.ParseFromString(txn_info.txn.header)
+                context_id = self.context_manager.create_context(
+                    state_hash=txn_info.state_hash,
+                    base_contexts=txn_info.base_context_ids,
+                    inputs=list(header.inputs),
+                    outputs=list(header.outputs))
+                in_progress.append((txn_info.txn, context_id))
+                txn_info = scheduler.next_transaction()
+
+            self.assertTrue(in_progress, "scheduler stalled")
+            max_in_progress = max(max_in_progress, len(in_progress))
+
+            txn, context_id = in_progress.pop(
+                execution_order.randrange(len(in_progress)))
+            is_valid = apply_intkey(self.context_manager, context_id, txn)
+            if not is_valid:
+                self.context_manager.delete_context([context_id])
+            scheduler.set_transaction_execution_result(
+                txn.header_signature, is_valid, context_id)
+
+        results = []
+        for batch in batches:
+            result = scheduler.get_batch_execution_result(
+                batch.header_signature)
+            results.append((result.is_valid, result.state_hash))
+        return results, max_in_progress
+
+    def _assert_deterministic(self, name_count, batch_count, max_batch_size,
+                              seeds=range(5)):
+        """Returns the most transactions in progress at once with the
+        ParallelScheduler, and with the speculative SerialScheduler.
+        """
+        for seed in seeds:
+            batches = IntkeyWorkload(seed, name_count).create_batches(
+                batch_count, max_batch_size)
+
+            serial_results, _ = self._run(SerialScheduler, batches, seed)
+            parallel_results, max_in_progress = self._run(
+                ParallelScheduler, batches, seed)
+            speculative_results, max_speculative = self._run(
+                partial(SerialScheduler, window_size=4), batches, seed)
+
+            for results in (parallel_results, speculative_results):
+                self.assertEqual(
+                    [is_valid for is_valid, _ in serial_results],
+                    [is_valid for is_valid, _ in results],
+                    "batch validity differs for seed {}".format(seed))
+                self.assertEqual(
+                    serial_results[-1][1], results[-1][1],
+                    "state hash differs for seed {}".format(seed))
+                self.assertIsNotNone(results[-1][1])
+
+        return max_in_progress, max_speculative
+
+    def test_low_contention(self):
+        """Tests a workload of many names, where most transactions are
+        independent and execute in parallel.
+        """
+        max_in_progress, max_speculative = self._assert_deterministic(
+            name_count=200, batch_count=40, max_batch_size=3)
+        self.assertGreater(max_in_progress, 1)
+        self.assertGreater(max_speculative, 1)
+
+    def test_high_contention(self):
+        """Tests a workload of few names, where most transactions conflict
+        and many batches are invalid.
+        """
+        self._assert_deterministic(
+            name_count=4, batch_count=40, max_batch_size=3)
+
+    def test_single_transaction_batches(self):
+        self._assert_deterministic(
+            name_count=20, batch_count=60, max_batch_size=1)
@@ -16,6 +16,7 @@
 import unittest
 from unittest.mock import Mock
 import logging
+import random
 import hashlib
 import threading
 import time
@@ -28,14 +29,15 @@ from sawtooth_validator.execution.context_manager import ContextManager
 from sawtooth_validator.execution.scheduler_serial import SerialScheduler
 from sawtooth_validator.database import dict_database
 from sawtooth_validator.execution.scheduler_parallel import PredecessorTree
+from sawtooth_validator.execution.scheduler_parallel import ParallelScheduler
 from sawtooth_validator.state.merkle import MerkleDatabase
 
 
 LOGGER = logging.getLogger(__name__)
 
 
-def create_transaction(name, private_key, public_key):
-    payload = name
+def create_transaction(name, private_key, public_key, nonce=''):
+    payload = name + nonce
     addr = '000000' + hashlib.sha512(name.encode()).hexdigest()
 
     header = transaction_pb2.TransactionHeader(
@@ -525,6 +527,243 @@ class TestSerialScheduler(unittest.TestCase):
         self.assertEqual(batch3_result.state_hash, state_root_end)
 
 
+class TestSpeculativeSerialScheduler(unittest.TestCase):
+    def setUp(self):
+        self.context_manager = ContextManager(dict_database.DictDatabase(),
+                                              state_delta_store=Mock())
+        squash_handler = self.context_manager.get_squash_handler()
+        self.first_state_root = self.context_manager.get_first_root()
+        self.scheduler = SerialScheduler(squash_handler,
+                                         self.first_state_root,
+                                         always_persist=False,
+                                         window_size=3)
+        self.private_key = signing.generate_privkey()
+        self.public_key = signing.generate_pubkey(self.private_key)
+        self.nonce = 0
+
+    def tearDown(self):
+        self.context_manager.stop()
+
+    def _add_batch(self, names):
+        txns = []
+        for name in names:
+            txns.append(create_transaction(name=name,
+                                           private_key=self.private_key,
+                                           public_key=self.public_key,
+                                           nonce=str(self.nonce)))
+            self.nonce += 1
+        batch = create_batch(transactions=txns,
+                             private_key=self.private_key,
+                             public_key=self.public_key)
+        self.scheduler.add_batch(batch)
+        return batch
+
+    def _execute(self, txn_info, is_valid=True, value=1):
+        address = TestSerialScheduler._get_address_from_txn(self, txn_info)
+        c_id = self.context_manager.create_context(
+            state_hash=txn_info.state_hash,
+            inputs=[address],
+            outputs=[address],
+            base_contexts=txn_info.base_context_ids)
+        if is_valid:
+            self.context_manager.set(c_id, [{address: value}])
+        self.scheduler.set_transaction_execution_result(
+            txn_info.txn.header_signature, is_valid, c_id)
+        return address
+
+    def test_window(self):
+        """Tests that transactions are scheduled ahead of the results of
+        earlier transactions up to the window size, but not ahead of an
+        earlier transaction writing an address they use, and that results
+        completed out of order give the same state hash as executing the
+        transactions in order.
+        """
+        batches = [self._add_batch(['a']),
+                   self._add_batch(['b']),
+                   self._add_batch(['a']),
+                   self._add_batch(['c']),
+                   self._add_batch(['d'])]
+        self.scheduler.finalize()
+
+        txn_info_a = self.scheduler.next_transaction()
+        txn_info_b = self.scheduler.next_transaction()
+        self.assertEqual(b'b1', txn_info_b.txn.payload)
+        self.assertEqual([], txn_info_b.base_context_ids)
+        # the second 'a' waits for the first
+        self.assertIsNone(self.scheduler.next_transaction())
+
+        address_b = self._execute(txn_info_b, value=2)
+        self.assertIsNone(self.scheduler.next_transaction())
+        address_a = self._execute(txn_info_a, value=1)
+
+        txn_info_a2 = self.scheduler.next_transaction()
+        txn_info_c = self.scheduler.next_transaction()
+        txn_info_d = self.scheduler.next_transaction()
+        self.assertEqual(b'a2', txn_info_a2.txn.payload)
+        self.assertEqual(2, len(txn_info_a2.base_context_ids))
+        self.assertEqual(b'd4', txn_info_d.txn.payload)
+        # the window is full
+        self.assertIsNone(self.scheduler.next_transaction())
+
+        address_d = self._execute(txn_info_d, value=4)
+        address_c = self._execute(txn_info_c, value=3)
+        self.assertFalse(self.scheduler.complete(block=False))
+        self._execute(txn_info_a2, value=5)
+        self.assertTrue(self.scheduler.complete(block=False))
+
+        state_root_end = MerkleDatabase(dict_database.DictDatabase()).update(
+            {address_a: 5, address_b: 2, address_c: 3, address_d: 4},
+            virtual=False)
+        self.assertEqual(
+            state_root_end,
+            self.scheduler.get_batch_execution_result(
+                batches[-1].header_signature).state_hash)
+        self.assertEqual((3, 0), self.scheduler.get_speculation_counts())
+
+    def test_roll_back_after_invalid_batch(self):
+        """Tests that transactions scheduled ahead of the end of a batch
+        which turns out to be invalid are rolled back, that the results of
+        rolled back transactions still in progress are ignored, and that
+        they are scheduled again based on the state before that batch.
+        """
+        batches = [self._add_batch(['a', 'b']),
+                   self._add_batch(['c'])]
+        self.scheduler.finalize()
+
+        txn_info_a = self.scheduler.next_transaction()
+        txn_info_b = self.scheduler.next_transaction()
+        txn_info_c = self.scheduler.next_transaction()
+        self.assertEqual(b'c2', txn_info_c.txn.payload)
+
+        self._execute(txn_info_a, value=1)
+        self._execute(txn_info_b, is_valid=False)
+
+        # 'c' is rolled back, and not scheduled again until its result is in
+        self.assertIsNone(self.scheduler.next_transaction())
+        self._execute(txn_info_c, value=3)
+        txn_info_c2 = self.scheduler.next_transaction()
+        self.assertEqual(b'c2', txn_info_c2.txn.payload)
+        self.assertEqual([], txn_info_c2.base_context_ids)
+        address_c = self._execute(txn_info_c2, value=3)
+        self.assertTrue(self.scheduler.complete(block=False))
+
+        state_root_end = MerkleDatabase(dict_database.DictDatabase()).update(
+            {address_c: 3}, virtual=False)
+        results = [self.scheduler.get_batch_execution_result(
+            batch.header_signature) for batch in batches]
+        self.assertEqual([False, True], [r.is_valid for r in results])
+        self.assertEqual(state_root_end, results[1].state_hash)
+        self.assertEqual((2, 1), self.scheduler.get_speculation_counts())
+
+
+class TestParallelScheduler(unittest.TestCase):
+    def setUp(self):
+        self.context_manager = ContextManager(dict_database.DictDatabase(),
+                                              state_delta_store=Mock())
+        squash_handler = self.context_manager.get_squash_handler()
+        self.first_state_root = self.context_manager.get_first_root()
+        self.scheduler = ParallelScheduler(squash_handler,
+                                           self.first_state_root,
+                                           always_persist=False)
+        self.private_key = signing.generate_privkey()
+        self.public_key = signing.generate_pubkey(self.private_key)
+        self.nonce = 0
+
+    def tearDown(self):
+        self.context_manager.stop()
+
+    def _add_batch(self, names):
+        # transactions on the same address are made distinct by a nonce
+        txns = []
+        for name in names:
+            txns.append(create_transaction(name=name,
+                                           private_key=self.private_key,
+                                           public_key=self.public_key,
+                                           nonce=str(self.nonce)))
+            self.nonce += 1
+        batch = create_batch(transactions=txns,
+                             private_key=self.private_key,
+                             public_key=self.public_key)
+        self.scheduler.add_batch(batch)
+        return batch
+
+    def _execute(self, txn_info, is_valid=True, value=1):
+        address = TestSerialScheduler._get_address_from_txn(self, txn_info)
+        c_id = self.context_manager.create_context(
+            state_hash=txn_info.state_hash,
+            inputs=[address],
+            outputs=[address],
+            base_contexts=txn_info.base_context_ids)
+        if is_valid:
+            self.context_manager.set(c_id, [{address: value}])
+        self.scheduler.set_transaction_execution_result(
+            txn_info.txn.header_signature, is_valid, c_id)
+        return address
+
+    def test_independent_transactions_in_parallel(self):
+        """Tests that transactions with disjoint inputs and outputs are
+        scheduled without waiting for each other, and that a transaction
+        which conflicts with an earlier one waits for it to complete.
+        """
+        self._add_batch(['a'])
+        self._add_batch(['b'])
+        self._add_batch(['a'])
+
+        txn_info_a = self.scheduler.next_transaction()
+        txn_info_b = self.scheduler.next_transaction()
+        self.assertEqual(b'a0', txn_info_a.txn.payload)
+        self.assertEqual(b'b1', txn_info_b.txn.payload)
+        self.assertIsNone(self.scheduler.next_transaction())
+
+        self._execute(txn_info_a)
+        txn_info_a2 = self.scheduler.next_transaction()
+        self.assertEqual(b'a2', txn_info_a2.txn.payload)
+        self.assertEqual(1, len(txn_info_a2.base_context_ids))
+
+    def test_valid_batch_invalid_batch(self):
+        """Tests that a transaction following a transaction in an invalid
+        batch is based on the state before that batch, that the rest of an
+        invalid batch is not executed, and that the state hash of the last
+        valid batch matches directly updating the merkle tree.
+        """
+        batches = [self._add_batch(['a', 'b']),
+                   self._add_batch(['a', 'c']),
+                   self._add_batch(['a'])]
+        self.scheduler.finalize()
+
+        # batch 1
+        address_a = self._execute(self.scheduler.next_transaction(), value=1)
+        address_b = self._execute(self.scheduler.next_transaction(), value=2)
+
+        # batch 2 fails on its first transaction, so 'c' is never executed
+        self._execute(self.scheduler.next_transaction(), is_valid=False)
+
+        # batch 3 is based on batch 1
+        txn_info = self.scheduler.next_transaction()
+        self.assertEqual(b'a4', txn_info.txn.payload)
+        self.assertEqual(
+            1, dict(self.context_manager.get(
+                self.context_manager.create_context(
+                    state_hash=txn_info.state_hash,
+                    base_contexts=txn_info.base_context_ids,
+                    inputs=[address_a],
+                    outputs=[]),
+                [address_a]))[address_a])
+        self._execute(txn_info, value=3)
+
+        self.assertIsNone(self.scheduler.next_transaction())
+        self.assertTrue(self.scheduler.complete(block=False))
+
+        state_root_end = MerkleDatabase(dict_database.DictDatabase()).update(
+            {address_a: 3, address_b: 2}, virtual=False)
+
+        results = [self.scheduler.get_batch_execution_result(
+            batch.header_signature) for batch in batches]
+        self.assertEqual([True, False, True], [r.is_valid for r in results])
+        self.assertIsNone(results[0].state_hash)
+        self.assertEqual(state_root_end, results[2].state_hash)
+
+
 class TestPredecessorTree(unittest.TestCase):
     '''
     With an empty tree initialized in setUp, the predecessor tree
@@ -1424,6 +1663,39 @@ class TestPredecessorTree(unittest.TestCase):
 
         self.assert_rw_count(2, 2)
 
+    def test_subtree_summaries(self):
+        """Tests that the reader and writer summaries cached at each node
+        match the readers and writers below it, over a random sequence of
+        reads, writes, and predecessor lookups at addresses of varying
+        length.
+        """
+        rand = random.Random(0)
+        for txn in range(500):
+            address = ''.join(
+                rand.choice('ab') for _ in range(rand.randint(0, 5)))
+            if rand.random() < 0.7:
+                self.add_reader(address, txn)
+            else:
+                self.set_writer(address, txn)
+
+            # cache the summaries of some nodes between updates
+            self.tree.find_write_predecessors(''.join(
+                rand.choice('ab') for _ in range(rand.randint(0, 5))))
+
+        def check_summaries(node):
+            readers = set()
+            writers = set()
+            for child in node.children.values():
+                child_readers, child_writers = check_summaries(child)
+                readers.update(child.readers)
+                readers.update(child_readers)
+                if child.writer is not None:
+                    writers.add(child.writer)
+                writers.update(child_writers)
+            self.assertEqual((readers, writers), node.summarize())
+            return readers, writers
+
+        check_summaries(self.get_node(''))
 
     # assertions
 
@@ -0,0 +1,178 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from sawtooth_validator.database.dict_database import DictDatabase
+from sawtooth_validator.database.lmdb_nolock_database import \
+    LMDBNoLockDatabase
+from sawtooth_validator.journal.block_cache import BlockCache
+from sawtooth_validator.journal.block_store import BlockStore
+from sawtooth_validator.journal.block_wrapper import BlockWrapper
+from sawtooth_validator.journal.block_wrapper import NULL_BLOCK_IDENTIFIER
+from sawtooth_validator.protobuf.block_pb2 import Block
+from sawtooth_validator.protobuf.block_pb2 import BlockHeader
+from sawtooth_validator.state.merkle import MerkleDatabase
+from sawtooth_validator.state.state_pruner import StatePruner
+
+
+def _make_block(block_num, previous_block_id, state_root_hash):
+    header = BlockHeader(
+        block_num=block_num,
+        previous_block_id=previous_block_id,
+        state_root_hash=state_root_hash)
+    return BlockWrapper(Block(
+        header=header.SerializeToString(),
+        header_signature='B-{}-{}'.format(block_num, state_root_hash[:8])))
+
+
+class StatePrunerTest(unittest.TestCase):
+    def setUp(self):
+        self.database = DictDatabase()
+        self.block_store = BlockStore(DictDatabase())
+        self.block_cache = BlockCache(self.block_store)
+        self.tree = MerkleDatabase(self.database)
+
+        # each block sets a new value at the same address, so each block's
+        # root leaves the previous block's leaf unreachable
+        self.roots = []
+        previous_block_id = NULL_BLOCK_IDENTIFIER
+        for i in range(5):
+            root = self.tree.update({'ab' * 35: str(i).encode()},
+                                    virtual=False)
+            self.tree.set_merkle_root(root)
+            self.roots.append(root)
+            block = _make_block(i, previous_block_id, root)
+            self.block_store.update_chain([block])
+            previous_block_id = block.identifier
+
+    def test_prune_keeps_recent_blocks(self):
+        """Tests that the state of the last keep_blocks committed blocks is
+        retained, and the state of older blocks is removed.
+        """
+        pruner = StatePruner(self.database, self.block_store,
+                             self.block_cache, keep_blocks=2)
+        pruner.prune()
+
+        self.assertGreater(pruner.nodes_deleted, 0)
+        for root in self.roots[-2:]:
+            self.assertEqual(
+                MerkleDatabase(self.database, root).get('ab' * 35),
+                str(self.roots.index(root)).encode())
+        for root in self.roots[:-2]:
+            with self.assertRaises(KeyError):
+                MerkleDatabase(self.database, root).get('ab' * 35)
+
+    def test_prune_keeps_cached_forks(self):
+        """Tests that the state of a fork block held in the block cache is
+        retained.
+        """
+        fork_root = MerkleDatabase(self.database, self.roots[0]).update(
+            {'cd' * 35: b'fork'}, virtual=False)
+        fork = _make_block(1, 'fork-parent', fork_root)
+        self.block_cache[fork.identifier] = fork
+
+        pruner = StatePruner(self.database, self.block_store,
+                             self.block_cache, keep_blocks=1)
+        pruner.prune()
+
+        tree = MerkleDatabase(self.database, fork_root)
+        self.assertEqual(tree.get('cd' * 35), b'fork')
+        self.assertEqual(tree.get('ab' * 35), b'0')
+
+    def test_committed_blocks_read_once(self):
+        """Tests that the committed blocks walked by one collection are not
+        read from the block store again by the next, which reads only the
+        blocks committed since, and that empty cache entries are skipped.
+        """
+        self.block_cache['empty'] = None
+        pruner = StatePruner(self.database, self.block_store,
+                             self.block_cache, keep_blocks=3)
+        pruner.prune()
+
+        root = self.tree.update({'ab' * 35: b'5'}, virtual=False)
+        block = _make_block(5, self.block_store.chain_head.identifier, root)
+        self.block_store.update_chain([block])
+
+        with mock.patch.object(BlockStore, '__getitem__', autospec=True,
+                               side_effect=BlockStore.__getitem__) as get:
+            pruner.prune()
+
+        self.assertEqual(0, get.call_count)
+        self.assertEqual(
+            MerkleDatabase(self.database, root).get('ab' * 35), b'5')
+        self.assertEqual(
+            MerkleDatabase(self.database, self.roots[3]).get('ab' * 35),
+            b'3')
+        with self.assertRaises(KeyError):
+            MerkleDatabase(self.database, self.roots[2]).get('ab' * 35)
+
+    def test_nodes_written_during_collection_are_kept(self):
+        """Tests that state persisted on top of a retained root while a
+        collection is in progress is not removed by that collection, even
+        though its own root is not retained.
+        """
+        pruner = StatePruner(self.database, self.block_store,
+                             self.block_cache, keep_blocks=1)
+        pruner.start()
+
+        new_root = MerkleDatabase(self.database, self.roots[-1]).update(
+            {'ef' * 35: b'new'}, virtual=False)
+
+        pruner.prune()
+
+        tree = MerkleDatabase(self.database, new_root)
+        self.assertEqual(tree.get('ef' * 35), b'new')
+        self.assertEqual(tree.get('ab' * 35), b'4')
+        self.assertFalse(pruner.in_progress)
+        self.assertEqual(pruner.cycles, 1)
+
+    def test_sweep_resumes_across_chunks(self):
+        """Tests that the sweep reads the keys of the database a chunk at a
+        time, resuming after the last key examined, and that every
+        unreachable node is removed across the chunks.
+        """
+        temp_dir = tempfile.mkdtemp()
+        database = LMDBNoLockDatabase(
+            os.path.join(temp_dir, 'merkle.lmdb'), 'n')
+        try:
+            database.set_batch_raw(
+                [(key, self.database.get_raw(key))
+                 for key in self.database.keys()])
+            pruner = StatePruner(database, self.block_store,
+                                 self.block_cache, keep_blocks=1)
+
+            with mock.patch(
+                    'sawtooth_validator.state.state_pruner._SWEEP_CHUNK_SIZE',
+                    2):
+                with mock.patch.object(
+                        pruner, '_next_sweep_keys',
+                        wraps=pruner._next_sweep_keys) as next_sweep_keys:
+                    pruner.prune()
+
+            self.assertGreater(next_sweep_keys.call_count, 2)
+            self.assertEqual(
+                MerkleDatabase(database, self.roots[-1]).get('ab' * 35),
+                b'4')
+            for root in self.roots[:-1]:
+                with self.assertRaises(KeyError):
+                    MerkleDatabase(database, root).get('ab' * 35)
+        finally:
+            database.close()
+            shutil.rmtree(temp_dir)
@@ -16,6 +16,7 @@
 import unittest
 
 from sawtooth_validator.database.dict_database import DictDatabase
+from sawtooth_validator.state.merkle import EMPTY_ROOT_HASH
 from sawtooth_validator.state.merkle import MerkleDatabase
 
 from sawtooth_validator.state.state_view import StateViewFactory
@@ -62,3 +63,30 @@ class StateViewTest(unittest.TestCase):
         self.assertEqual('hello', next_state_view.get('abcd').decode())
         self.assertEqual({'abcd': 'hello'.encode()},
                          next_state_view.leaves(''))
+
+    def test_state_view_read_only(self):
+        """Tests that creating StateViews never writes to the database
+
+        This test exercises the following:
+
+        1. Create views of the empty tree, from an empty database, and
+           assert that the database remains empty.
+        2. Verify the views are at the empty root, and are empty.
+        3. Verify that writing to a read-only tree fails.
+        """
+        database = DictDatabase()
+        state_view_factory = StateViewFactory(database)
+
+        default_view = state_view_factory.create_view()
+        empty_view = state_view_factory.create_view(EMPTY_ROOT_HASH)
+        self.assertEqual(0, len(database))
+
+        self.assertEqual(EMPTY_ROOT_HASH, default_view.merkle_root)
+        self.assertEqual(EMPTY_ROOT_HASH, empty_view.merkle_root)
+        self.assertEqual([], empty_view.addresses())
+        self.assertEqual(
+            EMPTY_ROOT_HASH, MerkleDatabase(database).get_merkle_root())
+
+        read_only_db = MerkleDatabase(DictDatabase(), read_only=True)
+        with self.assertRaises(ValueError):
+            read_only_db.update({'abcd': 'hello'.encode()}, virtual=False)
@@ -0,0 +1,81 @@
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------------
+
+import threading
+import unittest
+
+from sawtooth_validator.concurrent.threadpool import \
+    InstrumentedThreadPoolExecutor
+
+
+class TestInstrumentedThreadPoolExecutor(unittest.TestCase):
+    def setUp(self):
+        self.pool = InstrumentedThreadPoolExecutor(max_workers=1,
+                                                   name='Test')
+        self.release = threading.Event()
+        self.started = threading.Semaphore(0)
+
+    def tearDown(self):
+        self.release.set()
+        self.pool.shutdown(wait=True)
+
+    def _block(self):
+        self.started.release()
+        self.release.wait()
+
+    def test_metrics(self):
+        """Tests that the metrics count the tasks waiting for and running on
+        the pool's workers, and the tasks completed.
+        """
+        futures = [self.pool.submit(self._block) for _ in range(3)]
+        self.assertTrue(self.started.acquire(timeout=5))
+
+        metrics = self.pool.get_metrics()
+        self.assertEqual('Test', metrics.name)
+        self.assertEqual(1, metrics.max_workers)
+        self.assertEqual(1, metrics.active_workers)
+        self.assertEqual(2, metrics.queue_depth)
+        self.assertEqual(0, metrics.completed)
+
+        self.release.set()
+        for future in futures:
+            future.result(timeout=5)
+
+        metrics = self.pool.get_metrics()
+        self.assertEqual(0, metrics.active_workers)
+        self.assertEqual(0, metrics.queue_depth)
+        self.assertEqual(3, metrics.completed)
+        self.assertGreater(metrics.average_wait_time, 0)
+
+    def test_set_max_workers(self):
+        """Tests that increasing the workers of a saturated pool starts
+        tasks waiting for a worker, and that the workers cannot be reduced.
+        """
+        for _ in range(3):
+            self.pool.submit(self._block)
+        self.assertTrue(self.started.acquire(timeout=5))
+        self.assertFalse(self.started.acquire(timeout=0.1))
+
+        self.pool.set_max_workers(3)
+        self.assertTrue(self.started.acquire(timeout=5))
+        self.assertTrue(self.started.acquire(timeout=5))
+
+        metrics = self.pool.get_metrics()
+        self.assertEqual(3, metrics.max_workers)
+        self.assertEqual(3, metrics.active_workers)
+        self.assertEqual(0, metrics.queue_depth)
+
+        with self.assertRaises(ValueError):
+            self.pool.set_max_workers(2)